@@ -0,0 +1,418 @@
+import threading
+import numpy as np
+import pandas as pd
+
+import snapshot
+from referencias import tabla
+from replica import connect_read
+from etl_process import DB_NAME, dia_numero
+from top_queries import filtro_apertura
+
+# Las fechas se guardan, en la BD y aquí, como número de día desde 1970-01-01
+# (int32). El 1970-01-01 fue jueves, así que la BD precalcula
+# dia_semana = (dia + 3) % 7, con 0=lunes ... 6=domingo.
+DIA_NULO = np.iinfo(np.int32).min
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def month_of(days):
+    """
+    Mes 'YYYY-MM' de un array de números de día ('sin-fecha' para DIA_NULO).
+    Es la clave de partición del snapshot columnar.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    valid = days != DIA_NULO
+    months = np.full(len(days), 'sin-fecha', dtype=object)
+    months[valid] = np.datetime_as_string(days[valid].astype('datetime64[D]').astype('datetime64[M]'), unit='M')
+    return months
+
+
+def weekday_names(dia_semana):
+    """
+    Nombre del día de la semana en inglés a partir de la columna dia_semana
+    (0=lunes); 'Desconocido' para -1/NaN.
+    """
+    dia_semana = pd.Series(dia_semana, dtype='float64')
+    valid = dia_semana.notna() & (dia_semana >= 0)
+    names = pd.Series('Desconocido', index=dia_semana.index, dtype=object)
+    names[valid] = np.asarray(WEEKDAYS, dtype=object)[dia_semana[valid].to_numpy().astype(np.int64)]
+    return names
+
+
+def boxplot_summary(values, whis=(5, 90)):
+    """
+    Resumen de cinco números como plt.boxplot(whis=[5, 90]): cuartiles
+    interpolados y cada bigote en el dato más extremo dentro de su percentil,
+    sin entrar en la caja (con pocos datos el percentil puede quedar dentro).
+    """
+    x = np.asarray(values, dtype=np.float64)
+    lo, q1, med, q3, hi = np.percentile(x, [whis[0], 25, 50, 75, whis[1]])
+    whislo = min(float(x[x >= lo].min()), float(q1))
+    whishi = max(float(x[x <= hi].max()), float(q3))
+    return {'whislo': whislo, 'q1': float(q1), 'med': float(med), 'q3': float(q3), 'whishi': whishi}
+
+
+def _dias(column):
+    """
+    Columna de fechas (nº de día, NULL -> NaN) como int32 con DIA_NULO.
+    """
+    return column.fillna(DIA_NULO).astype(np.int32)
+
+
+def _compact_frames(tickets, contacts):
+    """
+    Aplica los tipos compactos a los DataFrames leídos de SQLite y añade las
+    columnas derivadas por ticket (nº de contactos y tiempo total). Las fechas
+    ya vienen como nº de día y duracion/dia_semana precalculados en la BD.
+    """
+    tickets = pd.DataFrame({
+        'id_ticket': tickets['id_ticket'].astype(np.int32),
+        'fecha_apertura': _dias(tickets['fecha_apertura']),
+        'fecha_cierre': _dias(tickets['fecha_cierre']),
+        'es_mantenimiento': tickets['es_mantenimiento'].fillna(0).astype(np.int8),
+        'satisfaccion_cliente': tickets['satisfaccion_cliente'].fillna(0).astype(np.int8),
+        'id_inci': tickets['id_inci'].astype('category'),
+        'id_cliente': tickets['id_cliente'].astype(np.int32),
+        'duracion': tickets['duracion'].fillna(0).astype(np.int16),
+    })
+
+    contacts = pd.DataFrame({
+        'id_ticket': contacts['id_ticket'].astype(np.int32),
+        'id_emp': contacts['id_emp'].astype(np.int32),
+        'fecha': _dias(contacts['fecha']),
+        'tiempo': contacts['tiempo'].fillna(0).astype(np.float32),
+        'dia_semana': contacts['dia_semana'].fillna(-1).astype(np.int8),
+    })
+
+    per_ticket = contacts.groupby('id_ticket').agg(num_contactos=('tiempo', 'size'),
+                                                   total_tiempo=('tiempo', 'sum'))
+    per_ticket = per_ticket.reindex(tickets['id_ticket'], fill_value=0)
+    tickets['num_contactos'] = per_ticket['num_contactos'].to_numpy().astype(np.int16)
+    tickets['total_tiempo'] = per_ticket['total_tiempo'].to_numpy().astype(np.float32)
+    return tickets, contacts
+
+
+def read_ticket_frames_sql(db_name=DB_NAME, after_id=0, desde=None, hasta=None):
+    """
+    Lee de SQLite los tickets con id_ticket > after_id (y, opcionalmente,
+    abiertos entre desde y hasta) y sus contactos, dentro de una misma
+    transacción de lectura para que ambos sean coherentes.
+    """
+    rango, params = filtro_apertura(desde, hasta, 'fecha_apertura')
+    rango_t, _ = filtro_apertura(desde, hasta, 't.fecha_apertura')
+    conn = connect_read(db_name, isolation_level=None)
+    conn.execute("BEGIN")
+    tickets = pd.read_sql_query(f"""
+        SELECT id_ticket, fecha_apertura, fecha_cierre, es_mantenimiento,
+               satisfaccion_cliente, id_inci, id_cliente, duracion
+        FROM incidencia_ticket
+        WHERE id_ticket > ?{rango}
+        ORDER BY id_ticket
+    """, conn, params=(after_id, *params))
+    # Con rango, los contactos se filtran por la fecha de apertura de su ticket
+    contacts = pd.read_sql_query(f"""
+        SELECT co.id_ticket, co.id_emp, co.fecha, co.tiempo, co.dia_semana
+        FROM contacto co
+        {'JOIN incidencia_ticket t ON t.id_ticket = co.id_ticket' if rango else ''}
+        WHERE co.id_emp IS NOT NULL AND co.id_ticket > ?{rango_t}
+        ORDER BY co.id_ticket
+    """, conn, params=(after_id, *params))
+    conn.execute("COMMIT")
+    conn.close()
+    return _compact_frames(tickets, contacts)
+
+
+def max_id_ticket(db_name):
+    conn = connect_read(db_name)
+    max_id = conn.execute("SELECT COALESCE(MAX(id_ticket), 0) FROM incidencia_ticket").fetchone()[0]
+    conn.close()
+    return max_id
+
+
+def _concat_frames(*frames):
+    frame = pd.concat(frames, ignore_index=True)
+    if 'id_inci' in frame:
+        frame['id_inci'] = frame['id_inci'].astype('category')
+    return frame
+
+
+def _slice_range(tickets, contacts, desde, hasta):
+    """
+    Tickets abiertos entre los números de día desde y hasta (inclusive) y sus contactos.
+    """
+    apertura = tickets['fecha_apertura'].to_numpy()
+    mask = apertura != DIA_NULO
+    if desde is not None:
+        mask &= apertura >= desde
+    if hasta is not None:
+        mask &= apertura <= hasta
+    tickets = tickets[mask]
+    return tickets, contacts[contacts['id_ticket'].isin(tickets['id_ticket'])]
+
+
+# Caché del último snapshot cargado por proceso:
+# {'path', 'watermark', 'partitions', 'parts', 'full', 'delta'}
+_frames_cache = {}
+_frames_lock = threading.Lock()
+
+
+def _partition_frames(cache, part):
+    frames = cache['parts'].get(part)
+    if frames is None:
+        frames = snapshot.read_partition(cache['path'], part)
+        cache['parts'][part] = frames
+    return frames
+
+
+def _full_frames(cache):
+    """
+    Todas las particiones más el delta en un único modelo columnar. La
+    concatenación copia los datos mapeados a memoria del proceso (compartida
+    copy-on-write con los workers si se carga antes del fork); las particiones
+    pasan a ser vistas (iloc) de este, sin duplicar memoria.
+    """
+    if cache['full'] is None:
+        pieces = [_partition_frames(cache, part) for part in cache['partitions']] + [cache['delta']]
+        tickets = _concat_frames(*[t for t, _ in pieces])
+        contacts = _concat_frames(*[c for _, c in pieces])
+        cache['offsets'] = {}
+        t0 = c0 = 0
+        for part, (t, c) in zip(cache['partitions'], pieces):
+            cache['offsets'][part] = (t0, t0 + len(t), c0, c0 + len(c))
+            t0, c0 = t0 + len(t), c0 + len(c)
+        cache['full'] = (tickets, contacts)
+        _point_parts_to_full(cache)
+    return cache['full']
+
+
+def _point_parts_to_full(cache):
+    tickets, contacts = cache['full']
+    for part, (t0, t1, c0, c1) in cache['offsets'].items():
+        cache['parts'][part] = (tickets.iloc[t0:t1], contacts.iloc[c0:c1])
+
+
+def _open_snapshot_cache(db_name, latest):
+    snap = snapshot.read_snapshot(latest)
+    if snap is None:
+        return None
+    cache = dict(snap, path=latest, parts={}, full=None)
+    cache['delta'] = read_ticket_frames_sql(db_name, cache['watermark'])
+    if len(cache['delta'][0]):
+        cache['watermark'] = int(cache['delta'][0]['id_ticket'].max())
+    return cache
+
+
+def load_ticket_frames(db_name=DB_NAME, desde=None, hasta=None):
+    """
+    Retorna (tickets, contactos) como dos DataFrames compactos enlazados por
+    id_ticket, en lugar del LEFT JOIN desnormalizado. Con desde/hasta
+    (datetime.date) solo se devuelven los tickets abiertos en ese rango.
+
+    Si existe un snapshot columnar (ver snapshot.py) se mapean en memoria sus
+    particiones mensuales, solo las de los meses del rango, y de SQLite solo se
+    leen los tickets posteriores a su marca de agua. Los DataFrames devueltos
+    se comparten entre peticiones: no deben modificarse.
+    """
+    desde, hasta = dia_numero(desde), dia_numero(hasta)
+    ranged = desde is not None or hasta is not None
+    with _frames_lock:
+        cache = _frames_cache.get(db_name)
+        latest = snapshot.latest_snapshot_path(db_name)
+        if latest and (cache is None or cache['path'] != latest):
+            cache = _open_snapshot_cache(db_name, latest)
+            if cache is not None:
+                _frames_cache[db_name] = cache
+
+        if cache is None:
+            return _slice_range(*read_ticket_frames_sql(db_name), desde, hasta) if ranged \
+                else read_ticket_frames_sql(db_name)
+
+        max_id = max_id_ticket(db_name)
+        if max_id < cache['watermark']:
+            # La BD se ha regenerado por debajo del snapshot: no es válido
+            _frames_cache.pop(db_name, None)
+            return _slice_range(*read_ticket_frames_sql(db_name), desde, hasta) if ranged \
+                else read_ticket_frames_sql(db_name)
+        if max_id > cache['watermark']:
+            # Incorporamos los tickets nuevos (p. ej. add_incidente) al delta en memoria
+            delta_tickets, delta_contacts = read_ticket_frames_sql(db_name, cache['watermark'])
+            if len(delta_tickets):
+                cache['delta'] = (_concat_frames(cache['delta'][0], delta_tickets),
+                                  _concat_frames(cache['delta'][1], delta_contacts))
+                if cache['full'] is not None:
+                    cache['full'] = (_concat_frames(cache['full'][0], delta_tickets),
+                                     _concat_frames(cache['full'][1], delta_contacts))
+                    _point_parts_to_full(cache)
+                cache['watermark'] = int(delta_tickets['id_ticket'].max())
+
+        if not ranged:
+            return _full_frames(cache)
+
+        # Poda de particiones: solo se leen los meses que solapan con el rango
+        first = month_of([desde])[0] if desde is not None else None
+        last = month_of([hasta])[0] if hasta is not None else None
+        parts = [part for part in cache['partitions']
+                 if part != 'sin-fecha' and (first is None or part >= first) and (last is None or part <= last)]
+        pieces = [_partition_frames(cache, part) for part in parts] + [cache['delta']]
+        tickets = _concat_frames(*[t for t, _ in pieces])
+        contacts = _concat_frames(*[c for _, c in pieces])
+        return _slice_range(tickets, contacts, desde, hasta)
+
+
+def get_empleados_df(db_name=DB_NAME):
+    # Compartido entre peticiones (referencias.py): no debe modificarse
+    return tabla('empleados', db_name).df
+
+
+def get_clientes_df(db_name=DB_NAME):
+    return tabla('clientes', db_name).df
+
+
+def contacts_per_ticket(tickets):
+    """
+    Nº de filas que tendría cada ticket en el LEFT JOIN ticket-contacto
+    (un ticket sin contactos cuenta como 1), igual que el cálculo original.
+    """
+    return tickets['num_contactos'].clip(lower=1)
+
+
+# Cálculo de métricas generales
+def calculate_metrics(tickets, contacts):
+    metrics = {}
+    metrics['total_tickets'] = len(tickets)
+
+    satisfaccion_ok = tickets['satisfaccion_cliente'] >= 5
+    client_counts_ok = satisfaccion_ok.groupby(tickets['id_cliente']).sum()
+    metrics['incidents_satisfied_mean'] = round(client_counts_ok.mean(), 2) if len(client_counts_ok) else 0
+    metrics['incidents_satisfied_std']  = round(client_counts_ok.std(), 2)  if len(client_counts_ok) > 1 else 0
+
+    client_counts = tickets.groupby('id_cliente').size()
+    metrics['incidents_per_client_mean'] = round(client_counts.mean(), 2) if len(client_counts) else 0
+    metrics['incidents_per_client_std']  = round(client_counts.std(), 2)  if len(client_counts) > 1 else 0
+
+    total_tiempo = tickets['total_tiempo'].astype(np.float64)
+    metrics['incident_total_time_mean'] = round(total_tiempo.mean(), 2) if len(tickets) else 0
+    metrics['incident_total_time_std']  = round(total_tiempo.std(), 2)  if len(tickets) > 1 else 0
+
+    emp_total_time = contacts['tiempo'].astype(np.float64).groupby(contacts['id_emp']).sum()
+    metrics['employee_time_min'] = round(emp_total_time.min(), 2) if len(emp_total_time) else 0
+    metrics['employee_time_max'] = round(emp_total_time.max(), 2) if len(emp_total_time) else 0
+
+    metrics['resolution_time_min'] = int(tickets['duracion'].min()) if len(tickets) else 0
+    metrics['resolution_time_max'] = int(tickets['duracion'].max()) if len(tickets) else 0
+
+    emp_inci_counts = contacts.groupby('id_emp')['id_ticket'].nunique()
+    metrics['employee_incidents_min'] = int(emp_inci_counts.min()) if len(emp_inci_counts) else 0
+    metrics['employee_incidents_max'] = int(emp_inci_counts.max()) if len(emp_inci_counts) else 0
+
+    # Fraude
+    es_fraude = tickets['id_inci'] == 5
+    metrics['fraude_ticket_count'] = int(es_fraude.sum())
+    fraude_contacts_by_ticket = contacts_per_ticket(tickets[es_fraude]).astype(np.int64)
+    if len(fraude_contacts_by_ticket):
+        metrics['fraude_contacts_mean']   = round(fraude_contacts_by_ticket.mean(), 2)
+        metrics['fraude_contacts_median'] = round(fraude_contacts_by_ticket.median(), 2)
+        metrics['fraude_contacts_var']    = round(fraude_contacts_by_ticket.var(), 2)
+        metrics['fraude_contacts_min']    = int(fraude_contacts_by_ticket.min())
+        metrics['fraude_contacts_max']    = int(fraude_contacts_by_ticket.max())
+    else:
+        metrics['fraude_contacts_mean']   = 0
+        metrics['fraude_contacts_median'] = 0
+        metrics['fraude_contacts_var']    = 0
+        metrics['fraude_contacts_min']    = 0
+        metrics['fraude_contacts_max']    = 0
+
+    return metrics
+
+
+# Agrupaciones Fraude: clave del resultado -> columna por la que se agrupa
+FRAUDE_DIMENSIONES = {
+    'by_employee': 'id_emp',
+    'by_level': 'nivel',
+    'by_client': 'id_cliente',
+    'by_weekday': 'weekday',
+}
+
+
+def fraude_rows(tickets, contacts, db_name=DB_NAME):
+    """
+    Filas ticket-contacto (LEFT JOIN) de los tickets de Fraude con el día de la
+    semana del contacto y el nivel del empleado; None si no hay ninguno.
+    """
+    # Solo Fraude: el JOIN se hace únicamente sobre este subconjunto
+    df_tickets = tickets.loc[tickets['id_inci'] == 5, ['id_ticket', 'id_cliente', 'fecha_apertura']]
+    if df_tickets.empty:
+        return None
+    df_contacts = contacts.loc[contacts['id_ticket'].isin(df_tickets['id_ticket']), ['id_ticket', 'id_emp', 'dia_semana']]
+    df_fraude = df_tickets.merge(df_contacts, on='id_ticket', how='left')
+
+    # Día de la semana
+    df_fraude['weekday'] = weekday_names(df_fraude['dia_semana']).to_numpy()
+
+    # Unimos nivel de empleado
+    emp_df = get_empleados_df(db_name)[['id_emp', 'nivel', 'nombre']]
+    return df_fraude.merge(emp_df, on='id_emp', how='left')
+
+
+def nombrar_grupos(groupings, db_name=DB_NAME):
+    """
+    Sustituye los ids de empleado y de cliente de las agrupaciones por su nombre.
+    """
+    for clave, nombre_tabla in (('by_employee', 'empleados'), ('by_client', 'clientes')):
+        rows = groupings[clave]
+        nombres = tabla(nombre_tabla, db_name).nombres([row['group_value'] for row in rows])
+        for row, nombre in zip(rows, nombres):
+            row['group_value'] = nombre
+    # (El 'group_value' de nivel ya es 1,2,3 y el del día su nombre)
+    return groupings
+
+
+def calculate_fraude_groupings(tickets, contacts, db_name=DB_NAME):
+    """
+    Filtra los incidentes de tipo_incidencia = 5 y agrupa por:
+      - Empleado
+      - Nivel de empleado
+      - Cliente
+      - Día de la semana (fecha_contacto)
+    Para cada grupo calcula:
+      - N.º de incidentes (tickets)
+      - N.º total de contactos
+      - Estadísticas (# contactos por ticket): mediana, media, varianza, min, max
+    """
+    df_fraude = fraude_rows(tickets, contacts, db_name)
+    if df_fraude is None:
+        # Si no hay ningún ticket de Fraude, devolvemos dict vacío
+        return {clave: [] for clave in FRAUDE_DIMENSIONES}
+    groupings = {clave: do_fraude_stats_by_dimension(df_fraude, col)
+                 for clave, col in FRAUDE_DIMENSIONES.items()}
+    return nombrar_grupos(groupings, db_name)
+
+
+def do_fraude_stats_by_dimension(df_fraude, group_col):
+
+    # Agrupamos por [group_col, id_ticket] y contamos filas => # contactos
+    grouped = df_fraude.groupby([group_col, 'id_ticket']).size().reset_index(name='num_contacts')
+
+    results = []
+    for group_value, subdf in grouped.groupby(group_col):
+        dist = subdf['num_contacts']  # Serie con el # de contactos por ticket
+        num_incidents = len(dist)     # Nº de tickets (cada fila = un ticket)
+        total_contacts = dist.sum()   # Suma total de contactos
+        median_val = dist.median()
+        mean_val = dist.mean()
+        var_val = dist.var() if len(dist) > 1 else 0
+        min_val = dist.min()
+        max_val = dist.max()
+
+        results.append({
+            'group_value': group_value,
+            'num_incidents': int(num_incidents),
+            'total_contacts': int(total_contacts),
+            'median_contacts': round(median_val, 2),
+            'mean_contacts': round(mean_val, 2),
+            'var_contacts': round(var_val, 2),
+            'min_contacts': int(min_val),
+            'max_contacts': int(max_val)
+        })
+
+    return results
@@ -0,0 +1,97 @@
+"""
+Compara memoria y tiempo del DataFrame desnormalizado (LEFT JOIN ticket-contacto
+con int64/float64/object) frente al modelo columnar compacto de analytics.py,
+y el arranque desde SQLite frente al snapshot Feather mapeado en memoria.
+
+Uso:
+    python benchmarks/bench_columnar.py --tickets 1000000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import read_ticket_frames_sql, calculate_metrics  # noqa: E402
+from snapshot import write_snapshot, read_snapshot  # noqa: E402
+from synthetic import generate_db  # noqa: E402
+
+
+def load_denormalised(db_path):
+    """
+    Carga original: LEFT JOIN completo y conversión de fechas en cada petición
+    (la BD ya guarda nº de día; se convierten a datetime como hacía el original).
+    """
+    conn = sqlite3.connect(db_path)
+    df = pd.read_sql_query("""
+        SELECT t.id_ticket, t.fecha_apertura, t.fecha_cierre, t.es_mantenimiento,
+               t.satisfaccion_cliente, t.id_inci, t.id_cliente,
+               c.id_emp, c.fecha AS fecha_contacto, c.tiempo
+        FROM incidencia_ticket t
+        LEFT JOIN contacto c ON t.id_ticket = c.id_ticket
+    """, conn)
+    conn.close()
+    df['fecha_apertura'] = pd.to_datetime(df['fecha_apertura'], unit='D')
+    df['fecha_cierre'] = pd.to_datetime(df['fecha_cierre'], unit='D')
+    df['fecha_contacto'] = pd.to_datetime(df['fecha_contacto'], unit='D', errors='coerce')
+    df['duracion'] = (df['fecha_cierre'] - df['fecha_apertura']).dt.days
+    df['tiempo'] = df['tiempo'].fillna(0).astype(float)
+    return df
+
+
+def denormalised_metrics(df):
+    """Mismas agregaciones que el calculate_metrics original (drop_duplicates + merge)."""
+    total_time_by_ticket = df.groupby('id_ticket')['tiempo'].sum().reset_index(name='total_tiempo')
+    tickets = df.drop_duplicates(subset=['id_ticket']).copy()
+    tickets = tickets.merge(total_time_by_ticket, on='id_ticket', how='left')
+    tickets['satisfaccion_ok'] = tickets['satisfaccion_cliente'] >= 5
+    tickets.groupby('id_cliente')['satisfaccion_ok'].sum().std()
+    tickets.groupby('id_cliente').size().std()
+    tickets['total_tiempo'].std()
+    df.groupby('id_emp')['tiempo'].sum().max()
+    df[['id_emp', 'id_ticket']].dropna().drop_duplicates().groupby('id_emp').size().max()
+    df[df['id_inci'] == 5].groupby('id_ticket').size().median()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickets', type=int, default=500_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        print(f"Generando {args.tickets} tickets sintéticos...")
+        generate_db(db_path, args.tickets)
+
+        df, t_load_old = timed(load_denormalised, db_path)
+        _, t_calc_old = timed(denormalised_metrics, df)
+        mem_old = df.memory_usage(deep=True).sum()
+        del df
+
+        (tickets, contacts), t_load_new = timed(read_ticket_frames_sql, db_path)
+        _, t_calc_new = timed(calculate_metrics, tickets, contacts)
+        mem_new = tickets.memory_usage(deep=True).sum() + contacts.memory_usage(deep=True).sum()
+
+        snap_path = write_snapshot(db_path)
+        _, t_load_snap = timed(read_snapshot, snap_path) if snap_path else (None, float('nan'))
+
+    print(f"{'':24}{'desnormalizado':>16}{'columnar':>16}")
+    print(f"{'memoria (MB)':24}{mem_old / 2**20:16.1f}{mem_new / 2**20:16.1f}")
+    print(f"{'carga (s)':24}{t_load_old:16.3f}{t_load_new:16.3f}")
+    print(f"{'métricas (s)':24}{t_calc_old:16.3f}{t_calc_new:16.3f}")
+    print(f"{'carga snapshot (s)':24}{'':16}{t_load_snap:16.3f}")
+
+
+if __name__ == '__main__':
+    main()
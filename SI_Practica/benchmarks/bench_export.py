@@ -0,0 +1,53 @@
+"""
+Exportación en streaming (exports.py): tiempo hasta el primer bloque de filas,
+tiempo total y pico de memoria de Python (tracemalloc), que no debe crecer con
+el nº de filas exportadas.
+
+Uso (desde SI_Practica/):
+    python benchmarks/bench_export.py --tickets 100000 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exports import stream_export  # noqa: E402
+from synthetic import generate_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickets', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--formato', choices=['csv', 'ndjson'], default='csv')
+    args = parser.parse_args()
+
+    for n in args.tickets:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'bench.db')
+            generate_db(db_path, n)
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            first = None
+            total_bytes = 0
+            lines = 0
+            for i, chunk in enumerate(stream_export('tickets_contactos', args.formato, db_name=db_path)):
+                if i == 1:
+                    first = time.perf_counter() - start
+                total_bytes += len(chunk)
+                lines += chunk.count('\n')
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"{n} tickets -> {lines} líneas, {total_bytes / 1e6:.1f} MB {args.formato}: "
+                  f"primer bloque {1000 * (first or elapsed):.1f} ms, total {elapsed:.2f} s, "
+                  f"pico de memoria {peak / 1e6:.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
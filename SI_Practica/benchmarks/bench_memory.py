@@ -0,0 +1,85 @@
+"""
+Presupuestos de memoria por ruta: con el perfilado de profiling.py activado,
+pide cada ruta varias veces sobre una BD sintética, muestra el pico y la
+memoria retenida por ruta y por etapa y los sitios con más memoria asignada, y
+termina con código 1 si el pico de alguna ruta supera su presupuesto.
+
+Uso (desde SI_Practica/):
+    python benchmarks/bench_memory.py --tickets 200000 --presupuesto /=150 /generate_report=250
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ['SI_PROFILE_MEMORY'] = '1'
+
+# Pico máximo (MB) por ruta si no se indica otro con --presupuesto
+PRESUPUESTOS_MB = {
+    '/': 200,
+    '/generate_report': 300,
+    '/top_clientes/<int:x>': 20,
+    '/api/charts': 100,
+}
+RUTAS = ['/', '/?graficos=cliente', '/generate_report', '/top_clientes/10', '/api/charts']
+
+
+def parse_presupuestos(valores):
+    presupuestos = dict(PRESUPUESTOS_MB)
+    for valor in valores or []:
+        ruta, _, mb = valor.rpartition('=')
+        presupuestos[ruta] = float(mb)
+    return presupuestos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=200_000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--presupuesto', nargs='+', help="ruta=MB (regla de Flask, p. ej. /generate_report=250)")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    presupuestos = parse_presupuestos(args.presupuesto)
+
+    from synthetic import generate_db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_db(os.path.join(tmp, 'incidentes.db'), args.tickets)
+        os.chdir(tmp)
+        import app as app_module
+        import profiling
+
+        app_module.startup()
+        client = app_module.app.test_client()
+        for _ in range(args.repeticiones):
+            for ruta in RUTAS:
+                status = client.get(ruta).status_code
+                if status != 200:
+                    raise SystemExit(f"{ruta} respondió {status}")
+
+        stats = profiling.memory_stats()
+        print(f"{'':<28}{'llamadas':>9}{'pico MB':>10}{'retenido MB':>13}{'presupuesto':>13}")
+        excedidas = []
+        for ruta, s in sorted(stats['rutas'].items()):
+            presupuesto = presupuestos.get(ruta)
+            if presupuesto is not None and s['pico_max_mb'] > presupuesto:
+                excedidas.append(ruta)
+            print(f"{ruta:<28}{s['llamadas']:>9}{s['pico_max_mb']:>10.1f}{s['retenido_ultimo_mb']:>13.1f}"
+                  f"{presupuesto if presupuesto is not None else '-':>13}")
+        for etapa, s in sorted(stats['etapas'].items()):
+            print(f"  etapa {etapa:<20}{s['llamadas']:>9}{s['pico_max_mb']:>10.1f}{s['retenido_ultimo_mb']:>13.1f}")
+
+        print(f"\nSitios con más memoria asignada (top {args.top}):")
+        for site in profiling.top_allocations(args.top):
+            print(f"  {site['kb']:>10.1f} KB  {site['sitio'][-1].strip() if site['sitio'] else ''}")
+
+        if excedidas:
+            print(f"\nPresupuesto superado en: {', '.join(excedidas)}")
+            sys.exit(1)
+        print("\nOK: todas las rutas dentro de presupuesto")
+
+
+if __name__ == '__main__':
+    main()
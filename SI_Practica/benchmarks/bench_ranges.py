@@ -0,0 +1,68 @@
+"""
+Coste de una consulta por rango de fechas (la última semana) según el tamaño
+del histórico: con el snapshot particionado por mes y el índice de
+fecha_apertura debe ser el mismo con 1 año que con 10.
+
+Uso (desde SI_Practica/):
+    python benchmarks/bench_ranges.py --tickets-por-anio 50000 --anios 1 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+from snapshot import write_snapshot  # noqa: E402
+from synthetic import generate_db  # noqa: E402
+import top_queries  # noqa: E402
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickets-por-anio', type=int, default=50_000)
+    parser.add_argument('--anios', type=int, nargs='+', default=[1, 10])
+    args = parser.parse_args()
+
+    for anios in args.anios:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'bench.db')
+            generate_db(db_path, args.tickets_por_anio * anios, years=anios)
+            write_snapshot(db_path)
+            top_queries.DB_NAME = db_path
+
+            hasta = date(2015, 1, 1) + timedelta(days=365 * anios - 30)
+            desde = hasta - timedelta(days=6)
+
+            # Primera lectura en frío: solo se mapean las particiones del rango
+            analytics._frames_cache.clear()
+            start = time.perf_counter()
+            tickets, contacts = analytics.load_ticket_frames(db_path, desde, hasta)
+            t_cold = time.perf_counter() - start
+            parts = len(analytics._frames_cache[db_path]['parts'])
+
+            t_metrics, _ = timed(lambda: analytics.calculate_metrics(
+                *analytics.load_ticket_frames(db_path, desde, hasta)))
+            t_sql, _ = timed(lambda: analytics.read_ticket_frames_sql(db_path, desde=desde, hasta=hasta))
+            t_top, _ = timed(lambda: top_queries.top_clientes_page(10, 1, desde, hasta))
+
+            print(f"{anios} año(s), {args.tickets_por_anio * anios} tickets, semana {desde}..{hasta} "
+                  f"({len(tickets)} tickets, {parts} partición(es) leída(s)):")
+            print(f"  snapshot en frío: {1000 * t_cold:.1f} ms, métricas del rango: {1000 * t_metrics:.1f} ms")
+            print(f"  SQLite con índice: {1000 * t_sql:.1f} ms, top clientes: {1000 * t_top:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Nombres de clientes y empleados: leer la tabla de la BD, construir un dict y
+aplicarlo con index.map fila a fila (lo que hacía cada ruta) frente a la caché
+de referencias.py (searchsorted sobre los ids ordenados). Comprueba también que
+ambos dan los mismos nombres.
+
+Uso (desde SI_Practica/):
+    python benchmarks/bench_referencias.py --ids 100000 --repeticiones 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from referencias import tabla  # noqa: E402
+from replica import connect_read  # noqa: E402
+from synthetic import generate_db  # noqa: E402
+
+
+def por_peticion(db_path, ids):
+    conn = connect_read(db_path)
+    cli_df = pd.read_sql_query("SELECT id_cliente, nombre FROM cliente", conn)
+    conn.close()
+    cli_dict = dict(zip(cli_df['id_cliente'], cli_df['nombre']))
+    return ids.map(lambda x: cli_dict.get(x, f"Cliente {x}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ids', type=int, default=100_000, help="ids a traducir por petición")
+    parser.add_argument('--clientes', type=int, default=2000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        generate_db(db_path, 1000, n_clientes=args.clientes)
+        rng = np.random.default_rng(42)
+        # Un 1% de ids que no están en la tabla
+        ids = pd.Index(rng.integers(1, int(args.clientes * 1.01) + 1, args.ids))
+
+        esperado = np.asarray(por_peticion(db_path, ids))
+        assert (tabla('clientes', db_path).nombres(ids) == esperado).all()
+
+        for nombre, fn in (('BD + dict + map', lambda: por_peticion(db_path, ids)),
+                           ('caché + searchsorted', lambda: tabla('clientes', db_path).nombres(ids))):
+            start = time.perf_counter()
+            for _ in range(args.repeticiones):
+                fn()
+            ms = 1000 * (time.perf_counter() - start) / args.repeticiones
+            print(f"{nombre:<22}{ms:>8.2f} ms por petición ({args.ids} ids, {args.clientes} clientes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Informe completo de reports.py (resumen más apéndices por cliente y empleado):
+tiempo, páginas y pico de memoria (RSS) del proceso principal y de los workers
+con distinto nº de procesos, cada configuración en un proceso nuevo. Compara
+también el estilo de una tabla larga fila a fila (un setStyle por fila) con el
+de una sola pasada (ROWBACKGROUNDS).
+
+Uso (desde SI_Practica/):
+    python benchmarks/bench_reports.py --tickets 200000 --workers 1 4
+"""
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def run_child(db_path, workers):
+    """Genera el informe en este proceso: (segundos, páginas, RSS propio y de los workers en MB)."""
+    from pypdf import PdfReader
+
+    from reports import build_full_report
+
+    path = os.path.join(os.path.dirname(db_path), f'informe-{workers}.pdf')
+    start = time.perf_counter()
+    build_full_report(path, {'tickets': 0}, {}, db_name=db_path, workers=workers)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss está en KB en Linux; RUSAGE_CHILDREN es el máximo de los workers
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    rss_workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    # Se cuentan después de medir: PdfReader carga el informe entero
+    return elapsed, len(PdfReader(path).pages), rss, rss_workers
+
+
+def bench_table_style(rows):
+    """Segundos en maquetar una tabla de 'rows' filas con cada forma de aplicar el estilo."""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    from reports import METRICS_TABLE_STYLE, _document
+
+    data = [["Métrica", "Valor"]] + [[f"fila {i}", str(i)] for i in range(rows)]
+    results = {}
+    for modo in ('por fila', 'una pasada'):
+        start = time.perf_counter()
+        if modo == 'por fila':
+            table = Table(data, repeatRows=1)
+            table.setStyle(METRICS_TABLE_STYLE)
+            for i in range(1, len(data)):
+                if i % 2 == 0:
+                    table.setStyle(TableStyle([('BACKGROUND', (0, i), (-1, i), colors.lavender)]))
+        else:
+            table = Table(data, repeatRows=1, style=METRICS_TABLE_STYLE)
+        _document(io.BytesIO()).build([table])
+        results[modo] = time.perf_counter() - start
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickets', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--filas-tabla', type=int, default=5000)
+    parser.add_argument('--hijo', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(" ".join(f"{v:.2f}" for v in run_child(args.db, args.hijo)))
+        return
+
+    from synthetic import generate_db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        generate_db(db_path, args.tickets)
+        for workers in args.workers:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--hijo', str(workers), '--db', db_path],
+                                 cwd=tmp, env=dict(os.environ, PYTHONPATH=BASE_DIR),
+                                 check=True, stdout=subprocess.PIPE, text=True).stdout.split()
+            elapsed, pages, rss, rss_workers = map(float, out)
+            print(f"{workers} workers: {elapsed:.1f} s, {pages:.0f} páginas, pico de memoria {rss:.0f} MB "
+                  f"(proceso principal) / {rss_workers:.0f} MB (workers) con {args.tickets} tickets")
+
+    tiempos = bench_table_style(args.filas_tabla)
+    print(f"Tabla de {args.filas_tabla} filas: " + ", ".join(f"{modo} {s:.2f} s" for modo, s in tiempos.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Coste por predicción de /prediccion: inferencia del modelo (predict_criticality)
+frente a la tabla precalculada y al LRU de scoring.py, y comprobación de que
+la tabla da las mismas probabilidades que el modelo.
+
+Uso (desde SI_Practica/):
+    python benchmarks/bench_scoring.py --predicciones 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models import predict_criticality  # noqa: E402
+from online_training import update_models  # noqa: E402
+from scoring import get_scorer  # noqa: E402
+from synthetic import generate_db  # noqa: E402
+
+
+def random_features(rng):
+    return {
+        'es_mantenimiento': rng.randint(0, 1),
+        'satisfaccion_cliente': rng.randint(0, 10),
+        'tipo_incidencia': rng.randint(1, 5),
+        'duracion': rng.randint(0, 30),
+        'num_contactos': 1,
+        'tiempo_total': 1.0,
+    }
+
+
+def per_call(fn, samples):
+    start = time.perf_counter()
+    results = [fn(f) for f in samples]
+    return 1e6 * (time.perf_counter() - start) / len(samples), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickets', type=int, default=20_000)
+    parser.add_argument('--predicciones', type=int, default=2_000)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        generate_db(db_path, args.tickets)
+        os.chdir(tmp)
+        start = time.perf_counter()
+        update_models(db_path)
+        print(f"Publicación de la versión con tablas: {time.perf_counter() - start:.2f} s")
+
+        scorer = get_scorer()
+        samples = [random_features(rng) for _ in range(args.predicciones)]
+        for key in ('lr', 'dt', 'rf'):
+            t_model, directas = per_call(lambda f: predict_criticality(scorer.models[key], f), samples)
+            t_table, tabla = per_call(lambda f: scorer.score(key, f), samples)
+            # Fuera del dominio de la tabla: primera vez inferencia, después LRU
+            fuera = [dict(f, num_contactos=2) for f in samples]
+            per_call(lambda f: scorer.score(key, f), fuera)
+            t_lru, _ = per_call(lambda f: scorer.score(key, f), fuera)
+            diff = max(abs(float(d[1]) - t[1]) for d, t in zip(directas, tabla))
+            mismas = all(int(d[0]) == t[0] for d, t in zip(directas, tabla))
+            print(f"{key}: modelo {t_model:.0f} µs, tabla {t_table:.1f} µs, LRU {t_lru:.1f} µs por predicción "
+                  f"(diferencia máx. de probabilidad {diff:.1e}, predicciones {'iguales' if mismas else 'DISTINTAS'})")
+
+
+if __name__ == '__main__':
+    main()
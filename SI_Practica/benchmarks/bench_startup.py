@@ -0,0 +1,80 @@
+"""
+Mide el coste de arranque de app.py:
+  - 'python -X importtime -c "import app"': tiempo total de importación y los
+    módulos de primer nivel más pesados.
+  - Tiempo hasta la primera respuesta de varias rutas en un proceso nuevo
+    (importación + startup() + primera petición con el cliente de pruebas).
+
+Uso (desde SI_Practica/):
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_RESPONSE_SCRIPT = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t_import = time.perf_counter() - t0
+app.startup()
+t_startup = time.perf_counter() - t0
+client = app.app.test_client()
+resp = client.get(sys.argv[1])
+t_first = time.perf_counter() - t0
+print(json.dumps({'import': t_import, 'startup': t_startup, 'first': t_first, 'status': resp.status_code}))
+"""
+
+
+def import_time(top=10):
+    """
+    Devuelve (total_us, [(módulo, acumulado_us), ...]) de importar app.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                          cwd=APP_DIR, capture_output=True, text=True, check=True)
+    roots = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Los módulos de primer nivel llevan un único espacio de sangría
+        if len(name) - len(name.lstrip()) == 1:
+            roots.append((name.strip(), int(cumulative)))
+    roots.sort(key=lambda item: item[1], reverse=True)
+    return sum(us for _, us in roots), roots[:top]
+
+
+def first_response(path):
+    proc = subprocess.run([sys.executable, '-c', FIRST_RESPONSE_SCRIPT, path],
+                          cwd=APP_DIR, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--routes', nargs='*', default=['/top_clientes/5', '/', '/generate_report'])
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.repeat):
+        total, heaviest = import_time()
+        totals.append(total)
+    print(f"import app: mediana {statistics.median(totals) / 1000:.1f} ms ({args.repeat} ejecuciones)")
+    for name, us in heaviest:
+        print(f"    {name:40}{us / 1000:10.1f} ms")
+
+    print(f"\n{'ruta':24}{'import (s)':>12}{'startup (s)':>13}{'1ª resp. (s)':>14}")
+    for route in args.routes:
+        runs = [first_response(route) for _ in range(args.repeat)]
+        med = {k: statistics.median(r[k] for r in runs) for k in ('import', 'startup', 'first')}
+        print(f"{route:24}{med['import']:12.3f}{med['startup']:13.3f}{med['first']:14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Comprueba que el almacén incremental de métricas (stats_store.py) coincide con
+el recálculo completo de analytics.calculate_metrics() tras una serie de
+inserciones tipo add_incidente, y compara el coste de ambos caminos.
+
+Uso (desde SI_Practica/):
+    python benchmarks/bench_stats_store.py --tickets 200000 --inserts 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import read_ticket_frames_sql, calculate_metrics  # noqa: E402
+from etl_process import dia_numero  # noqa: E402
+from stats_store import get_dashboard_stats  # noqa: E402
+from synthetic import generate_db  # noqa: E402
+
+
+def insert_ticket(db_path, rng):
+    """Misma inserción que la ruta /add_incidente (un ticket y un contacto)."""
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO incidencia_ticket
+        (fecha_apertura, fecha_cierre, es_mantenimiento, satisfaccion_cliente, id_inci, id_cliente)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (dia_numero("2025-03-03"), dia_numero(f"2025-03-{rng.randint(4, 13):02d}"), rng.randint(0, 1),
+          rng.randint(0, 10), rng.randint(1, 5), rng.randint(1, 220)))
+    cur.execute("INSERT INTO contacto (id_ticket, id_emp, fecha, tiempo) VALUES (?, ?, ?, ?)",
+                (cur.lastrowid, rng.randint(101, 155), dia_numero("2025-03-03"), rng.randint(1, 8) / 2))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickets', type=int, default=100_000)
+    parser.add_argument('--inserts', type=int, default=100)
+    parser.add_argument('--check-every', type=int, default=10)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        generate_db(db_path, args.tickets)
+        get_dashboard_stats(db_path)
+
+        t_incremental = t_full = 0.0
+        mismatches = 0
+        for i in range(1, args.inserts + 1):
+            insert_ticket(db_path, rng)
+            start = time.perf_counter()
+            incremental = get_dashboard_stats(db_path).metrics()
+            t_incremental += time.perf_counter() - start
+
+            if i % args.check_every == 0 or i == args.inserts:
+                start = time.perf_counter()
+                full = calculate_metrics(*read_ticket_frames_sql(db_path))
+                t_full += time.perf_counter() - start
+                diff = {k: (incremental[k], full[k]) for k in full if incremental[k] != full[k]}
+                if diff:
+                    mismatches += 1
+                    print(f"Diferencias tras {i} inserciones: {diff}")
+
+        checks = -(-args.inserts // args.check_every)
+        print(f"incremental: {1000 * t_incremental / args.inserts:.2f} ms/petición")
+        print(f"recálculo completo: {1000 * t_full / checks:.2f} ms/petición")
+        print("OK: coincide con el recálculo completo" if not mismatches else f"{mismatches} comprobaciones con diferencias")
+        sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Entrenamiento en memoria (todos los tickets etiquetados en un DataFrame) frente
+al modo fuera de memoria de train_models.py (bloques de SQLite, partial_fit,
+warm_start y muestras estratificadas): tiempo y pico de memoria (RSS) de cada
+uno, medidos en un proceso nuevo.
+
+Uso (desde SI_Practica/):
+    python benchmarks/bench_training.py --tickets 1000000 --chunk 100000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def run_child(modo, db_path, chunk):
+    """Entrena en este proceso y devuelve (segundos, pico de RSS en MB)."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.tree import DecisionTreeClassifier
+
+    from ml_models import FEATURES
+    from online_training import read_labelled
+    import train_models
+
+    os.makedirs(os.path.join('static', 'charts'), exist_ok=True)
+    start = time.perf_counter()
+    if modo == 'memoria':
+        df = read_labelled(db_path)
+        X, y = df[FEATURES], df['es_critico']
+        LogisticRegression(random_state=42, max_iter=1000).fit(X, y)
+        DecisionTreeClassifier(random_state=42).fit(X, y)
+        RandomForestClassifier(random_state=42, n_jobs=1).fit(X, y)
+    else:
+        train_models.train_out_of_core(db_path, chunk)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss está en KB en Linux
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tickets', type=int, default=1_000_000)
+    parser.add_argument('--chunk', type=int, default=100_000)
+    parser.add_argument('--modos', nargs='+', default=['memoria', 'bloques'])
+    parser.add_argument('--hijo', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        import contextlib
+        import io
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, rss = run_child(args.hijo, args.db, args.chunk)
+        print(f"{elapsed:.2f} {rss:.1f}")
+        return
+
+    from synthetic import generate_db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        generate_db(db_path, args.tickets)
+        for modo in args.modos:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--hijo', modo, '--db', db_path,
+                                  '--chunk', str(args.chunk)],
+                                 cwd=tmp, env=dict(os.environ, PYTHONPATH=BASE_DIR),
+                                 check=True, stdout=subprocess.PIPE, text=True).stdout.split()
+            print(f"{modo}: {float(out[0]):.1f} s, pico de memoria {float(out[1]):.0f} MB "
+                  f"({args.tickets} tickets, bloques de {args.chunk})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Prueba de carga local del despliegue con gunicorn (gunicorn.conf.py + wsgi.py):
+arranca el servidor con distinto nº de workers y mide peticiones por segundo
+con varios clientes concurrentes (procesos, para no limitar por el GIL del
+cliente). El rendimiento debería crecer casi linealmente hasta el nº de núcleos.
+
+Uso (desde SI_Practica/, con gunicorn instalado):
+    python benchmarks/bench_workers.py --workers 1 2 4 --clientes 8 --segundos 10
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_ready(url, proc, limit=300):
+    deadline = time.monotonic() + limit
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("gunicorn terminó antes de estar listo")
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{url} responde {e.code}") from e
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} no responde tras {limit} s")
+
+
+def client(args):
+    """Pide las rutas en bucle hasta agotar el tiempo; devuelve (correctas, errores)."""
+    urls, seconds = args
+    ok = errors = 0
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(urls[i % len(urls)], timeout=60).read()
+            ok += 1
+        except (urllib.error.URLError, ConnectionError):
+            errors += 1
+        i += 1
+    return ok, errors
+
+
+def run(workers, args):
+    bind = f"127.0.0.1:{args.puerto}"
+    env = dict(os.environ, SI_WORKERS=str(workers), SI_THREADS=str(args.hilos), SI_BIND=bind)
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                            cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        urls = [f"http://{bind}{ruta}" for ruta in args.rutas]
+        wait_ready(urls[0], proc)
+        # Calentamiento: primera petición de cada ruta en todos los workers
+        client((urls, 1.0))
+        with multiprocessing.Pool(args.clientes) as pool:
+            start = time.perf_counter()
+            results = pool.map(client, [(urls, args.segundos)] * args.clientes)
+            elapsed = time.perf_counter() - start
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return ok / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--hilos', type=int, default=1)
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--rutas', nargs='+',
+                        default=['/?graficos=cliente', '/api/charts', '/api/top_clientes/10'])
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} núcleos, {args.clientes} clientes, {args.hilos} hilo(s) por worker")
+    base = None
+    for workers in args.workers:
+        rps, errors = run(workers, args)
+        base = base or rps
+        print(f"{workers} worker(s): {rps:.1f} peticiones/s (x{rps / base:.2f}), {errors} errores")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Prueba de carga reproducible de la aplicación completa.
+
+Genera en un directorio temporal una BD sintética (synthetic.py) y una versión
+de los modelos, arranca un servidor local que imita la API de CVE (/api/last y
+/api/cve/<id>) con latencia y tasa de errores configurables y levanta la
+aplicación contra ambos (gunicorn si está instalado, si no el servidor de
+Flask con hilos). Después lanza una mezcla de peticiones a / (gráficos PNG
+dibujados en el servidor), /?graficos=cliente, las rutas de top, /prediccion,
+/add_incidente, /generate_report y /vulnerabilidades con la
+concurrencia indicada y muestra p50/p95/p99 de latencia y peticiones/s, en
+total y por ruta.
+
+Uso (desde SI_Practica/):
+    python benchmarks/loadtest.py --concurrencia 8 --segundos 30 --cve-latencia 200 --cve-errores 0.05
+    python benchmarks/loadtest.py --mezcla top_clientes=5 prediccion=5 --servidor flask
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+# Peso por defecto de cada tipo de petición en la mezcla
+MEZCLA = {
+    'dashboard': 15,
+    'dashboard_cliente': 5,
+    'top_clientes': 15,
+    'top_tiempos': 10,
+    'top_reportes': 10,
+    'prediccion': 20,
+    'add_incidente': 5,
+    'generate_report': 5,
+    'vulnerabilidades': 15,
+}
+N_CVES = 30
+
+
+class CveStubHandler(BaseHTTPRequestHandler):
+    """Imita las respuestas de cve.circl.lu que usa cve.py."""
+    latencia = 0.0
+    errores = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latencia)
+        if random.random() < self.errores:
+            return self._json(500, {'error': 'error simulado'})
+        if self.path == '/api/last':
+            return self._json(200, [{'id': f'CVE-2025-{i:05d}', 'summary': f'Vulnerabilidad {i}'}
+                                    for i in range(N_CVES)])
+        if self.path.startswith('/api/cve/'):
+            cve = self.path.rsplit('/', 1)[-1]
+            return self._json(200, {
+                'cveMetadata': {'datePublished': '2025-01-01T00:00:00'},
+                'containers': {'cna': {'descriptions': [{'lang': 'en', 'value': f'Descripción de {cve}'}]}},
+            })
+        self._json(404, {})
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_cve_stub(latencia_ms, errores):
+    CveStubHandler.latencia = latencia_ms / 1000
+    CveStubHandler.errores = errores
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CveStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def prepare_dataset(workdir, n_tickets):
+    """BD sintética y versión de los modelos en 'workdir'."""
+    from online_training import update_models
+    from synthetic import generate_db
+
+    db_path = os.path.join(workdir, 'incidentes.db')
+    generate_db(db_path, n_tickets)
+    update_models(db_path, models_dir=os.path.join(workdir, 'models'))
+
+
+def start_app(workdir, args, cve_base):
+    env = dict(os.environ, PYTHONPATH=BASE_DIR, CVE_API_BASE=cve_base,
+               SI_BIND=f'127.0.0.1:{args.puerto}', SI_WORKERS=str(args.workers), SI_THREADS=str(args.hilos))
+    if args.servidor == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(BASE_DIR, 'gunicorn.conf.py'), 'wsgi:app']
+    else:
+        cmd = [sys.executable, '-c', 'import app; app.startup(); app.warm_up(); '
+               f'app.app.run(host="127.0.0.1", port={args.puerto}, threaded=True)']
+    return subprocess.Popen(cmd, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(url, proc, limit=600):
+    deadline = time.monotonic() + limit
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("el servidor terminó antes de estar listo")
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.5)
+    raise RuntimeError(f"{url} no responde tras {limit} s")
+
+
+def build_request(nombre, base, rng):
+    """(url, datos del formulario o None) de una petición de la mezcla."""
+    fecha = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 20):02d}"
+    if nombre == 'dashboard':
+        return f"{base}/", None
+    if nombre == 'dashboard_cliente':
+        return f"{base}/?graficos=cliente", None
+    if nombre == 'top_clientes':
+        return f"{base}/top_clientes/{rng.choice([5, 10, 20])}", None
+    if nombre == 'top_tiempos':
+        return f"{base}/top_tiempos_incidencias/{rng.choice([5, 10])}", None
+    if nombre == 'top_reportes':
+        return f"{base}/top_reportes/{rng.choice([5, 10])}/{rng.choice(['si', 'no'])}", None
+    if nombre == 'generate_report':
+        return f"{base}/generate_report", None
+    if nombre == 'vulnerabilidades':
+        return f"{base}/vulnerabilidades", None
+    comunes = {
+        'cliente': str(rng.randint(1, 200)),
+        'fecha_apertura': fecha,
+        'fecha_cierre': f"{fecha[:8]}{int(fecha[8:]) + rng.randint(1, 8):02d}",
+        'es_mantenimiento': rng.choice(['true', 'false']),
+        'satisfaccion_cliente': str(rng.randint(1, 10)),
+        'tipo_incidencia': str(rng.randint(1, 5)),
+    }
+    if nombre == 'prediccion':
+        return f"{base}/prediccion", dict(comunes, modelo=rng.choice(['lr', 'dt', 'rf']))
+    return f"{base}/add_incidente", dict(comunes, id_emp=str(rng.randint(101, 150)), fecha_contacto=fecha,
+                                          tiempo_contacto=str(rng.randint(1, 8) / 2),
+                                          es_critico=rng.choice(['', 'true', 'false']))
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    # La redirección de add_incidente al dashboard no cuenta en su latencia
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def client(args):
+    """Lanza peticiones de la mezcla hasta agotar el tiempo; devuelve (ruta, ms, ok)."""
+    base, mezcla, seconds, seed = args
+    rng = random.Random(seed)
+    opener = urllib.request.build_opener(_SinRedirecciones)
+    nombres, pesos = zip(*mezcla.items())
+    results = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        nombre = rng.choices(nombres, pesos)[0]
+        url, form = build_request(nombre, base, rng)
+        data = urllib.parse.urlencode(form).encode('utf-8') if form else None
+        start = time.perf_counter()
+        try:
+            opener.open(url, data=data, timeout=120).read()
+            ok = True
+        except urllib.error.HTTPError as e:
+            ok = e.code < 400
+        except (urllib.error.URLError, ConnectionError):
+            ok = False
+        results.append((nombre, 1000 * (time.perf_counter() - start), ok))
+    return results
+
+
+def report(results, elapsed):
+    def line(nombre, rows):
+        ms = np.array([r[1] for r in rows])
+        errores = sum(not r[2] for r in rows)
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        print(f"{nombre:<18}{len(rows):>8}{len(rows) / elapsed:>10.1f}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{errores:>8}")
+
+    print(f"{'ruta':<18}{'peticiones':>8}{'pet/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>8}")
+    for nombre in sorted({r[0] for r in results}):
+        line(nombre, [r for r in results if r[0] == nombre])
+    line('TOTAL', results)
+
+
+def parse_mezcla(valores):
+    mezcla = {}
+    for valor in valores:
+        nombre, _, peso = valor.partition('=')
+        if nombre not in MEZCLA:
+            raise SystemExit(f"Ruta desconocida en --mezcla: {nombre} (válidas: {', '.join(MEZCLA)})")
+        mezcla[nombre] = float(peso or 1)
+    return mezcla
+
+
+def main():
+    servidor = 'gunicorn' if importlib.util.find_spec('gunicorn') else 'flask'
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=100_000)
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--segundos', type=float, default=30)
+    parser.add_argument('--mezcla', nargs='+', help="ruta=peso (por defecto todas, ver MEZCLA)")
+    parser.add_argument('--servidor', choices=['gunicorn', 'flask'], default=servidor)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--hilos', type=int, default=4)
+    parser.add_argument('--puerto', type=int, default=8766)
+    parser.add_argument('--cve-latencia', type=float, default=100, help="ms por petición a la API de CVE")
+    parser.add_argument('--cve-errores', type=float, default=0.0, help="fracción de respuestas 500")
+    args = parser.parse_args()
+    mezcla = parse_mezcla(args.mezcla) if args.mezcla else MEZCLA
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_dataset(workdir, args.tickets)
+        stub = start_cve_stub(args.cve_latencia, args.cve_errores)
+        cve_base = f"http://127.0.0.1:{stub.server_address[1]}/api"
+        proc = start_app(workdir, args, cve_base)
+        base = f"http://127.0.0.1:{args.puerto}"
+        try:
+            wait_ready(f"{base}/api/top_clientes/5", proc)
+            print(f"{args.servidor} ({args.workers} workers x {args.hilos} hilos), {args.tickets} tickets, "
+                  f"{args.concurrencia} clientes durante {args.segundos:.0f} s, "
+                  f"API de CVE con {args.cve_latencia:.0f} ms y {args.cve_errores:.0%} de errores")
+            with multiprocessing.Pool(args.concurrencia) as pool:
+                start = time.perf_counter()
+                parts = pool.map(client, [(base, mezcla, args.segundos, seed) for seed in range(args.concurrencia)])
+                elapsed = time.perf_counter() - start
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=30)
+            stub.shutdown()
+        report([r for part in parts for r in part], elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Generación de una base de datos sintética con el mismo esquema que
+'incidentes.db', para las pruebas de rendimiento a escala.
+"""
+import os
+import sys
+import sqlite3
+import numpy as np
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etl_process import create_tables, dia_numero  # noqa: E402
+
+TIPOS = ["Infecciones por código malicioso", "Intrusiones o intentos de intrusión",
+         "Fallos de disponibilidad", "Compromiso de la información", "Fraude"]
+
+
+def generate_db(db_path, n_tickets, n_clientes=200, n_empleados=50, seed=42, years=11):
+    """
+    Crea 'db_path' con n_tickets tickets abiertos a lo largo de 'years' años
+    desde 2015 y entre 0 y 4 contactos por ticket. La etiqueta es_critico sigue
+    una regla sobre tipo, satisfacción y duración con un 10% de ruido.
+    """
+    rng = np.random.default_rng(seed)
+    # Generador aparte para las etiquetas: el resto de datos no cambia
+    rng_etiquetas = np.random.default_rng(seed + 1)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    create_tables(conn)
+    cur = conn.cursor()
+
+    cur.executemany("INSERT INTO tipo_incidencia (id_inci, nombre) VALUES (?, ?)",
+                    [(i + 1, nombre) for i, nombre in enumerate(TIPOS)])
+    cur.executemany("INSERT INTO cliente (id_cliente, nombre, telefono, provincia) VALUES (?, ?, ?, ?)",
+                    [(i, f"Cliente {i}", "600000000", "Madrid") for i in range(1, n_clientes + 1)])
+    cur.executemany("INSERT INTO empleado (id_emp, nombre, nivel, fecha_contrato) VALUES (?, ?, ?, ?)",
+                    [(100 + i, f"Empleado {i}", int(rng.integers(1, 4)), dia_numero("2020-01-01"))
+                     for i in range(1, n_empleados + 1)])
+
+    inicio = dia_numero(date(2015, 1, 1))
+    dias = list(range(inicio, inicio + 366 * years))
+    batch = 100_000
+    id_ticket = 0
+    for start in range(0, n_tickets, batch):
+        n = min(batch, n_tickets - start)
+        apertura = rng.integers(0, len(dias) - 20, n)
+        duracion = rng.integers(1, 11, n)
+        mant = rng.integers(0, 2, n)
+        satisf = rng.integers(0, 11, n)
+        tipo = rng.integers(1, 6, n)
+        cliente = rng.integers(1, n_clientes + 1, n)
+        n_contactos = rng.integers(0, 5, n)
+        critico = ((tipo != 1) & (satisf <= 3)) | (duracion >= 8)
+        critico ^= rng_etiquetas.random(n) < 0.1
+
+        tickets = []
+        contactos = []
+        for i in range(n):
+            id_ticket += 1
+            a = int(apertura[i])
+            tickets.append((id_ticket, dias[a], dias[a + int(duracion[i])], int(mant[i]),
+                            int(satisf[i]), int(tipo[i]), int(cliente[i]), int(critico[i])))
+            for k in range(int(n_contactos[i])):
+                contactos.append((id_ticket, 100 + int(rng.integers(1, n_empleados + 1)),
+                                  dias[a + min(k, int(duracion[i]))], float(rng.integers(1, 9)) / 2))
+        cur.executemany("""
+            INSERT INTO incidencia_ticket
+            (id_ticket, fecha_apertura, fecha_cierre, es_mantenimiento, satisfaccion_cliente, id_inci, id_cliente,
+             es_critico)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, tickets)
+        cur.executemany("INSERT INTO contacto (id_ticket, id_emp, fecha, tiempo) VALUES (?, ?, ?, ?)", contactos)
+        conn.commit()
+
+    conn.close()
+    return db_path
@@ -0,0 +1,154 @@
+import os
+import threading
+
+import pandas as pd
+
+from analytics import weekday_names, WEEKDAYS
+from etl_process import DB_NAME
+from referencias import tabla
+
+# Títulos, ejes y colores de los 5 gráficos del dashboard (comunes al PNG del
+# servidor y al dibujo en el navegador)
+CHARTS = {
+    'chart1': {'tipo': 'barras', 'titulo': 'Tiempo promedio (días) por mantenimiento',
+               'eje_x': 'Es Mantenimiento (0=No, 1=Sí)', 'eje_y': 'Tiempo Promedio (días)',
+               'color': ['#007bff', '#ffc107']},
+    'chart2': {'tipo': 'boxplot', 'titulo': 'Boxplot tiempos de resolución (por tipo_incidencia)',
+               'eje_x': 'Tipo de Incidencia', 'eje_y': 'Duración (días)', 'color': '#1f77b4'},
+    'chart3': {'tipo': 'barras', 'titulo': 'Top 5 clientes críticos',
+               'eje_x': 'Cliente', 'eje_y': 'Nº incidencias críticas', 'color': '#dc3545'},
+    'chart4': {'tipo': 'barras', 'titulo': 'Total actuaciones por empleado',
+               'eje_x': 'Empleado', 'eje_y': 'Nº actuaciones', 'color': '#17a2b8'},
+    'chart5': {'tipo': 'barras', 'titulo': 'Actuaciones por día de la semana',
+               'eje_x': 'Día', 'eje_y': 'Nº actuaciones', 'color': '#6f42c1'},
+}
+
+# pyplot guarda la figura actual en estado global: un único hilo dibuja a la vez
+_plot_lock = threading.Lock()
+
+
+def bar_aggregates(tickets, contacts):
+    """
+    Agregados de los gráficos de barras (1, 3, 4 y 5) sobre el modelo columnar,
+    con los ids de cliente y empleado aún sin nombre.
+    """
+    # Gráfico 1
+    chart1 = tickets.groupby('es_mantenimiento')['duracion'].mean()
+
+    # Gráfico 3 (Top 5 clientes críticos)
+    crit_df = tickets[(tickets['es_mantenimiento'] == 1) & (tickets['id_inci'] != 1)]
+    chart3 = crit_df.groupby('id_cliente').size().sort_values(ascending=False).head(5)
+
+    # Gráfico 4 (Actuaciones por empleado)
+    chart4 = contacts.groupby('id_emp').size()
+
+    # Gráfico 5 (Actuaciones por día de la semana)
+    chart5 = weekday_names(contacts['dia_semana']).value_counts()
+    chart5 = chart5.reindex(WEEKDAYS).dropna()
+
+    return {'chart1': chart1, 'chart3': chart3, 'chart4': chart4, 'chart5': chart5}
+
+
+def _bar_series(barras, db_name=DB_NAME):
+    """
+    Series de los gráficos de barras con los ids sustituidos por su nombre.
+    """
+    series = dict(barras)
+    series['chart3'] = pd.Series(barras['chart3'].to_numpy(),
+                                 index=tabla('clientes', db_name).nombres(barras['chart3'].index))
+    series['chart4'] = pd.Series(barras['chart4'].to_numpy(),
+                                 index=tabla('empleados', db_name).nombres(barras['chart4'].index))
+    return series
+
+
+def chart_data(barras, box_stats, db_name=DB_NAME):
+    """
+    Agregados de los 5 gráficos en un dict serializable a JSON para dibujarlos
+    en el navegador (static/js/charts.js). barras son los agregados de
+    bar_aggregates() (o de los sketches) y box_stats los resúmenes del boxplot
+    por tipo (bigotes en los percentiles 5 y 90, sin valores atípicos).
+    """
+    data = {}
+    for name, series in _bar_series(barras, db_name).items():
+        data[name] = dict(CHARTS[name],
+                          etiquetas=[str(label) for label in series.index],
+                          valores=[round(float(v), 2) for v in series.to_numpy()])
+    data['chart2'] = dict(CHARTS['chart2'],
+                          cajas=[{k: (v if k == 'label' else round(float(v), 2)) for k, v in box.items()}
+                                 for box in box_stats])
+    return data
+
+
+def chart_key(modo, desde=None, hasta=None):
+    """
+    Clave de los PNG de una petición (modo y rango de fechas): peticiones con
+    parámetros distintos no comparten ficheros.
+    """
+    return '_'.join([modo, desde.isoformat() if desde else 'inicio', hasta.isoformat() if hasta else 'fin'])
+
+
+# Generar gráficos
+def generate_charts(barras, tickets=None, box_stats=None, clave='exacto_inicio_fin'):
+    """
+    Genera los 5 gráficos del dashboard a partir de los agregados de barras en
+    static/charts/<chartN>-<clave>.png (clave de chart_key()). Si se pasa
+    box_stats (resúmenes del boxplot ya calculados, p. ej. con sketches), el
+    gráfico 2 se dibuja a partir de ellos sin recorrer las duraciones de
+    tickets.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    chart_folder = os.path.join('static', 'charts')
+    os.makedirs(chart_folder, exist_ok=True)
+    series = _bar_series(barras)
+
+    def sin_datos():
+        # Rango sin tickets: pandas no puede dibujar barras de una serie vacía
+        plt.text(0.5, 0.5, 'sin datos', ha='center', va='center', color='gray',
+                 transform=plt.gca().transAxes)
+
+    def save(name):
+        meta = CHARTS[name]
+        plt.title(meta['titulo'])
+        plt.xlabel(meta['eje_x'])
+        plt.ylabel(meta['eje_y'])
+        filename = f'charts/{name}-{clave}.png'
+        path = os.path.join('static', filename)
+        # Otro worker puede estar sirviendo el PNG: se escribe aparte y se sustituye
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        plt.tight_layout()
+        plt.savefig(tmp_path, format='png')
+        plt.close()
+        os.replace(tmp_path, path)
+        return filename
+
+    charts = {}
+    with _plot_lock:
+        for name in ('chart1', 'chart2', 'chart3', 'chart4', 'chart5'):
+            plt.figure()
+            if name == 'chart2':
+                if box_stats is not None:
+                    if box_stats:
+                        plt.gca().bxp([dict(stats, fliers=[]) for stats in box_stats])
+                    else:
+                        sin_datos()
+                else:
+                    groups = tickets.groupby('id_inci', observed=True)
+                    box_data = []
+                    labels = []
+                    for tipo, df_tipo in groups:
+                        box_data.append(df_tipo['duracion'].values)
+                        labels.append(str(tipo))
+                    if box_data:
+                        plt.boxplot(box_data, whis=[5, 90], tick_labels=labels)  # Changed 'labels' to 'tick_labels'
+                    else:
+                        sin_datos()
+            elif len(series[name]):
+                series[name].plot(kind='bar', color=CHARTS[name]['color'])
+            else:
+                sin_datos()
+            charts[name] = save(name)
+
+    return charts
@@ -0,0 +1,66 @@
+import os
+
+import requests
+
+# Base de la API de CVE; las pruebas de carga la apuntan a un servidor local
+CVE_API_BASE = os.environ.get('CVE_API_BASE', 'http://cve.circl.lu/api').rstrip('/')
+# Segundos máximos por petición, para no bloquear al worker si la API no responde
+CVE_TIMEOUT = 10
+
+
+def cveinfo(cve):
+    customheaders = {
+        "User-Agent": "Some script trying to be nice :)"
+    }
+    try:
+        res = requests.get("%s/cve/%s" % (CVE_API_BASE, cve.upper()), headers=customheaders, timeout=CVE_TIMEOUT)
+        if res.status_code == 200:
+            reply = res.json()
+            if len(reply):
+                # Buscar la descripción en inglés
+                description = next(
+                    (d.get("value") for d in reply["containers"]["cna"].get("descriptions", []) if
+                     d.get("lang") == "en"),
+                    "No hay descripción disponible"
+                )
+                return {
+                    "cve": cve.upper(),
+                    "summary": description,
+                    "published": reply["cveMetadata"].get("datePublished", "Fecha no disponible")
+                }
+        return {
+            "success": False,
+            "reason": "expected HTTP 200 status code but got %d instead for requesturl" % (res.status_code)
+        }
+    except Exception as ex:
+        return {
+            "success": False,
+            "exception": str(ex)  # Cambio a str(ex) en lugar de ex.message
+        }
+
+def cverecent(maxcves=0):
+    customheaders = {
+        "User-Agent": "Some script trying to be nice :)"
+    }
+    try:
+        res = requests.get("%s/last" % CVE_API_BASE, headers=customheaders, timeout=CVE_TIMEOUT)
+        if res.status_code == 200:
+            reply = res.json()  # Usar directamente res.json()
+            cves = list()
+            for node in reply:
+                if "REJECT" not in node.get("summary", ""):
+                    if node.get("id", "").startswith("CVE"):
+                        cves.append(node.get("id", ""))
+            return {
+                "success": True,
+                "cves": cves if maxcves == 0 else cves[:maxcves]
+            }
+        return {
+            "success": False,
+            "reason": "expected HTTP 200 status code but got %d instead for requesturl" % (res.status_code)
+        }
+    except Exception as ex:
+        return {
+            "success": False,
+            "exception": str(ex)
+        }
@@ -1,15 +1,53 @@
+import os
+import glob
+import zlib
 import sqlite3
 import json
 import random
-from datetime import datetime, timedelta
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
 
 # Nombre del archivo de la base de datos
 DB_NAME = "incidentes.db"
 
-def run_etl(json_file_path: str = "datos.json"):
+# Versión del esquema (PRAGMA user_version). La 2 guarda las fechas como nº de
+# día desde 1970-01-01 (INTEGER) y precalcula duracion y dia_semana; la 3 añade
+# la etiqueta es_critico (NULL si no se conoce) para el reentrenamiento.
+SCHEMA_VERSION = 3
+EPOCH = date(1970, 1, 1)
+
+
+def dia_numero(fecha):
+    """
+    Convierte una fecha 'YYYY-MM-DD' (o date) en nº de día desde 1970-01-01,
+    el formato de las columnas de fecha. None o '' se guardan como NULL.
+    """
+    if fecha is None or fecha == '':
+        return None
+    if isinstance(fecha, str):
+        fecha = date.fromisoformat(fecha[:10])
+    return (fecha - EPOCH).days
+
+
+def es_critico(ticket):
+    """
+    Etiqueta de criticidad de un ticket del JSON (1/0), o None si no la trae.
+    """
+    valor = ticket.get("es_critico")
+    return None if valor is None else int(bool(valor))
+
+
+def run_etl(json_file_path: str = "datos.json", workers: int = None):
     """
     Ejecuta el proceso ETL para cargar datos desde 'datos.json' a la BD SQLite 'incidentes.db'.
+    Si se indica un directorio o un patrón glob, carga todos los shards en paralelo
+    (ver run_etl_shards).
     """
+    if os.path.isdir(json_file_path) or glob.has_magic(json_file_path):
+        return run_etl_shards(json_file_path, workers)
+
     conn = sqlite3.connect(DB_NAME)
     cursor = conn.cursor()
 
@@ -18,6 +56,29 @@ def run_etl(json_file_path: str = "datos.json"):
     with open(json_file_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
+    randomize_fechas_cierre(data)
+
+    load_tipos_incidencia(data, conn)
+    load_clientes(data, conn)
+    load_empleados(data, conn)
+    load_incidentes_y_contactos(data, conn)
+
+    conn.close()
+
+    # Réplica de lectura con la carga completa y snapshot columnar para el
+    # arranque rápido de la capa analítica
+    from replica import publish_replica
+    from snapshot import write_snapshot
+    publish_replica(DB_NAME)
+    write_snapshot(DB_NAME)
+    print("Proceso ETL finalizado con éxito.")
+
+
+def randomize_fechas_cierre(data, rng=random):
+    """
+    Sustituye la fecha de cierre de cada ticket por la de apertura más un
+    número aleatorio de días (entre 1 y 10).
+    """
     # === ALEATORIZAR LA FECHA DE CIERRE ===
     for ticket in data["tickets_emitidos"]:
         fecha_apertura_str = ticket["fecha_apertura"]
@@ -25,7 +86,7 @@ def run_etl(json_file_path: str = "datos.json"):
         fecha_apertura = datetime.strptime(fecha_apertura_str, "%Y-%m-%d")
 
         # Generar un número aleatorio de días (p. ej. entre 1 y 10)
-        dias_aleatorios = random.randint(1, 10)
+        dias_aleatorios = rng.randint(1, 10)
 
         # Calcular la nueva fecha de cierre
         fecha_cierre = fecha_apertura + timedelta(days=dias_aleatorios)
@@ -34,78 +95,256 @@ def run_etl(json_file_path: str = "datos.json"):
         ticket["fecha_cierre"] = fecha_cierre.strftime("%Y-%m-%d")
     # ======================================
 
-    load_tipos_incidencia(data, conn)
-    load_clientes(data, conn)
-    load_empleados(data, conn)
-    load_incidentes_y_contactos(data, conn)
 
-    conn.close()
-    print("Proceso ETL finalizado con éxito.")
+def list_shards(path):
+    """
+    Lista ordenada de ficheros JSON de un directorio o patrón glob. El orden por
+    nombre fija el orden de carga y, con él, la asignación de id_ticket.
+    """
+    pattern = os.path.join(path, "*.json") if os.path.isdir(path) else path
+    return sorted(glob.glob(pattern))
 
 
-def create_tables(conn):
+def parse_shard(json_file_path):
+    """
+    Lee y transforma un shard en un proceso trabajador. Devuelve las tablas de
+    dimensiones tal cual y los tickets como tuplas listas para executemany.
+    La semilla se deriva del nombre del fichero para que el resultado sea
+    reproducible independientemente del proceso que lo procese.
+    """
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    seed = zlib.crc32(os.path.basename(json_file_path).encode('utf-8'))
+    randomize_fechas_cierre(data, random.Random(seed))
+
+    tickets = []
+    for ticket in data.get("tickets_emitidos", []):
+        contactos = [(int(c["id_emp"]), dia_numero(c["fecha"]), float(c["tiempo"]))
+                     for c in ticket.get("contactos_con_empleados", [])]
+        tickets.append((dia_numero(ticket["fecha_apertura"]), dia_numero(ticket["fecha_cierre"]),
+                        1 if ticket["es_mantenimiento"] else 0,
+                        int(ticket["satisfaccion_cliente"]), int(ticket["tipo_incidencia"]),
+                        int(ticket["cliente"]), es_critico(ticket), contactos))
+
+    return {
+        "shard": json_file_path,
+        "dimensiones": {key: data.get(key, []) for key in ("tipos_incidentes", "clientes", "empleados")},
+        "tickets": tickets,
+    }
+
+
+def bulk_load_shard(parsed, conn):
+    """
+    Escritor único: inserta un shard ya transformado con executemany, asignando
+    id_ticket consecutivos a partir del máximo actual.
+    """
     cursor = conn.cursor()
+    load_tipos_incidencia(parsed["dimensiones"], conn)
+    load_clientes(parsed["dimensiones"], conn)
+    load_empleados(parsed["dimensiones"], conn)
+
+    # La transacción de escritura se abre antes de leer el máximo: hasta el
+    # commit ningún otro escritor (p. ej. add_incidente) puede tomar esos id
+    cursor.execute("BEGIN IMMEDIATE")
+    next_id = cursor.execute("SELECT COALESCE(MAX(id_ticket), 0) + 1 FROM incidencia_ticket").fetchone()[0]
+    ticket_rows = []
+    contacto_rows = []
+    for offset, (*ticket, contactos) in enumerate(parsed["tickets"]):
+        id_ticket = next_id + offset
+        ticket_rows.append((id_ticket, *ticket))
+        contacto_rows.extend((id_ticket, *c) for c in contactos)
+
+    cursor.executemany("""
+        INSERT INTO incidencia_ticket
+        (id_ticket, fecha_apertura, fecha_cierre, es_mantenimiento, satisfaccion_cliente, id_inci, id_cliente,
+         es_critico)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, ticket_rows)
+    cursor.executemany("""
+        INSERT INTO contacto (id_ticket, id_emp, fecha, tiempo)
+        VALUES (?, ?, ?, ?)
+    """, contacto_rows)
+    conn.commit()
+    print(f"Shard {os.path.basename(parsed['shard'])}: {len(ticket_rows)} tickets y {len(contacto_rows)} contactos.")
 
-    # Tabla tipo_incidencia
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tipo_incidencia (
-            id_inci INTEGER PRIMARY KEY,
-            nombre TEXT
-        )
-    """)
 
-    # Tabla cliente
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS cliente (
-            id_cliente INTEGER PRIMARY KEY,
-            nombre TEXT,
-            telefono TEXT,
-            provincia TEXT
-        )
-    """)
+def run_etl_shards(path: str, workers: int = None):
+    """
+    Carga en paralelo todos los shards JSON de un directorio o patrón glob.
+    Los shards se parsean y transforman en un pool de procesos y un único
+    escritor los inserta en orden de nombre, de modo que la asignación de
+    id_ticket es determinista. Como mucho hay 2 * workers shards en vuelo.
+    """
+    shards = list_shards(path)
+    if not shards:
+        print(f"No se han encontrado shards JSON en '{path}'.")
+        return
 
-    # Tabla empleado
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS empleado (
+    workers = workers or os.cpu_count() or 1
+    conn = sqlite3.connect(DB_NAME)
+    create_tables(conn)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        shard_iter = iter(shards)
+        for shard in shard_iter:
+            pending.append(pool.submit(parse_shard, shard))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            parsed = pending.popleft().result()
+            next_shard = next(shard_iter, None)
+            if next_shard is not None:
+                pending.append(pool.submit(parse_shard, next_shard))
+            bulk_load_shard(parsed, conn)
+
+    conn.close()
+
+    # Réplica de lectura y snapshot columnar tras la carga masiva: hasta aquí los
+    # lectores siguen viendo la réplica anterior, nunca shards a medias
+    from replica import publish_replica
+    from snapshot import write_snapshot
+    publish_replica(DB_NAME)
+    write_snapshot(DB_NAME)
+    print(f"Proceso ETL finalizado con éxito ({len(shards)} shards).")
+
+
+# Tablas con fechas; {tabla} permite crear la copia de la migración
+_DDL_FECHAS = {
+    'empleado': """
+        CREATE TABLE IF NOT EXISTS {tabla} (
             id_emp INTEGER PRIMARY KEY,
             nombre TEXT,
             nivel INTEGER,
-            fecha_contrato TEXT
+            fecha_contrato INTEGER  -- nº de día desde 1970-01-01
         )
-    """)
-
-    # Tabla incidencia_ticket
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS incidencia_ticket (
+    """,
+    'incidencia_ticket': """
+        CREATE TABLE IF NOT EXISTS {tabla} (
             id_ticket INTEGER PRIMARY KEY AUTOINCREMENT,
-            fecha_apertura TEXT,
-            fecha_cierre TEXT,  
+            fecha_apertura INTEGER,  -- nº de día desde 1970-01-01
+            fecha_cierre INTEGER,
             es_mantenimiento BOOLEAN,
             satisfaccion_cliente INTEGER,
             id_inci INTEGER,
             id_cliente INTEGER,
+            es_critico INTEGER,  -- 1/0, NULL si no está etiquetado
+            duracion INTEGER GENERATED ALWAYS AS (fecha_cierre - fecha_apertura) STORED,
+            dia_semana INTEGER GENERATED ALWAYS AS ((fecha_apertura + 3) % 7) STORED,  -- 0=lunes
             FOREIGN KEY (id_inci) REFERENCES tipo_incidencia(id_inci),
             FOREIGN KEY (id_cliente) REFERENCES cliente(id_cliente)
         )
-    """)
-
-    # Tabla contacto (entidad asociativa)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS contacto (
+    """,
+    'contacto': """
+        CREATE TABLE IF NOT EXISTS {tabla} (
             id_contacto INTEGER PRIMARY KEY AUTOINCREMENT,
             id_ticket INTEGER,
             id_emp INTEGER,
-            fecha TEXT,
+            fecha INTEGER,  -- nº de día desde 1970-01-01
             tiempo REAL,
+            dia_semana INTEGER GENERATED ALWAYS AS ((fecha + 3) % 7) STORED,
             FOREIGN KEY (id_ticket) REFERENCES incidencia_ticket(id_ticket),
             FOREIGN KEY (id_emp) REFERENCES empleado(id_emp)
         )
+    """,
+}
+
+# Columnas que se copian en la migración y cuáles de ellas son fechas TEXT
+_COLUMNAS_FECHAS = {
+    'empleado': (('id_emp', 'nombre', 'nivel', 'fecha_contrato'), ('fecha_contrato',)),
+    'incidencia_ticket': (('id_ticket', 'fecha_apertura', 'fecha_cierre', 'es_mantenimiento',
+                           'satisfaccion_cliente', 'id_inci', 'id_cliente'),
+                          ('fecha_apertura', 'fecha_cierre')),
+    'contacto': (('id_contacto', 'id_ticket', 'id_emp', 'fecha', 'tiempo'), ('fecha',)),
+}
+
+
+def create_tables(conn):
+    cursor = conn.cursor()
+
+    # WAL: las copias para la réplica de lectura no bloquean a los escritores
+    cursor.execute("PRAGMA journal_mode=WAL")
+
+    # Tabla tipo_incidencia
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tipo_incidencia (
+            id_inci INTEGER PRIMARY KEY,
+            nombre TEXT
+        )
+    """)
+
+    # Tabla cliente
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cliente (
+            id_cliente INTEGER PRIMARY KEY,
+            nombre TEXT,
+            telefono TEXT,
+            provincia TEXT
+        )
     """)
 
+    # Tablas empleado, incidencia_ticket y contacto (entidad asociativa)
+    for tabla, ddl in _DDL_FECHAS.items():
+        cursor.execute(ddl.format(tabla=tabla))
+
+    migrate_schema(conn)
+
+    # Índices para las agregaciones de los rankings (GROUP BY en SQLite)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticket_cliente ON incidencia_ticket(id_cliente)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticket_inci ON incidencia_ticket(id_inci)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticket_apertura ON incidencia_ticket(fecha_apertura)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacto_emp ON contacto(id_emp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contacto_ticket ON contacto(id_ticket)")
+
     conn.commit()
     print("Tablas creadas o verificadas correctamente.")
 
 
+def migrate_schema(conn):
+    """
+    Lleva una BD anterior a SCHEMA_VERSION en una única transacción. Desde la
+    versión 1 (fechas 'YYYY-MM-DD' en TEXT) reconstruye empleado,
+    incidencia_ticket y contacto con las fechas como nº de día y las columnas
+    precalculadas; desde la 2 solo añade es_critico. Los índices se vuelven a
+    crear en create_tables().
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    conn.commit()
+    columnas = {row[1] for row in conn.execute("PRAGMA table_xinfo(incidencia_ticket)")}
+    conn.execute("BEGIN")
+    try:
+        if 'duracion' not in columnas:
+            for tabla, ddl in _DDL_FECHAS.items():
+                cols, fechas = _COLUMNAS_FECHAS[tabla]
+                select = ', '.join(f"CAST(julianday({c}) - 2440587.5 AS INTEGER)" if c in fechas else c
+                                   for c in cols)
+                conn.execute(ddl.format(tabla=f"{tabla}_v{SCHEMA_VERSION}"))
+                conn.execute(f"INSERT INTO {tabla}_v{SCHEMA_VERSION} ({', '.join(cols)}) SELECT {select} FROM {tabla}")
+                conn.execute(f"DROP TABLE {tabla}")
+                conn.execute(f"ALTER TABLE {tabla}_v{SCHEMA_VERSION} RENAME TO {tabla}")
+            print(f"Esquema migrado a la versión {SCHEMA_VERSION} (fechas como nº de día).")
+        elif 'es_critico' not in columnas:
+            conn.execute("ALTER TABLE incidencia_ticket ADD COLUMN es_critico INTEGER")
+            print(f"Esquema migrado a la versión {SCHEMA_VERSION} (etiqueta es_critico).")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def ensure_schema(db_name=DB_NAME):
+    """
+    Crea o migra el esquema de una BD existente (para el arranque de la app).
+    """
+    conn = sqlite3.connect(db_name)
+    create_tables(conn)
+    conn.close()
+
+
 def load_tipos_incidencia(data, conn):
     cursor = conn.cursor()
     tipos = data.get("tipos_incidentes", [])
@@ -147,7 +386,7 @@ def load_empleados(data, conn):
         id_emp = int(emp["id_emp"])
         nombre = emp["nombre"]
         nivel = int(emp["nivel"])
-        fecha_contrato = emp["fecha_contrato"]
+        fecha_contrato = dia_numero(emp["fecha_contrato"])
 
         cursor.execute("""
             INSERT OR IGNORE INTO empleado (id_emp, nombre, nivel, fecha_contrato)
@@ -165,8 +404,8 @@ def load_incidentes_y_contactos(data, conn):
     for ticket in tickets:
         # Datos principales del incidente
         cliente = int(ticket["cliente"])
-        fecha_apertura = ticket["fecha_apertura"]
-        fecha_cierre = ticket["fecha_cierre"]
+        fecha_apertura = dia_numero(ticket["fecha_apertura"])
+        fecha_cierre = dia_numero(ticket["fecha_cierre"])
         es_mantenimiento = 1 if ticket["es_mantenimiento"] else 0
         satisfaccion = int(ticket["satisfaccion_cliente"])
         tipo_incidencia = int(ticket["tipo_incidencia"])
@@ -174,9 +413,10 @@ def load_incidentes_y_contactos(data, conn):
         # Insertar el ticket en 'incidencia_ticket'
         cursor.execute("""
             INSERT INTO incidencia_ticket 
-            (fecha_apertura, fecha_cierre, es_mantenimiento, satisfaccion_cliente, id_inci, id_cliente)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (fecha_apertura, fecha_cierre, es_mantenimiento, satisfaccion, tipo_incidencia, cliente))
+            (fecha_apertura, fecha_cierre, es_mantenimiento, satisfaccion_cliente, id_inci, id_cliente, es_critico)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (fecha_apertura, fecha_cierre, es_mantenimiento, satisfaccion, tipo_incidencia, cliente,
+              es_critico(ticket)))
 
         # Obtener el ID autogenerado del ticket
         id_ticket = cursor.lastrowid
@@ -185,7 +425,7 @@ def load_incidentes_y_contactos(data, conn):
         contactos = ticket.get("contactos_con_empleados", [])
         for c in contactos:
             id_emp = int(c["id_emp"])
-            fecha_contacto = c["fecha"]
+            fecha_contacto = dia_numero(c["fecha"])
             tiempo = float(c["tiempo"])
 
             cursor.execute("""
@@ -198,4 +438,10 @@ def load_incidentes_y_contactos(data, conn):
 
 
 if __name__ == "__main__":
-    run_etl("datos.json")
+    parser = argparse.ArgumentParser(description="Carga datos JSON en la BD SQLite.")
+    parser.add_argument("ruta", nargs="?", default="datos.json",
+                        help="fichero JSON, directorio de shards o patrón glob")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="procesos para parsear shards (por defecto, nº de CPUs)")
+    args = parser.parse_args()
+    run_etl(args.ruta, args.workers)
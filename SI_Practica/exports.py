@@ -0,0 +1,114 @@
+"""
+Exportación en streaming de tickets, contactos y la vista unida, en CSV o NDJSON.
+
+Las filas se leen de la réplica de lectura con un cursor de SQLite en bloques de
+EXPORT_CHUNK (fetchmany) y se codifican bloque a bloque en un generador, así que
+la memoria no depende del tamaño de la exportación y el primer byte sale en
+cuanto SQLite devuelve el primer bloque. Las fechas se convierten a 'YYYY-MM-DD'
+en la propia consulta.
+
+Las filas salen en el orden del índice que recorre la consulta (ver ORDEN): por
+id, por ticket si se filtra por tipo y, con rango de fechas, por fecha de
+apertura y id (idx_ticket_apertura). Así SQLite no tiene que ordenar el
+resultado en un B-tree temporal antes de devolver la primera fila.
+"""
+import csv
+import io
+import json
+
+from etl_process import DB_NAME
+from replica import connect_read
+from top_queries import filtro_apertura
+
+# Filas por bloque leído del cursor y escrito en la respuesta
+EXPORT_CHUNK = 5000
+
+FORMATOS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+_TICKET_COLS = """
+    t.id_ticket, date(t.fecha_apertura + 2440587.5) AS fecha_apertura,
+    date(t.fecha_cierre + 2440587.5) AS fecha_cierre, t.duracion,
+    t.es_mantenimiento, t.satisfaccion_cliente, t.id_inci, t.id_cliente
+"""
+_CONTACTO_COLS = """
+    co.id_contacto, co.id_ticket, co.id_emp, date(co.fecha + 2440587.5) AS fecha, co.tiempo
+"""
+
+# Consulta base de cada exportación; {join}, {where} y {orden} se completan con los filtros
+EXPORTS = {
+    'tickets': f"""
+        SELECT {_TICKET_COLS}
+        FROM incidencia_ticket t
+        WHERE 1 = 1{{where}}
+        ORDER BY {{orden}}
+    """,
+    'contactos': f"""
+        SELECT {_CONTACTO_COLS}
+        FROM contacto co
+        {{join}}
+        WHERE 1 = 1{{where}}
+        ORDER BY {{orden}}
+    """,
+    'tickets_contactos': f"""
+        SELECT {_TICKET_COLS}, co.id_emp, date(co.fecha + 2440587.5) AS fecha_contacto, co.tiempo
+        FROM incidencia_ticket t
+        LEFT JOIN contacto co ON co.id_ticket = t.id_ticket
+        WHERE 1 = 1{{where}}
+        ORDER BY {{orden}}
+    """,
+}
+
+# Orden de cada exportación (sin filtros, solo por tipo, con rango de fechas)
+ORDEN = {
+    'tickets': ('t.id_ticket', 't.id_ticket', 't.fecha_apertura, t.id_ticket'),
+    'contactos': ('co.id_contacto', 't.id_ticket, co.id_contacto', 't.fecha_apertura, t.id_ticket, co.id_contacto'),
+    'tickets_contactos': ('t.id_ticket, co.id_contacto', 't.id_ticket, co.id_contacto',
+                          't.fecha_apertura, t.id_ticket, co.id_contacto'),
+}
+
+
+def _export_query(nombre, desde=None, hasta=None, tipo=None):
+    where, params = filtro_apertura(desde, hasta)
+    rango = bool(where)
+    orden = ORDEN[nombre][2 if rango else 1 if tipo is not None else 0]
+    if tipo is not None:
+        # Con rango, '+' descarta idx_ticket_inci: el tipo se filtra sobre las
+        # filas del índice de fechas, que ya vienen en el orden de salida
+        where += " AND +t.id_inci = ?" if rango else " AND t.id_inci = ?"
+        params.append(tipo)
+    join = "JOIN incidencia_ticket t ON t.id_ticket = co.id_ticket" if where else ""
+    return EXPORTS[nombre].format(join=join, where=where, orden=orden), params
+
+
+def _encode_csv(columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue()
+
+
+def _encode_ndjson(columns, rows):
+    return ''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+
+
+def stream_export(nombre, formato, desde=None, hasta=None, tipo=None, db_name=DB_NAME, chunk=EXPORT_CHUNK):
+    """
+    Generador de bloques de texto de la exportación 'nombre' (ver EXPORTS) en
+    'formato' (csv o ndjson), filtrada por fecha de apertura (datetime.date) y
+    tipo de incidencia.
+    """
+    query, params = _export_query(nombre, desde, hasta, tipo)
+    encode = _encode_csv if formato == 'csv' else _encode_ndjson
+    conn = connect_read(db_name)
+    try:
+        cursor = conn.execute(query, params)
+        columns = [d[0] for d in cursor.description]
+        if formato == 'csv':
+            # La cabecera sale antes de leer ninguna fila
+            yield encode(columns, [columns])
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            yield encode(columns, rows)
+    finally:
+        conn.close()
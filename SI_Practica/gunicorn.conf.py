@@ -0,0 +1,34 @@
+"""
+Configuración de gunicorn para servir la aplicación con varios workers
+(gunicorn -c gunicorn.conf.py wsgi:app, desde SI_Practica/).
+
+Variables de entorno:
+    SI_BIND     dirección de escucha (por defecto 127.0.0.1:8000)
+    SI_WORKERS  nº de procesos (por defecto, nº de núcleos)
+    SI_THREADS  hilos por worker (por defecto 4; con más de 1 se usa gthread)
+    SI_TIMEOUT  segundos antes de reiniciar un worker bloqueado (por defecto 120)
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('SI_BIND', '127.0.0.1:8000')
+# Las rutas analíticas son de CPU (pandas, matplotlib): un proceso por núcleo,
+# y hilos para que las de E/S (CVE, descargas) no bloqueen al worker
+workers = int(os.environ.get('SI_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('SI_THREADS', 4))
+timeout = int(os.environ.get('SI_TIMEOUT', 120))
+
+# Carga la aplicación (wsgi.py) en el maestro antes de crear los workers
+preload_app = True
+
+accesslog = '-'
+
+
+def when_ready(server):
+    # Tras la precarga y antes del primer fork: los objetos ya creados pasan a la
+    # generación permanente y el GC de los workers no los toca (si los recorriera
+    # escribiría en sus cabeceras y se copiarían las páginas compartidas)
+    gc.collect()
+    gc.freeze()
+    server.log.info("Aplicación precargada: %d objetos congelados", gc.get_freeze_count())
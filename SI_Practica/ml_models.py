@@ -0,0 +1,107 @@
+import logging
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ['es_mantenimiento', 'satisfaccion_cliente', 'tipo_incidencia', 'duracion', 'num_contactos', 'tiempo_total']
+
+MODELS_DIR = 'models'
+MODEL_FILES = {
+    'lr': 'logistic_regression_model.pkl',
+    'dt': 'decision_tree_model.pkl',
+    'rf': 'random_forest_model.pkl',
+}
+
+# En un módulo importable (no en online_training.py, que también se ejecuta como
+# script): joblib guarda la ruta de la clase y un modelo publicado desde
+# __main__ no se podría cargar en la app
+class OnlineLogit:
+    """
+    Regresión logística entrenable por lotes: SGDClassifier con log-loss sobre
+    las características escaladas con un StandardScaler también incremental.
+    """
+
+    def __init__(self, random_state=42):
+        self.classes_ = np.array([0, 1])
+        self.scaler = StandardScaler()
+        self.sgd = SGDClassifier(loss='log_loss', random_state=random_state)
+
+    def partial_fit(self, X, y):
+        self.scaler.partial_fit(X)
+        self.sgd.partial_fit(self.scaler.transform(X), y, classes=self.classes_)
+        return self
+
+    def predict(self, X):
+        return self.sgd.predict(self.scaler.transform(X))
+
+    def predict_proba(self, X):
+        return self.sgd.predict_proba(self.scaler.transform(X))
+
+
+# Los modelos se cargan una vez por proceso y versión publicada (models/CURRENT)
+_loaded = (None, None)  # (versión, modelos)
+
+
+def current_version(models_dir=MODELS_DIR):
+    """
+    Nombre de la versión publicada por el reentrenamiento (online_training.py),
+    o None si solo están los modelos de train_models.py en models/.
+    """
+    try:
+        with open(os.path.join(models_dir, 'CURRENT'), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version if os.path.isdir(os.path.join(models_dir, version)) else None
+
+
+def load_version(version=None, models_dir=MODELS_DIR):
+    """
+    Carga desde disco los tres modelos de una versión (o los de models/ si es
+    None). Cada llamada devuelve objetos nuevos.
+    """
+    base_dir = os.path.join(models_dir, version) if version else models_dir
+    return {key: joblib.load(os.path.join(base_dir, filename)) for key, filename in MODEL_FILES.items()}
+
+
+def load_versioned_models():
+    """
+    (versión, modelos) publicados. Si el reentrenamiento publica una versión
+    nueva, se carga en la siguiente llamada; hasta entonces se sigue sirviendo
+    la anterior.
+    """
+    global _loaded
+    version = current_version()
+    loaded_version, models = _loaded
+    if models is not None and version == loaded_version:
+        return _loaded
+    try:
+        models = load_version(version)
+    except Exception as e:
+        logger.error(f"Error al cargar los modelos: {e}")
+        return _loaded
+    _loaded = (version, models)
+    if version:
+        logger.info("Modelos de la versión %s cargados", version)
+    return _loaded
+
+
+# Función para cargar los modelos
+def load_models():
+    return load_versioned_models()[1]
+
+
+def predict_criticality(model, features):
+    """
+    Devuelve (predicción, probabilidad de ser crítico) para un único ticket.
+    """
+    df = pd.DataFrame({name: [features[name]] for name in FEATURES})
+    prediccion = model.predict(df)[0]
+    probabilidad = model.predict_proba(df)[0][1]  # Probabilidad de ser crítico
+    return prediccion, probabilidad
@@ -0,0 +1,208 @@
+"""
+Reentrenamiento incremental de los modelos de criticidad con los tickets
+etiquetados (columna es_critico) que han llegado desde el último entrenamiento.
+
+- Regresión logística: OnlineLogit (ml_models.py; SGD con log-loss y escalado
+  incremental) se actualiza con partial_fit solo con los tickets posteriores a
+  su marca de agua.
+- Random Forest: warm_start, añade RF_TREES_PER_BATCH árboles entrenados con el
+  lote nuevo y conserva como mucho los RF_MAX_TREES más recientes.
+- Árbol de decisión: no admite entrenamiento incremental, se reentrena por lotes
+  con todos los tickets etiquetados.
+
+Los árboles se actualizan cuando hay TREE_BATCH tickets pendientes con las dos
+clases. Cada actualización se publica como una versión nueva en
+models/<version>/ (modelos + meta.json con las marcas de agua) y el puntero
+models/CURRENT, de forma atómica como los snapshots: ml_models.load_models() la
+recoge en la siguiente predicción sin parar el servicio.
+
+Se lanza en segundo plano tras add_incidente con etiqueta, o a mano / desde cron:
+    python online_training.py [--forzar]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from etl_process import DB_NAME
+from ml_models import FEATURES, MODELS_DIR, MODEL_FILES, OnlineLogit, current_version, load_version
+from replica import connect_read
+
+logger = logging.getLogger(__name__)
+
+# Tickets etiquetados nuevos necesarios para actualizar cada modelo
+LR_BATCH = 20
+TREE_BATCH = 200
+RF_TREES_PER_BATCH = 10
+RF_MAX_TREES = 300
+# Nº de versiones anteriores que se conservan
+KEEP_VERSIONS = 3
+
+# Mismas características que train_models.py, calculadas en SQLite
+LABELLED_QUERY = """
+    SELECT t.id_ticket, t.es_mantenimiento, t.satisfaccion_cliente, t.id_inci AS tipo_incidencia,
+           t.duracion, COUNT(co.id_contacto) AS num_contactos,
+           COALESCE(SUM(co.tiempo), 0) AS tiempo_total, t.es_critico
+    FROM incidencia_ticket t
+    LEFT JOIN contacto co ON co.id_ticket = t.id_ticket
+    WHERE t.es_critico IS NOT NULL AND t.id_ticket > ?
+    GROUP BY t.id_ticket
+    ORDER BY t.id_ticket
+"""
+
+_train_lock = threading.Lock()
+
+
+def read_labelled(db_name=DB_NAME, after_id=0):
+    """
+    Características y etiqueta de los tickets etiquetados con id > after_id.
+    """
+    conn = connect_read(db_name)
+    try:
+        return pd.read_sql_query(LABELLED_QUERY, conn, params=(after_id,))
+    finally:
+        conn.close()
+
+
+def read_meta(version, models_dir=MODELS_DIR):
+    """
+    Marcas de agua (último id_ticket usado) de la versión publicada.
+    """
+    meta = {'watermark': 0, 'tree_watermark': 0}
+    if version:
+        with open(os.path.join(models_dir, version, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta.update(json.load(f))
+    return meta
+
+
+def _grow_forest(rf, X, y):
+    rf.set_params(warm_start=True, n_estimators=len(rf.estimators_) + RF_TREES_PER_BATCH)
+    rf.fit(X, y)
+    if len(rf.estimators_) > RF_MAX_TREES:
+        rf.estimators_ = rf.estimators_[-RF_MAX_TREES:]
+        rf.n_estimators = RF_MAX_TREES
+    return rf
+
+
+def update_models(db_name=DB_NAME, models_dir=MODELS_DIR, forzar=False):
+    """
+    Actualiza los modelos con los tickets etiquetados pendientes y publica una
+    versión nueva. Con forzar se ignoran los tamaños mínimos de lote. Devuelve
+    la versión publicada o None si no había suficientes tickets nuevos.
+    """
+    with _train_lock:
+        version = current_version(models_dir)
+        meta = read_meta(version, models_dir)
+        try:
+            models = load_version(version, models_dir)
+        except FileNotFoundError:
+            models = {}
+        except Exception:
+            # Versión ilegible (p. ej. publicada con una clase que ya no se
+            # puede importar): se reentrena desde cero en lugar de quedarse atascado
+            logger.exception("No se pudieron cargar los modelos de la versión %s", version)
+            models = {}
+
+        # Sin modelo online (p. ej. la LogisticRegression de train_models.py) o sin
+        # árboles se entrena con todo el histórico etiquetado, sin lote mínimo
+        lr_online = isinstance(models.get('lr'), OnlineLogit)
+        hay_arboles = 'dt' in models and 'rf' in models
+        lr_desde = meta['watermark'] if lr_online else 0
+        arboles_desde = meta['tree_watermark'] if hay_arboles else 0
+        df = read_labelled(db_name, min(lr_desde, arboles_desde))
+        if df.empty:
+            return None
+
+        cambios = False
+        nuevos = df[df['id_ticket'] > lr_desde]
+        if len(nuevos) >= (1 if forzar or not lr_online else LR_BATCH):
+            lr = models['lr'] if lr_online else OnlineLogit()
+            models['lr'] = lr.partial_fit(nuevos[FEATURES], nuevos['es_critico'])
+            meta['watermark'] = int(nuevos['id_ticket'].iloc[-1])
+            cambios = True
+
+        pendientes = df[df['id_ticket'] > arboles_desde]
+        minimo = 1 if forzar or not hay_arboles else TREE_BATCH
+        if len(pendientes) >= minimo and pendientes['es_critico'].nunique() == 2:
+            todos = df if arboles_desde == 0 else read_labelled(db_name)
+            models['dt'] = DecisionTreeClassifier(random_state=42).fit(todos[FEATURES], todos['es_critico'])
+            if hay_arboles:
+                models['rf'] = _grow_forest(models['rf'], pendientes[FEATURES], pendientes['es_critico'])
+            else:
+                models['rf'] = RandomForestClassifier(random_state=42).fit(todos[FEATURES], todos['es_critico'])
+            meta['tree_watermark'] = int(pendientes['id_ticket'].iloc[-1])
+            cambios = True
+
+        if not cambios:
+            return None
+        if set(models) != set(MODEL_FILES):
+            logger.info("Reentrenamiento pospuesto: faltan tickets etiquetados para los árboles")
+            return None
+        return publish_models(models, meta, models_dir)
+
+
+def publish_models(models, meta, models_dir=MODELS_DIR, tablas=True):
+    """
+    Guarda los modelos en una versión nueva y la publica en models/CURRENT.
+    Con tablas se precalculan además sus tablas de probabilidad (scoring.py).
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    version = f"v-{time.time_ns()}-{os.getpid()}"
+    tmp_dir = os.path.join(models_dir, '.' + version)
+    os.makedirs(tmp_dir)
+    for key, filename in MODEL_FILES.items():
+        joblib.dump(models[key], os.path.join(tmp_dir, filename))
+    if tablas:
+        from scoring import write_tables
+        write_tables(models, tmp_dir)
+    meta = dict(meta, version=version, creado=datetime.now().isoformat(timespec='seconds'))
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_dir, os.path.join(models_dir, version))
+
+    pointer_tmp = os.path.join(models_dir, f".CURRENT-{os.getpid()}")
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(models_dir, 'CURRENT'))
+
+    anteriores = sorted(d for d in os.listdir(models_dir) if d.startswith('v-') and d != version)
+    for old in anteriores[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(models_dir, old), ignore_errors=True)
+    logger.info("Modelos publicados en la versión %s (marca de agua %s)", version, meta['watermark'])
+    return version
+
+
+def _update_background(db_name):
+    try:
+        update_models(db_name)
+    except Exception:
+        logger.exception("Error en el reentrenamiento incremental")
+
+
+def schedule_update(db_name=DB_NAME):
+    """
+    Lanza update_models() en un hilo en segundo plano si no hay ya un
+    reentrenamiento en curso.
+    """
+    if _train_lock.locked():
+        return False
+    threading.Thread(target=_update_background, args=(db_name,), name='online-training', daemon=True).start()
+    return True
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Reentrena los modelos con los tickets etiquetados nuevos.")
+    parser.add_argument('--forzar', action='store_true', help="ignora los tamaños mínimos de lote")
+    args = parser.parse_args()
+    publicada = update_models(forzar=args.forzar)
+    print(f"Versión publicada: {publicada}" if publicada else "Sin tickets etiquetados suficientes.")
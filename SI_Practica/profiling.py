@@ -0,0 +1,140 @@
+"""
+Perfilado opcional de memoria con tracemalloc, por ruta y por etapa.
+
+Se activa con SI_PROFILE_MEMORY=1 (SI_PROFILE_FRAMES fija los frames de cada
+traza, 1 por defecto). Para cada ruta y cada etapa con nombre (stage()) se
+registra el pico de memoria sobre la que había al empezar y la memoria que
+sigue ocupada al terminar (retenida). /debug/memoria devuelve esas cifras y
+los sitios con más memoria asignada en ese momento.
+
+El pico de tracemalloc es global al proceso: las cifras son exactas con un
+hilo por worker (SI_THREADS=1) o con el cliente de pruebas de Flask.
+Desactivado, stage() no hace nada.
+"""
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from flask import jsonify, request
+
+ENABLED = os.environ.get('SI_PROFILE_MEMORY', '') not in ('', '0')
+FRAMES = int(os.environ.get('SI_PROFILE_FRAMES', 1))
+
+MB = 1024 * 1024
+
+_stats = {}
+_stats_lock = threading.Lock()
+_local = threading.local()
+
+
+def _enter():
+    current, peak = tracemalloc.get_traced_memory()
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    if stack:
+        # El pico hasta aquí cuenta para la medición que nos contiene
+        stack[-1][1] = max(stack[-1][1], peak)
+    tracemalloc.reset_peak()
+    stack.append([current, current])  # [memoria al empezar, pico visto]
+
+
+def _exit(tipo, nombre):
+    current, peak = tracemalloc.get_traced_memory()
+    start, seen = _local.stack.pop()
+    peak = max(peak, seen)
+    if _local.stack:
+        _local.stack[-1][1] = max(_local.stack[-1][1], peak)
+    _record(tipo, nombre, peak - start, current - start)
+
+
+def _record(tipo, nombre, pico, retenido):
+    with _stats_lock:
+        s = _stats.setdefault((tipo, nombre), {'llamadas': 0, 'pico_max': 0, 'pico_ultimo': 0,
+                                               'retenido_ultimo': 0, 'retenido_total': 0})
+        s['llamadas'] += 1
+        s['pico_max'] = max(s['pico_max'], pico)
+        s['pico_ultimo'] = pico
+        s['retenido_ultimo'] = retenido
+        s['retenido_total'] += retenido
+
+
+@contextmanager
+def stage(nombre):
+    """
+    Mide una etapa con nombre (lectura, métricas, gráficos, PDF...) dentro de
+    la petición en curso.
+    """
+    if not ENABLED:
+        yield
+        return
+    _enter()
+    try:
+        yield
+    finally:
+        _exit('etapa', nombre)
+
+
+def memory_stats():
+    """
+    Pico y memoria retenida (MB) por ruta y por etapa desde el arranque.
+    """
+    with _stats_lock:
+        items = list(_stats.items())
+    result = {'rutas': {}, 'etapas': {}}
+    for (tipo, nombre), s in items:
+        result['rutas' if tipo == 'ruta' else 'etapas'][nombre] = {
+            'llamadas': s['llamadas'],
+            'pico_max_mb': round(s['pico_max'] / MB, 2),
+            'pico_ultimo_mb': round(s['pico_ultimo'] / MB, 2),
+            'retenido_ultimo_mb': round(s['retenido_ultimo'] / MB, 2),
+            'retenido_total_mb': round(s['retenido_total'] / MB, 2),
+        }
+    return result
+
+
+def top_allocations(limit=10, agrupar='lineno'):
+    """
+    Sitios con más memoria asignada ahora mismo ('lineno', 'filename' o
+    'traceback', este último con SI_PROFILE_FRAMES > 1).
+    """
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+    return [{'sitio': stat.traceback.format(), 'kb': round(stat.size / 1024, 1), 'bloques': stat.count}
+            for stat in snapshot.statistics(agrupar)[:limit]]
+
+
+def debug_memoria():
+    """Vista /debug/memoria: ?top=N&agrupar=lineno|filename|traceback"""
+    agrupar = request.args.get('agrupar', 'lineno')
+    if agrupar not in ('lineno', 'filename', 'traceback'):
+        agrupar = 'lineno'
+    current, peak = tracemalloc.get_traced_memory()
+    return jsonify(dict(memory_stats(),
+                        actual_mb=round(current / MB, 2),
+                        top=top_allocations(request.args.get('top', 10, type=int), agrupar)))
+
+
+def init_profiling(app):
+    """
+    Si el perfilado está activado, arranca tracemalloc, mide cada petición y
+    registra /debug/memoria.
+    """
+    if not ENABLED:
+        return
+    tracemalloc.start(FRAMES)
+
+    @app.before_request
+    def _profile_start():
+        _enter()
+
+    @app.teardown_request
+    def _profile_end(exc):
+        if getattr(_local, 'stack', None):
+            _exit('ruta', request.url_rule.rule if request.url_rule else request.path)
+
+    app.add_url_rule('/debug/memoria', 'debug_memoria', debug_memoria)
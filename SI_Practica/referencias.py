@@ -0,0 +1,100 @@
+"""
+Caché de los datos de referencia: clientes, empleados y tipos de incidencia.
+
+Son tablas pequeñas que casi todas las rutas usan para poner nombre a los ids.
+Se leen una vez por proceso y versión de las dimensiones: la firma es el
+puntero DIMENSIONES de replica.py (cambia tras la ETL o el arranque, no con
+add_incidente, que solo añade tickets) o, si todavía no hay réplica, el tamaño
+y la fecha de modificación de la BD. Cada tabla guarda el DataFrame, las filas
+para los desplegables y los ids ordenados con su nombre, de modo que una columna
+o un índice de ids se traduce con un único searchsorted en lugar de un dict y un
+map fila a fila.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from etl_process import DB_NAME
+from replica import connect_read, dimensions_version
+
+# Consulta, columna del id y prefijo del nombre de los ids que no están en la tabla
+TABLAS = {
+    'clientes': ("SELECT id_cliente, nombre FROM cliente ORDER BY id_cliente", 'id_cliente', 'Cliente'),
+    'empleados': ("SELECT id_emp, nombre, nivel FROM empleado ORDER BY id_emp", 'id_emp', 'Emp'),
+    'tipos': ("SELECT id_inci, nombre FROM tipo_incidencia ORDER BY id_inci", 'id_inci', 'Tipo'),
+}
+
+_cache = {}  # db_name -> (firma, {tabla: Referencia})
+_cache_lock = threading.Lock()
+
+
+class Referencia:
+    """
+    Una tabla de referencia: DataFrame, filas como dicts e ids ordenados con
+    su nombre para las búsquedas vectorizadas.
+    """
+
+    def __init__(self, df, id_col, prefijo):
+        self.df = df
+        self.prefijo = prefijo
+        self.ids = df[id_col].to_numpy(dtype=np.int64)
+        self.nombres_por_id = df['nombre'].to_numpy(dtype=object)
+        self.rows = df.to_dict('records')
+
+    def nombres(self, ids):
+        """
+        Nombre de cada id (array de objetos); los que no están en la tabla se
+        nombran '<prefijo> <id>'.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        result = np.empty(len(ids), dtype=object)
+        if len(self.ids):
+            pos = np.searchsorted(self.ids, ids).clip(max=len(self.ids) - 1)
+            found = self.ids[pos] == ids
+            result[found] = self.nombres_por_id[pos[found]]
+        else:
+            found = np.zeros(len(ids), dtype=bool)
+        result[~found] = [f"{self.prefijo} {i}" for i in ids[~found]]
+        return result
+
+
+def _firma(db_name):
+    version = dimensions_version(db_name)
+    if version is not None:
+        return version
+    try:
+        st = os.stat(db_name)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _leer(db_name):
+    conn = connect_read(db_name)
+    try:
+        return {nombre: Referencia(pd.read_sql_query(query, conn), id_col, prefijo)
+                for nombre, (query, id_col, prefijo) in TABLAS.items()}
+    finally:
+        conn.close()
+
+
+def referencias(db_name=DB_NAME):
+    """
+    Las tablas de referencia ({'clientes', 'empleados', 'tipos'}) de la versión
+    actual de la BD. Los objetos se comparten entre peticiones: no deben
+    modificarse.
+    """
+    firma = _firma(db_name)
+    with _cache_lock:
+        cached = _cache.get(db_name)
+        if cached is not None and cached[0] == firma:
+            return cached[1]
+        tablas = _leer(db_name)
+        _cache[db_name] = (firma, tablas)
+        return tablas
+
+
+def tabla(nombre, db_name=DB_NAME):
+    return referencias(db_name)[nombre]
@@ -0,0 +1,173 @@
+"""
+Réplica de solo lectura de la BD para las rutas analíticas.
+
+Tras cada lote de escritura (ETL completa) se copia la BD con la API de backup
+de SQLite a 'replicas/replica-<timestamp>-<pid>.db', junto a la BD, y se publica
+de forma atómica actualizando el puntero 'LATEST', igual que los snapshots
+columnares. Los lectores abren la última réplica publicada en modo solo
+lectura: no compiten con la ingesta ni ven cargas a medias.
+
+Las escrituras sueltas (add_incidente) no copian la BD cada vez: piden una
+publicación con schedule_publish() y un hilo en segundo plano publica como mucho
+una réplica cada PUBLISH_INTERVAL segundos (antes si se acumulan PUBLISH_BATCH
+escrituras). Mientras tanto los lectores ven la réplica anterior. Estas
+publicaciones solo añaden tickets y contactos: no cambian el puntero
+'DIMENSIONES' (última réplica publicada tras una carga que puede haber cambiado
+clientes, empleados o tipos), con el que se invalidan las cachés de esas tablas.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+from etl_process import DB_NAME
+
+logger = logging.getLogger(__name__)
+
+# Nº de réplicas anteriores que se conservan (puede haber lectores abiertos)
+KEEP_REPLICAS = 2
+# Publicación diferida: segundos entre copias y escrituras que la adelantan
+PUBLISH_INTERVAL = float(os.environ.get('SI_REPLICA_INTERVAL', 2.0))
+PUBLISH_BATCH = 500
+
+_publish_lock = threading.Lock()
+
+# Escrituras pendientes de publicar por BD: {'writes', 'after', 'wake'}
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def replica_dir_for(db_name=DB_NAME):
+    return os.path.join(os.path.dirname(os.path.abspath(db_name)), 'replicas')
+
+
+def latest_replica_path(db_name=DB_NAME):
+    """
+    Ruta de la última réplica publicada, o None si no hay ninguna.
+    """
+    base_dir = replica_dir_for(db_name)
+    try:
+        with open(os.path.join(base_dir, 'LATEST'), 'r', encoding='utf-8') as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(base_dir, name)
+    return path if os.path.isfile(path) else None
+
+
+def dimensions_version(db_name=DB_NAME):
+    """
+    Nombre de la última réplica publicada con dimensiones=True, o None. Cambia
+    tras la ETL o el arranque, no tras add_incidente.
+    """
+    try:
+        with open(os.path.join(replica_dir_for(db_name), 'DIMENSIONES'), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_pointer(base_dir, pointer, name):
+    tmp_path = os.path.join(base_dir, f".{pointer}-{os.getpid()}")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(tmp_path, os.path.join(base_dir, pointer))
+
+
+def publish_replica(db_name=DB_NAME, dimensiones=True):
+    """
+    Copia la BD (estado confirmado, sin bloquear a los escritores en modo WAL)
+    y la publica como réplica de lectura. Con dimensiones=False (escrituras que
+    solo añaden tickets y contactos) no se actualiza el puntero DIMENSIONES.
+    Devuelve la ruta publicada.
+    """
+    with _publish_lock:
+        base_dir = replica_dir_for(db_name)
+        os.makedirs(base_dir, exist_ok=True)
+        name = f"replica-{time.time_ns()}-{os.getpid()}.db"
+        tmp_path = os.path.join(base_dir, '.' + name)
+
+        src = sqlite3.connect(db_name)
+        dst = sqlite3.connect(tmp_path)
+        src.backup(dst)
+        # La réplica no se modifica: sin WAL para poder abrirla en modo solo lectura
+        dst.execute("PRAGMA journal_mode=DELETE")
+        dst.close()
+        src.close()
+
+        final_path = os.path.join(base_dir, name)
+        os.replace(tmp_path, final_path)
+        _write_pointer(base_dir, 'LATEST', name)
+        if dimensiones:
+            # Después de LATEST: con la firma nueva ya se lee la réplica nueva
+            _write_pointer(base_dir, 'DIMENSIONES', name)
+
+        _cleanup(base_dir, keep=name)
+        logger.info("Réplica de lectura publicada en %s", final_path)
+        return final_path
+
+
+def schedule_publish(db_name=DB_NAME, after=None):
+    """
+    Pide publicar una réplica con una escritura ya confirmada. La copia se hace
+    en un hilo en segundo plano que agrupa las peticiones de PUBLISH_INTERVAL
+    segundos; after(db_name), si se indica, se ejecuta tras la publicación que
+    incluye esta escritura (una vez por publicación aunque se pida varias veces).
+    """
+    with _pending_lock:
+        pending = _pending.get(db_name)
+        if pending is None:
+            pending = _pending[db_name] = {'writes': 0, 'after': [], 'wake': threading.Event()}
+            threading.Thread(target=_publish_background, args=(db_name, pending),
+                             name='replica-publish', daemon=True).start()
+        pending['writes'] += 1
+        if after is not None and after not in pending['after']:
+            pending['after'].append(after)
+        if pending['writes'] >= PUBLISH_BATCH:
+            pending['wake'].set()
+
+
+def _publish_background(db_name, pending):
+    while True:
+        pending['wake'].wait(PUBLISH_INTERVAL)
+        with _pending_lock:
+            if not pending['writes']:
+                # Sin escrituras desde la última copia: el hilo termina
+                del _pending[db_name]
+                return
+            after, pending['after'] = pending['after'], []
+            pending['writes'] = 0
+            pending['wake'].clear()
+        try:
+            publish_replica(db_name, dimensiones=False)
+            for callback in after:
+                callback(db_name)
+        except Exception:
+            logger.exception("Error al publicar la réplica de lectura")
+
+
+def _cleanup(base_dir, keep):
+    replicas = sorted(f for f in os.listdir(base_dir) if f.startswith('replica-') and f != keep)
+    for old in replicas[:-KEEP_REPLICAS]:
+        try:
+            os.remove(os.path.join(base_dir, old))
+        except OSError:
+            # En Windows no se puede borrar si aún hay un lector: se reintentará
+            pass
+
+
+def connect_read(db_name=DB_NAME, **kwargs):
+    """
+    Conexión de lectura: la última réplica publicada de db_name en modo solo
+    lectura o, si todavía no hay ninguna, la propia BD.
+    """
+    path = latest_replica_path(db_name)
+    if path is not None:
+        try:
+            return sqlite3.connect(f"file:{pathname2url(path)}?mode=ro", uri=True, **kwargs)
+        except sqlite3.OperationalError:
+            # Réplica eliminada entre la lectura del puntero y la apertura
+            pass
+    return sqlite3.connect(db_name, **kwargs)
@@ -0,0 +1,535 @@
+"""
+Informes PDF.
+
+- build_report_pdf: informe resumen (tabla de métricas y cuadrícula de
+  gráficos), en memoria.
+- build_full_report: el resumen más un apéndice por cliente y otro por empleado.
+  El informe se divide en secciones independientes (el resumen y bloques de
+  clientes o empleados de como mucho SECTION_ROWS filas) que se maquetan en
+  paralelo en un pool de procesos, cada una en su PDF temporal, y se copian una
+  tras otra al fichero o stream de salida (merge_pdfs, lee con pypdf). La
+  memoria de los workers depende del tamaño de sección y la de la unión, del
+  nº de objetos del PDF final (su posición en la tabla xref), no del de la BD.
+  Sin pypdf las secciones se maquetan en un solo documento y en un solo proceso.
+"""
+import gc
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby, repeat
+
+from reportlab.lib.units import cm
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
+
+from etl_process import DB_NAME
+from replica import connect_read
+from top_queries import filtro_apertura
+
+logger = logging.getLogger(__name__)
+
+# Filas (tickets o contactos) por sección de apéndice: acota la memoria y el
+# tiempo de cada worker
+SECTION_ROWS = 5000
+# Filas por tabla de reportlab: las tablas largas se parten para que la
+# maquetación sea lineal en el nº de filas
+TABLE_ROWS = 100
+# Procesos que maquetan secciones en paralelo
+REPORT_WORKERS = int(os.environ.get('SI_REPORT_WORKERS', os.cpu_count() or 1))
+
+# Estilo de las tablas en una sola pasada: cabecera y filas alternas
+# (ROWBACKGROUNDS) en lugar de un setStyle por fila
+METRICS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2980B9')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 14),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lavender]),
+])
+APPENDIX_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2980B9')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lavender]),
+])
+
+# Apéndices: entidades con su nº de filas (para repartirlas en secciones) y
+# filas de las entidades de un rango de ids, ordenadas por entidad. {rango} es
+# la condición ('rango', con el filtro de top_queries.filtro_apertura en
+# {where}) que limita las filas a los tickets abiertos en el rango de fechas
+APENDICES = {
+    'clientes': {
+        'titulo': "Apéndice por cliente",
+        'conteo': """
+            SELECT c.id_cliente, COUNT(t.id_ticket)
+            FROM cliente c
+            LEFT JOIN incidencia_ticket t ON t.id_cliente = c.id_cliente{rango}
+            GROUP BY c.id_cliente
+            ORDER BY c.id_cliente
+        """,
+        'filas': """
+            SELECT c.id_cliente, c.nombre, t.id_ticket,
+                   date(t.fecha_apertura + 2440587.5), date(t.fecha_cierre + 2440587.5),
+                   ti.nombre, t.satisfaccion_cliente, t.es_mantenimiento, t.es_critico
+            FROM cliente c
+            LEFT JOIN incidencia_ticket t ON t.id_cliente = c.id_cliente{rango}
+            LEFT JOIN tipo_incidencia ti ON ti.id_inci = t.id_inci
+            WHERE c.id_cliente BETWEEN ? AND ?
+            ORDER BY c.id_cliente, t.id_ticket
+        """,
+        'rango': "{where}",
+    },
+    'empleados': {
+        'titulo': "Apéndice por empleado",
+        'conteo': """
+            SELECT e.id_emp, COUNT(co.id_contacto)
+            FROM empleado e
+            LEFT JOIN contacto co ON co.id_emp = e.id_emp{rango}
+            GROUP BY e.id_emp
+            ORDER BY e.id_emp
+        """,
+        'filas': """
+            SELECT e.id_emp, e.nombre, e.nivel, co.id_ticket, date(co.fecha + 2440587.5),
+                   co.tiempo, t.id_cliente, ti.nombre
+            FROM empleado e
+            LEFT JOIN contacto co ON co.id_emp = e.id_emp{rango}
+            LEFT JOIN incidencia_ticket t ON t.id_ticket = co.id_ticket
+            LEFT JOIN tipo_incidencia ti ON ti.id_inci = t.id_inci
+            WHERE e.id_emp BETWEEN ? AND ?
+            ORDER BY e.id_emp, co.id_contacto
+        """,
+        # Contactos de los tickets abiertos en el rango
+        'rango': " AND co.id_ticket IN (SELECT t.id_ticket FROM incidencia_ticket t WHERE 1 = 1{where})",
+    },
+}
+
+
+def _draw_header_footer(canvas, pie, fecha):
+    # Header: logo y título pequeño
+    logo_path = os.path.join('static', 'logo.png')
+    if os.path.exists(logo_path):
+        canvas.drawImage(logo_path, x=2*cm, y=A4[1]-3*cm, width=3*cm, height=1*cm, preserveAspectRatio=True)
+    canvas.setFont('Helvetica-Bold', 12)
+    canvas.setFillColor(colors.HexColor('#2E4053'))
+    canvas.drawString(6*cm, A4[1]-2.5*cm, "Informe de Incidencias - URJC - Sistemas de Información")
+
+    # Footer: página y fecha
+    canvas.setFont('Helvetica', 9)
+    canvas.setFillColor(colors.grey)
+    canvas.drawRightString(A4[0]-2*cm, 1.5*cm, pie)
+    canvas.drawString(2*cm, 1.5*cm, f"Generado el {fecha}")
+
+
+def header_footer(canvas, doc):
+    _draw_header_footer(canvas, f"Página {doc.page}", datetime.now().strftime("%d/%m/%Y %H:%M"))
+
+
+def section_header_footer(titulo, fecha):
+    """
+    Cabecera y pie de una sección maquetada por separado: la página es la de la
+    sección y la fecha, la común a todo el informe.
+    """
+    def draw(canvas, doc):
+        _draw_header_footer(canvas, f"{titulo} - página {doc.page}", fecha)
+    return draw
+
+
+def _document(output):
+    return SimpleDocTemplate(output, pagesize=A4,
+                             rightMargin=2*cm, leftMargin=2*cm,
+                             topMargin=4*cm, bottomMargin=3*cm)
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle('title', parent=styles['Heading1'], fontSize=20, textColor=colors.HexColor('#1F618D'), spaceAfter=14),
+        'subtitle': ParagraphStyle('subtitle', parent=styles['Heading2'], fontSize=14, textColor=colors.HexColor('#2874A6'), spaceAfter=12),
+        'normal': styles['BodyText'],
+    }
+
+
+def summary_story(metrics, charts):
+    """
+    Flowables del resumen: título, tabla de métricas y cuadrícula de gráficos.
+    """
+    styles = _styles()
+    normal_style = styles['normal']
+    story = []
+
+    # Título principal
+    story.append(Paragraph("Informe de Incidencias", styles['title']))
+    story.append(Spacer(1, 12))
+
+    # Resumen breve (opcional)
+    story.append(Paragraph("Este informe presenta un análisis detallado de las incidencias registradas, con métricas clave y gráficos que facilitan la interpretación.", normal_style))
+    story.append(Spacer(1, 18))
+
+    # Tabla de métricas con zebra striping
+    data = [["Métrica", "Valor"]]
+    for key, value in metrics.items():
+        key_formatted = key.replace('_', ' ').capitalize()
+        data.append([key_formatted, str(value)])
+
+    story.append(Table(data, hAlign='LEFT', colWidths=[10*cm, 5*cm], style=METRICS_TABLE_STYLE))
+    story.append(Spacer(1, 24))
+
+    # Sección de gráficos en cuadrícula 2xN
+    story.append(Paragraph("Análisis Gráfico", styles['subtitle']))
+    story.append(Spacer(1, 12))
+
+    chart_items = list(charts.items())
+    for i in range(0, len(chart_items), 2):
+        row = []
+        for j in range(2):
+            if i + j < len(chart_items):
+                chart_name, chart_file = chart_items[i + j]
+                img_path = os.path.join('static', chart_file)
+                if os.path.exists(img_path):
+                    img = Image(img_path, width=8*cm, height=6*cm)
+                    # Contenedor con título y gráfico
+                    block = [Paragraph(chart_name.replace('_', ' ').capitalize(), normal_style), Spacer(1,6), img]
+                    row.append(block)
+                else:
+                    row.append([Paragraph("Imagen no disponible", normal_style)])
+            else:
+                row.append('')  # Celda vacía si no hay par
+        # Crear tabla para la fila de gráficos
+        t = Table([row], colWidths=[8*cm, 8*cm])
+        t.setStyle(TableStyle([
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 12),
+        ]))
+        story.append(t)
+        story.append(Spacer(1, 12))
+    return story
+
+
+def build_report_pdf(metrics, charts):
+    """
+    Genera el informe PDF con la tabla de métricas y la cuadrícula de gráficos.
+    Devuelve un BytesIO posicionado al inicio.
+    """
+    buffer = io.BytesIO()
+    doc = _document(buffer)
+    # Construir PDF con header y footer
+    doc.build(summary_story(metrics, charts), onFirstPage=header_footer, onLaterPages=header_footer)
+
+    buffer.seek(0)
+    return buffer
+
+
+def _appendix_tables(header, rows, col_widths):
+    """
+    Tablas de como mucho TABLE_ROWS filas con la cabecera repetida.
+    """
+    for i in range(0, len(rows), TABLE_ROWS):
+        yield Table([header] + rows[i:i + TABLE_ROWS], colWidths=col_widths, hAlign='LEFT',
+                    repeatRows=1, style=APPENDIX_TABLE_STYLE)
+        yield Spacer(1, 6)
+
+
+def _si_no(value):
+    return '-' if value is None else ('Sí' if value else 'No')
+
+
+def _client_story(id_cliente, nombre, rows):
+    styles = _styles()
+    tickets = [r for r in rows if r[2] is not None]
+    story = [Paragraph(f"Cliente {nombre} ({id_cliente})", styles['subtitle'])]
+    if not tickets:
+        return story + [Paragraph("Sin incidencias registradas.", styles['normal']), Spacer(1, 12)]
+    satisfaccion = sum(r[6] or 0 for r in tickets) / len(tickets)
+    criticos = sum(1 for r in tickets if r[8])
+    story.append(Paragraph(f"{len(tickets)} incidencias, satisfacción media {satisfaccion:.2f}, "
+                           f"{criticos} críticas.", styles['normal']))
+    story.append(Spacer(1, 6))
+    filas = [[r[2], r[3] or '-', r[4] or '-', r[5] or '-', r[6], _si_no(r[7]), _si_no(r[8])] for r in tickets]
+    story.extend(_appendix_tables(["Ticket", "Apertura", "Cierre", "Tipo", "Satisf.", "Mant.", "Crítico"], filas,
+                                  [1.6*cm, 2.2*cm, 2.2*cm, 5.2*cm, 1.6*cm, 1.6*cm, 1.6*cm]))
+    return story
+
+
+def _employee_story(id_emp, nombre, rows):
+    styles = _styles()
+    contactos = [r for r in rows if r[3] is not None]
+    story = [Paragraph(f"Empleado {nombre} ({id_emp}), nivel {rows[0][2]}", styles['subtitle'])]
+    if not contactos:
+        return story + [Paragraph("Sin contactos registrados.", styles['normal']), Spacer(1, 12)]
+    tiempo = sum(r[5] or 0 for r in contactos)
+    story.append(Paragraph(f"{len(contactos)} contactos en {len({r[3] for r in contactos})} incidencias, "
+                           f"{tiempo:.1f} horas en total.", styles['normal']))
+    story.append(Spacer(1, 6))
+    filas = [[r[3], r[4] or '-', f"{r[5] or 0:.1f}", r[6] if r[6] is not None else '-', r[7] or '-']
+             for r in contactos]
+    story.extend(_appendix_tables(["Ticket", "Fecha", "Horas", "Cliente", "Tipo"], filas,
+                                  [2*cm, 2.6*cm, 2*cm, 2*cm, 7*cm]))
+    return story
+
+
+def _apendice_query(nombre, consulta, desde=None, hasta=None):
+    """
+    Consulta 'conteo' o 'filas' del apéndice limitada a los tickets abiertos
+    entre desde y hasta (datetime.date o None), con los parámetros del rango.
+    """
+    where, params = filtro_apertura(desde, hasta)
+    rango = APENDICES[nombre]['rango'].format(where=where) if where else ''
+    return APENDICES[nombre][consulta].format(rango=rango), params
+
+
+def appendix_story(nombre, primero, ultimo, db_name=DB_NAME, desde=None, hasta=None):
+    """
+    Flowables del apéndice 'nombre' para las entidades con id entre primero y
+    ultimo, leídas de la réplica de lectura, con las filas de los tickets
+    abiertos entre desde y hasta.
+    """
+    query, params = _apendice_query(nombre, 'filas', desde, hasta)
+    entity_story = _client_story if nombre == 'clientes' else _employee_story
+    conn = connect_read(db_name)
+    try:
+        cursor = conn.execute(query, (*params, primero, ultimo))
+        story = []
+        for (entity_id, entity_name), rows in groupby(cursor, key=lambda r: (r[0], r[1])):
+            story.extend(entity_story(entity_id, entity_name, list(rows)))
+    finally:
+        conn.close()
+    return story
+
+
+def plan_sections(apendices, db_name=DB_NAME, desde=None, hasta=None):
+    """
+    Secciones (apéndice, primer id, último id, si es la primera del apéndice,
+    desde, hasta) de como mucho SECTION_ROWS filas del rango de fechas cada una
+    (o una sola entidad, si tiene más).
+    """
+    sections = []
+    conn = connect_read(db_name)
+    try:
+        for nombre in apendices:
+            primero = ultimo = None
+            filas = 0
+            inicio = True
+            for entity_id, n in conn.execute(*_apendice_query(nombre, 'conteo', desde, hasta)):
+                n = max(n, 1)
+                if primero is not None and filas + n > SECTION_ROWS:
+                    sections.append((nombre, primero, ultimo, inicio, desde, hasta))
+                    primero, filas, inicio = None, 0, False
+                if primero is None:
+                    primero = entity_id
+                ultimo = entity_id
+                filas += n
+            if primero is not None:
+                sections.append((nombre, primero, ultimo, inicio, desde, hasta))
+    finally:
+        conn.close()
+    return sections
+
+
+def _section_title(section):
+    if section[0] == 'resumen':
+        return "Resumen"
+    nombre, primero, ultimo = section[:3]
+    return f"{APENDICES[nombre]['titulo']} ({primero}-{ultimo})"
+
+
+def _section_story(section, db_name):
+    if section[0] == 'resumen':
+        return summary_story(*section[1:])
+    nombre, primero, ultimo, inicio, desde, hasta = section
+    story = appendix_story(nombre, primero, ultimo, db_name, desde, hasta)
+    if inicio:
+        story.insert(0, Paragraph(APENDICES[nombre]['titulo'], _styles()['title']))
+    return story
+
+
+def render_section(section, path, db_name, fecha):
+    """
+    Maqueta una sección en su propio PDF (se ejecuta en un worker).
+    Devuelve (ruta, título de la sección).
+    """
+    titulo = _section_title(section)
+    decorate = section_header_footer(titulo, fecha)
+    _document(path).build(_section_story(section, db_name), onFirstPage=decorate, onLaterPages=decorate)
+    return path, titulo
+
+
+class _PdfStream:
+    """
+    Salida de merge_pdfs: cuenta los bytes escritos para la tabla xref, así que
+    'output' no necesita ser seekable.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.pos = 0
+        self.offsets = {}  # nº de objeto -> posición
+
+    def write(self, data):
+        self.output.write(data)
+        self.pos += len(data)
+
+    def write_object(self, num, obj):
+        self.offsets[num] = self.pos
+        self.write(f"{num} 0 obj\n".encode('ascii'))
+        obj.write_to_stream(self)
+        self.write(b"\nendobj\n")
+
+
+def _renumber(obj, new_ref):
+    """Sustituye en 'obj' (en el sitio) cada referencia por la de new_ref()."""
+    from pypdf.generic import IndirectObject
+
+    if isinstance(obj, IndirectObject):
+        return new_ref(obj.idnum)
+    if isinstance(obj, dict):
+        for key, value in list(obj.items()):
+            obj[key] = _renumber(value, new_ref)
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            obj[i] = _renumber(value, new_ref)
+    return obj
+
+
+def merge_pdfs(parts, output):
+    """
+    Une los PDF de las secciones, en orden y con un marcador por sección, en
+    'output' (ruta o fichero binario). Las páginas de cada sección y los objetos
+    a los que hacen referencia se leen con pypdf y se escriben renumerados según
+    se leen: en memoria solo queda la posición de cada objeto, no el documento.
+    """
+    from pypdf import PdfReader
+    from pypdf.generic import (ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject,
+                               TextStringObject)
+
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, 'wb') as f:
+            return merge_pdfs(parts, f)
+
+    def ref(num):
+        return IndirectObject(num, 0, None)
+
+    out = _PdfStream(output)
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    # 1: catálogo, 2: árbol de páginas, 3: marcadores (se escriben al final)
+    next_num = 4
+    kids = []
+    bookmarks = []  # (título, primera página)
+
+    for path, titulo in parts:
+        reader = PdfReader(path)
+        mapping = {}  # nº de objeto en la sección -> nº en el informe
+        pending = []
+
+        def new_ref(idnum):
+            nonlocal next_num
+            if idnum not in mapping:
+                mapping[idnum] = next_num
+                next_num += 1
+                pending.append(idnum)
+            return ref(mapping[idnum])
+
+        # Las páginas se numeran antes de copiar nada: las referencias a una
+        # página no la copian como un objeto más
+        pages = list(reader.pages)
+        for page in pages:
+            mapping[page.indirect_reference.idnum] = next_num
+            kids.append(next_num)
+            next_num += 1
+        for page in pages:
+            # pypdf ya ha copiado en la página los atributos heredados del árbol
+            del page[NameObject('/Parent')]
+            _renumber(page, new_ref)
+            page[NameObject('/Parent')] = ref(2)
+            out.write_object(mapping[page.indirect_reference.idnum], page)
+            while pending:
+                idnum = pending.pop()
+                out.write_object(mapping[idnum], _renumber(reader.get_object(idnum), new_ref))
+        if pages:
+            bookmarks.append((titulo, mapping[pages[0].indirect_reference.idnum]))
+        # Los objetos de pypdf forman ciclos con su reader: sin esto las
+        # secciones ya copiadas se acumulan hasta la siguiente pasada del GC
+        del reader, pages
+        gc.collect()
+
+    outline_nums = list(range(next_num, next_num + len(bookmarks)))
+    for i, (titulo, first_page) in enumerate(bookmarks):
+        item = DictionaryObject({
+            NameObject('/Title'): TextStringObject(titulo),
+            NameObject('/Parent'): ref(3),
+            NameObject('/Dest'): ArrayObject([ref(first_page), NameObject('/Fit')]),
+        })
+        if i > 0:
+            item[NameObject('/Prev')] = ref(outline_nums[i - 1])
+        if i < len(bookmarks) - 1:
+            item[NameObject('/Next')] = ref(outline_nums[i + 1])
+        out.write_object(outline_nums[i], item)
+
+    outlines = DictionaryObject({NameObject('/Type'): NameObject('/Outlines'),
+                                 NameObject('/Count'): NumberObject(len(bookmarks))})
+    if bookmarks:
+        outlines[NameObject('/First')] = ref(outline_nums[0])
+        outlines[NameObject('/Last')] = ref(outline_nums[-1])
+    out.write_object(3, outlines)
+    out.write_object(2, DictionaryObject({NameObject('/Type'): NameObject('/Pages'),
+                                          NameObject('/Kids'): ArrayObject(ref(n) for n in kids),
+                                          NameObject('/Count'): NumberObject(len(kids))}))
+    out.write_object(1, DictionaryObject({NameObject('/Type'): NameObject('/Catalog'),
+                                          NameObject('/Pages'): ref(2),
+                                          NameObject('/Outlines'): ref(3),
+                                          NameObject('/PageMode'): NameObject('/UseOutlines')}))
+
+    size = next_num + len(bookmarks)
+    xref = out.pos
+    out.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode('ascii'))
+    for num in range(1, size):
+        out.write(f"{out.offsets[num]:010d} 00000 n \n".encode('ascii'))
+    out.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('ascii'))
+
+
+def build_full_report(output, metrics, charts, apendices=tuple(APENDICES), db_name=DB_NAME,
+                      workers=REPORT_WORKERS, desde=None, hasta=None):
+    """
+    Informe completo (resumen y apéndices) escrito en 'output' (ruta o fichero
+    binario). Los apéndices solo incluyen los tickets y contactos de los
+    tickets abiertos entre desde y hasta. Devuelve el nº de secciones.
+    """
+    fecha = datetime.now().strftime("%d/%m/%Y %H:%M")
+    sections = [('resumen', metrics, charts)] + plan_sections(apendices, db_name, desde, hasta)
+
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        logger.warning("pypdf no está instalado: el informe completo se maqueta en un solo proceso")
+        story = []
+        for section in sections:
+            story.extend(_section_story(section, db_name))
+            story.append(PageBreak())
+        _document(output).build(story, onFirstPage=header_footer, onLaterPages=header_footer)
+        return len(sections)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f'seccion-{i:05d}.pdf') for i in range(len(sections))]
+        args = (sections, paths, repeat(db_name), repeat(fecha))
+        if workers > 1 and len(sections) > 1:
+            # spawn: los workers no heredan hilos ni conexiones del servidor
+            with ProcessPoolExecutor(max_workers=min(workers, len(sections)),
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                parts = list(pool.map(render_section, *args))
+        else:
+            parts = list(map(render_section, *args))
+        merge_pdfs(parts, output)
+    return len(sections)
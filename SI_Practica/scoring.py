@@ -0,0 +1,133 @@
+"""
+Predicción de criticidad con caché, por versión de los modelos.
+
+Las características de /prediccion tienen dominios pequeños y discretos, así
+que al publicar una versión (online_training.publish_models) se precalcula una
+tabla densa con la probabilidad de ser crítico de cada modelo para DOMINIO
+(con num_contactos y tiempo_total fijos en los valores del formulario) y se
+guarda como '<modelo>_proba.npy' junto a los modelos. Una predicción dentro del
+dominio es un acceso a la tabla (mapeada en memoria, compartida entre workers);
+las de fuera pasan por un LRU de inferencias. Tabla y LRU pertenecen al Scorer
+de la versión cargada: al publicarse otra se crea uno nuevo y los anteriores se
+descartan.
+"""
+import logging
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from ml_models import FEATURES, MODELS_DIR, load_versioned_models, predict_criticality
+
+logger = logging.getLogger(__name__)
+
+# Dominio de la tabla precalculada (valores enteros de cada característica)
+DOMINIO = {
+    'es_mantenimiento': range(0, 2),
+    'satisfaccion_cliente': range(0, 11),
+    'tipo_incidencia': range(0, 16),
+    'duracion': range(0, 366),
+}
+# Valores fijos del resto de características (los que envía /prediccion)
+FIJAS = {'num_contactos': 1, 'tiempo_total': 1.0}
+SHAPE = tuple(len(r) for r in DOMINIO.values())
+
+# Inferencias fuera de la tabla que se recuerdan por versión y modelo
+CACHE_SIZE = 4096
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def table_path(base_dir, key):
+    return os.path.join(base_dir, f'{key}_proba.npy')
+
+
+def build_table(model):
+    """
+    Probabilidad de ser crítico para todas las combinaciones de DOMINIO, en un
+    array con una dimensión por característica.
+    """
+    grid = np.meshgrid(*(np.arange(r.start, r.stop) for r in DOMINIO.values()), indexing='ij')
+    df = pd.DataFrame({name: axis.ravel() for name, axis in zip(DOMINIO, grid)})
+    for name, value in FIJAS.items():
+        df[name] = value
+    return model.predict_proba(df[FEATURES])[:, 1].reshape(SHAPE)
+
+
+def write_tables(models, base_dir):
+    """
+    Precalcula y guarda las tablas de todos los modelos (al publicar una versión).
+    """
+    for key, model in models.items():
+        np.save(table_path(base_dir, key), build_table(model))
+
+
+def _table_index(features):
+    """
+    Posición de las características en la tabla, o None si quedan fuera del
+    dominio o de los valores fijos.
+    """
+    if any(features[name] != value for name, value in FIJAS.items()):
+        return None
+    index = []
+    for name, r in DOMINIO.items():
+        value = features[name]
+        if value != int(value) or int(value) not in r:
+            return None
+        index.append(int(value) - r.start)
+    return tuple(index)
+
+
+class Scorer:
+    """
+    Predicciones de una versión de los modelos: tabla precalculada si existe y
+    LRU de inferencias para el resto.
+    """
+
+    def __init__(self, version, models, models_dir=MODELS_DIR):
+        self.version = version
+        self.models = models
+        self.tables = {}
+        if version:
+            for key in models:
+                path = table_path(os.path.join(models_dir, version), key)
+                if os.path.exists(path):
+                    table = np.load(path, mmap_mode='r')
+                    if table.shape == SHAPE:
+                        self.tables[key] = table
+        self._infer = lru_cache(maxsize=CACHE_SIZE)(self._infer_uncached)
+
+    def _infer_uncached(self, key, values):
+        prediccion, probabilidad = predict_criticality(self.models[key], dict(zip(FEATURES, values)))
+        return int(prediccion), float(probabilidad)
+
+    def score(self, key, features):
+        """
+        (predicción, probabilidad de ser crítico) del modelo 'key' (lr, dt, rf).
+        """
+        table = self.tables.get(key)
+        if table is not None:
+            index = _table_index(features)
+            if index is not None:
+                probabilidad = float(table[index])
+                # Mismo criterio que predict() de los clasificadores binarios
+                return int(probabilidad > 0.5), probabilidad
+        return self._infer(key, tuple(features[name] for name in FEATURES))
+
+
+def get_scorer():
+    """
+    Scorer de la versión de los modelos publicada, o None si no hay modelos.
+    """
+    global _scorer
+    version, models = load_versioned_models()
+    if models is None:
+        return None
+    with _scorer_lock:
+        if _scorer is None or _scorer.models is not models:
+            _scorer = Scorer(version, models)
+            logger.info("Scorer de la versión %s: tablas de %s", version, sorted(_scorer.tables) or 'ningún modelo')
+        return _scorer
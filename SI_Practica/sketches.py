@@ -0,0 +1,389 @@
+"""
+Modo analítico aproximado basado en sketches combinables.
+
+  - KLLSketch: cuantiles con error de rango normalizado de ~1.7% con k=200
+    (cota con probabilidad ~99%, Karnin-Lang-Liberty). Para la duración, que son
+    días enteros, esto puede desplazar un cuantil a un valor vecino.
+  - HyperLogLog: nº de elementos distintos con error estándar 1.04/sqrt(2^p);
+    con p=11 es ~2.3% y ocupa 2 KB por sketch.
+
+Se mantiene un grupo de sketches por día de apertura del ticket y sus
+acumulados por mes, de modo que cualquier rango de fechas se responde
+combinando los de sus meses completos y los días sueltos de los extremos. Junto
+a ellos se guardan contadores exactos por día (gráficos de barras, agrupaciones
+de Fraude) para que el modo aproximado no necesite el modelo columnar.
+"""
+import math
+import random
+from collections import Counter
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from analytics import (DIA_NULO, FRAUDE_DIMENSIONES, WEEKDAYS, boxplot_summary, contacts_per_ticket,
+                       fraude_rows, nombrar_grupos, weekday_names)
+from charts import bar_aggregates
+from etl_process import DB_NAME
+from stats_store import get_incremental_store, histogram_median, round2
+
+KLL_K = 200
+HLL_P = 11
+
+# Un único generador para las compactaciones: un Random por sketch diario ocuparía
+# más que el propio sketch
+_rng = random.Random(0)
+
+# Modos del dashboard: cálculo exacto o aproximado con sketches
+MODO_EXACTO = 'exacto'
+MODO_APROX = 'aprox'
+
+
+class KLLSketch:
+    """
+    Sketch de cuantiles KLL. Cada compactor h guarda elementos con peso 2^h;
+    cuando se llena se ordena y se promueve la mitad de sus elementos
+    (pares o impares al azar) al nivel siguiente.
+    """
+
+    def __init__(self, k=KLL_K, c=2 / 3):
+        self.k = k
+        self.c = c
+        self.compactors = []
+        self.size = 0
+        self.max_size = 0
+        self.n = 0
+        self._grow()
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _capacity(self, h):
+        depth = len(self.compactors) - h - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+
+    def update_many(self, values):
+        values = [v.item() if hasattr(v, 'item') else v for v in values]
+        self.compactors[0].extend(values)
+        self.size += len(values)
+        self.n += len(values)
+        while self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self):
+        for h, items in enumerate(self.compactors):
+            if len(items) >= self._capacity(h):
+                if h + 1 >= len(self.compactors):
+                    self._grow()
+                items.sort()
+                # Si hay un nº impar de elementos, el último se queda en su nivel
+                # y se compacta el resto: así el peso total sigue siendo n
+                par = len(items) & ~1
+                start = _rng.randint(0, 1)
+                self.compactors[h + 1].extend(items[start:par:2])
+                self.compactors[h] = items[par:]
+                break
+        self.size = sum(len(items) for items in self.compactors)
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for h, items in enumerate(other.compactors):
+            self.compactors[h].extend(items)
+        self.n += other.n
+        self.size = sum(len(items) for items in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """
+        Cuantiles aproximados para las probabilidades qs (0..1).
+        """
+        weighted = sorted((v, 1 << h) for h, items in enumerate(self.compactors) for v in items)
+        if not weighted:
+            return [None] * len(qs)
+        values = np.array([v for v, _ in weighted], dtype=np.float64)
+        cum = np.cumsum([w for _, w in weighted])
+        total = cum[-1]
+        return [float(values[min(np.searchsorted(cum, q * total, side='left'), len(values) - 1)]) for q in qs]
+
+
+def _hash64(values):
+    """
+    Hash splitmix64 vectorizado de enteros.
+    """
+    x = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class HyperLogLog:
+    """
+    Estimador de cardinalidad HyperLogLog con corrección de rango pequeño.
+    """
+
+    def __init__(self, p=HLL_P):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update_many(self, values):
+        if not len(values):
+            return
+        with np.errstate(over='ignore'):
+            h = _hash64(values)
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        # 32 bits bajos para el rango: representables de forma exacta en float64
+        w = (h & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        bit_length = np.where(w > 0, np.floor(np.log2(np.maximum(w, 1))) + 1, 0)
+        rank = (33 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class DaySketches:
+    """
+    Sketches de un día (o de un rango, tras combinarlos) y contadores exactos,
+    también combinables, de los gráficos de barras y las agrupaciones de Fraude.
+    """
+
+    def __init__(self):
+        self.duracion_por_tipo = {}
+        self.fraude_contactos = KLLSketch()
+        self.clientes = HyperLogLog()
+        self.empleados = HyperLogLog()
+        # Suma de duraciones y nº de tickets por es_mantenimiento (gráfico 1)
+        self.duracion_mant = Counter()
+        self.tickets_mant = Counter()
+        self.criticos = Counter()         # id_cliente -> tickets críticos (gráfico 3)
+        self.actuaciones = Counter()      # id_emp -> contactos (gráfico 4)
+        self.actuaciones_dia = Counter()  # día de la semana -> contactos (gráfico 5)
+        # Fraude: clave -> {(grupo, contactos del ticket en el grupo): nº de tickets}
+        self.fraude = {clave: Counter() for clave in FRAUDE_DIMENSIONES}
+
+    def merge(self, other):
+        for tipo, sketch in other.duracion_por_tipo.items():
+            self.duracion_por_tipo.setdefault(tipo, KLLSketch()).merge(sketch)
+        self.fraude_contactos.merge(other.fraude_contactos)
+        self.clientes.merge(other.clientes)
+        self.empleados.merge(other.empleados)
+        for nombre in ('duracion_mant', 'tickets_mant', 'criticos', 'actuaciones', 'actuaciones_dia'):
+            getattr(self, nombre).update(getattr(other, nombre))
+        for clave, hist in other.fraude.items():
+            self.fraude[clave].update(hist)
+        return self
+
+    def barras(self):
+        """
+        Agregados de los gráficos de barras, como charts.bar_aggregates().
+        """
+        mant = sorted(self.tickets_mant)
+        chart1 = pd.Series([self.duracion_mant[m] / self.tickets_mant[m] for m in mant],
+                           index=mant, dtype='float64')
+        chart3 = pd.Series(dict(sorted(self.criticos.items())), dtype='int64')
+        chart3 = chart3.sort_values(ascending=False).head(5)
+        chart4 = pd.Series(dict(sorted(self.actuaciones.items())), dtype='int64')
+        chart5 = pd.Series(self.actuaciones_dia, dtype='int64').reindex(WEEKDAYS).dropna()
+        return {'chart1': chart1, 'chart3': chart3, 'chart4': chart4, 'chart5': chart5}
+
+    def fraude_groupings(self, db_name=DB_NAME):
+        """
+        Agrupaciones de Fraude, como analytics.calculate_fraude_groupings().
+        """
+        groupings = {}
+        for clave, hist in self.fraude.items():
+            grupos = {}
+            for (grupo, contactos), tickets in hist.items():
+                grupos.setdefault(grupo, Counter())[contactos] += tickets
+            groupings[clave] = [_fraude_stats(grupo, grupos[grupo]) for grupo in sorted(grupos)]
+        return nombrar_grupos(groupings, db_name)
+
+
+def _fraude_stats(grupo, hist):
+    """
+    Fila de analytics.do_fraude_stats_by_dimension() a partir del histograma
+    {contactos por ticket: nº de tickets} del grupo.
+    """
+    n = sum(hist.values())
+    total = sum(v * c for v, c in hist.items())
+    mean = total / n
+    var = sum(c * (v - mean) ** 2 for v, c in hist.items()) / (n - 1) if n > 1 else 0
+    return {
+        'group_value': grupo,
+        'num_incidents': n,
+        'total_contacts': total,
+        'median_contacts': round2(histogram_median(hist, n)),
+        'mean_contacts': round2(mean),
+        'var_contacts': round2(var) if n > 1 else 0,
+        'min_contacts': min(hist),
+        'max_contacts': max(hist),
+    }
+
+
+def _mes(day):
+    """
+    Primer y último número de día del mes natural de day (DIA_NULO va aparte).
+    """
+    if day == DIA_NULO:
+        return day, day
+    mes = np.datetime64(day, 'D').astype('datetime64[M]')
+    return (int(mes.astype('datetime64[D]').astype(np.int64)),
+            int((mes + 1).astype('datetime64[D]').astype(np.int64)) - 1)
+
+
+class DailySketches:
+    """
+    Sketches por día de apertura (número de día) mantenidos de forma
+    incremental, con acumulados por mes natural y del total: un rango combina
+    los meses completos que cubre y solo los días sueltos de sus extremos.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self.watermark = 0
+        self.days = {}
+        self.months = {}  # (primer día, último día) -> DaySketches del mes
+        self.total = DaySketches()
+
+    def add_frames(self, tickets, contacts):
+        if not len(tickets):
+            return
+        # Sketches del lote por día; después se combinan en el día, el mes y el total
+        lote = {}
+
+        def dia(day):
+            return lote.setdefault(int(day), DaySketches())
+
+        duracion = tickets['duracion'].to_numpy()
+        for (day, tipo), idx in tickets.groupby(['fecha_apertura', 'id_inci'], observed=True).indices.items():
+            dia(day).duracion_por_tipo.setdefault(int(tipo), KLLSketch()).update_many(duracion[idx].tolist())
+
+        fraude = tickets[tickets['id_inci'] == 5]
+        contactos = contacts_per_ticket(fraude).astype(int).to_numpy()
+        for day, idx in fraude.groupby('fecha_apertura').indices.items():
+            dia(day).fraude_contactos.update_many(contactos[idx].tolist())
+
+        clientes = tickets['id_cliente'].to_numpy()
+        for day, idx in tickets.groupby('fecha_apertura').indices.items():
+            dia(day).clientes.update_many(clientes[idx])
+
+        mant = tickets.groupby(['fecha_apertura', 'es_mantenimiento'])['duracion'].agg(['sum', 'count'])
+        for (day, es_mant), suma, n in mant.itertuples():
+            if n:
+                dia(day).duracion_mant[int(es_mant)] += float(suma)
+                dia(day).tickets_mant[int(es_mant)] += int(n)
+
+        criticos = tickets[(tickets['es_mantenimiento'] == 1) & (tickets['id_inci'] != 1)]
+        for (day, cliente), n in criticos.groupby(['fecha_apertura', 'id_cliente']).size().items():
+            dia(day).criticos[int(cliente)] += int(n)
+
+        # Empleados implicados y actuaciones según el día de apertura de su ticket
+        ticket_day = contacts['id_ticket'].map(tickets.set_index('id_ticket')['fecha_apertura']).to_numpy()
+        for day, emps in contacts['id_emp'].groupby(ticket_day):
+            dia(day).empleados.update_many(emps.to_numpy())
+        for (day, emp), n in contacts.groupby([ticket_day, 'id_emp']).size().items():
+            dia(day).actuaciones[int(emp)] += int(n)
+        weekday = weekday_names(contacts['dia_semana']).to_numpy()
+        for (day, nombre), n in contacts.groupby([ticket_day, weekday]).size().items():
+            dia(day).actuaciones_dia[nombre] += int(n)
+
+        # Fraude: histograma de contactos por ticket dentro de cada grupo
+        df_fraude = fraude_rows(tickets, contacts, self.db_name)
+        if df_fraude is not None:
+            for clave, col in FRAUDE_DIMENSIONES.items():
+                por_ticket = df_fraude.groupby(['fecha_apertura', col, 'id_ticket']).size()
+                for (day, grupo, n), tickets_grupo in por_ticket.groupby(level=[0, 1]).value_counts().items():
+                    dia(day).fraude[clave][(grupo, int(n))] += int(tickets_grupo)
+
+        for day, sk in lote.items():
+            if day in self.days:
+                self.days[day].merge(sk)
+            else:
+                self.days[day] = sk
+            self.months.setdefault(_mes(day), DaySketches()).merge(sk)
+            self.total.merge(sk)
+
+        self.watermark = max(self.watermark, int(tickets['id_ticket'].max()))
+
+    def merged(self, desde=None, hasta=None):
+        """
+        Sketches de los días en [desde, hasta] (números de día). Sin rango es el
+        acumulado total, que no debe modificarse.
+        """
+        if desde is None and hasta is None:
+            return self.total
+        lo = DIA_NULO + 1 if desde is None else desde
+        hi = np.iinfo(np.int32).max if hasta is None else hasta
+        result = DaySketches()
+        for (primero, ultimo), sk in self.months.items():
+            # Como en load_ticket_frames, un rango excluye los tickets sin fecha
+            if primero == DIA_NULO or ultimo < lo or primero > hi:
+                continue
+            if lo <= primero and ultimo <= hi:
+                result.merge(sk)
+            else:
+                for day in range(max(primero, lo), min(ultimo, hi) + 1):
+                    if day in self.days:
+                        result.merge(self.days[day])
+        return result
+
+    def summary(self, desde=None, hasta=None):
+        """
+        Mediana de contactos de Fraude, resumen del boxplot de duración por
+        tipo (bigotes en los percentiles 5 y 90, como whis=[5, 90]) y nº de
+        clientes y empleados distintos, todos aproximados, más los agregados
+        de los gráficos de barras y las agrupaciones de Fraude, que son exactos.
+        """
+        sk = self.merged(desde, hasta)
+        fraude_median = sk.fraude_contactos.quantiles([0.5])[0] if sk.fraude_contactos.n else 0
+        box = []
+        for tipo in sorted(sk.duracion_por_tipo):
+            q05, q25, q50, q75, q90 = sk.duracion_por_tipo[tipo].quantiles([0.05, 0.25, 0.5, 0.75, 0.9])
+            box.append({'label': str(tipo), 'whislo': q05, 'q1': q25, 'med': q50, 'q3': q75, 'whishi': q90})
+        return {
+            'fraude_contacts_median': round(fraude_median, 2),
+            'duracion_boxplot': box,
+            'distinct_clients': sk.clientes.count(),
+            'distinct_employees': sk.empleados.count(),
+            'barras': sk.barras(),
+            'fraude_groupings': sk.fraude_groupings(self.db_name),
+        }
+
+
+def exact_summary(tickets, contacts):
+    """
+    Equivalente exacto de DailySketches.summary() sobre el modelo columnar,
+    salvo las agrupaciones de Fraude (analytics.calculate_fraude_groupings()).
+    """
+    fraude = contacts_per_ticket(tickets[tickets['id_inci'] == 5])
+    box = []
+    for tipo, df_tipo in tickets.groupby('id_inci', observed=True):
+        box.append(dict(label=str(tipo), **boxplot_summary(df_tipo['duracion'])))
+    return {
+        'fraude_contacts_median': round(float(fraude.median()), 2) if len(fraude) else 0,
+        'duracion_boxplot': box,
+        'distinct_clients': int(tickets['id_cliente'].nunique()),
+        'distinct_employees': int(contacts['id_emp'].nunique()),
+        'barras': bar_aggregates(tickets, contacts),
+    }
+
+
+def get_daily_sketches(db_name=DB_NAME):
+    """
+    Sketches diarios al día con la BD (se actualizan como stats_store).
+    """
+    return get_incremental_store('sketches', partial(DailySketches, db_name), db_name)
@@ -0,0 +1,150 @@
+"""
+Snapshots columnares (Arrow IPC / Feather v2) de las tablas de tickets y
+contactos. Clientes y empleados no van en el snapshot: se leen como tablas de
+referencia (referencias.py).
+
+Cada snapshot es un directorio 'snap-<timestamp>-<pid>' dentro de 'snapshots/' junto a
+la BD, y el fichero 'LATEST' apunta al último publicado. Los ficheros se escriben
+sin compresión para poder mapearlos en memoria al arrancar en lugar de consultar
+SQLite y volver a parsear fechas: las columnas numéricas de los DataFrames
+apuntan directamente al fichero mapeado (ver _read_feather).
+
+Tickets y contactos se particionan por mes de apertura del ticket
+('tickets-YYYY-MM.feather', 'contacts-YYYY-MM.feather'), de modo que una consulta
+por rango de fechas solo lee los meses que toca.
+"""
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+
+from etl_process import DB_NAME
+
+logger = logging.getLogger(__name__)
+
+# Nº de snapshots anteriores que se conservan (un proceso puede estar leyéndolos)
+KEEP_SNAPSHOTS = 2
+# Versión del formato en meta.json; los snapshots de otra versión se ignoran
+FORMATO = 3
+
+
+def snapshot_dir_for(db_name=DB_NAME):
+    return os.path.join(os.path.dirname(os.path.abspath(db_name)), 'snapshots')
+
+
+def latest_snapshot_path(db_name=DB_NAME):
+    """
+    Ruta del último snapshot publicado, o None si no hay ninguno.
+    """
+    pointer = os.path.join(snapshot_dir_for(db_name), 'LATEST')
+    try:
+        with open(pointer, 'r', encoding='utf-8') as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(snapshot_dir_for(db_name), name)
+    try:
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            formato = json.load(f).get('formato')
+    except (OSError, ValueError):
+        return None
+    return path if formato == FORMATO else None
+
+
+def write_snapshot(db_name=DB_NAME):
+    """
+    Exporta las tablas de la BD como ficheros Feather y publica el snapshot de
+    forma atómica. Devuelve la ruta del snapshot o None si pyarrow no está
+    disponible.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.warning("pyarrow no está instalado: no se genera snapshot columnar")
+        return None
+    from analytics import read_ticket_frames_sql, month_of
+
+    base_dir = snapshot_dir_for(db_name)
+    os.makedirs(base_dir, exist_ok=True)
+
+    tickets, contacts = read_ticket_frames_sql(db_name)
+
+    name = f"snap-{time.time_ns()}-{os.getpid()}"
+    tmp_path = os.path.join(base_dir, '.' + name)
+    os.makedirs(tmp_path)
+
+    # Particiones mensuales; cada contacto va al mes de apertura de su ticket
+    # (los tickets vienen ordenados por id_ticket)
+    ticket_month = month_of(tickets['fecha_apertura'].to_numpy())
+    pos = np.searchsorted(tickets['id_ticket'].to_numpy(), contacts['id_ticket'].to_numpy())
+    contact_month = ticket_month[pos.clip(max=len(tickets) - 1)]
+    partitions = {}
+    for part in sorted(set(ticket_month)):
+        part_tickets = tickets[ticket_month == part].reset_index(drop=True)
+        part_contacts = contacts[contact_month == part].reset_index(drop=True)
+        part_tickets.to_feather(os.path.join(tmp_path, f"tickets-{part}.feather"), compression='uncompressed')
+        part_contacts.to_feather(os.path.join(tmp_path, f"contacts-{part}.feather"), compression='uncompressed')
+        partitions[part] = len(part_tickets)
+
+    watermark = int(tickets['id_ticket'].max()) if len(tickets) else 0
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'formato': FORMATO, 'watermark': watermark, 'tickets': len(tickets),
+                   'contacts': len(contacts), 'partitions': partitions}, f)
+
+    # Publicación atómica: primero el directorio, después el puntero LATEST
+    final_path = os.path.join(base_dir, name)
+    os.replace(tmp_path, final_path)
+    pointer_tmp = os.path.join(base_dir, f".LATEST-{os.getpid()}")
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(pointer_tmp, os.path.join(base_dir, 'LATEST'))
+
+    _cleanup(base_dir, keep=name)
+    logger.info("Snapshot columnar publicado en %s (%d tickets)", final_path, len(tickets))
+    return final_path
+
+
+def _cleanup(base_dir, keep):
+    snaps = sorted(d for d in os.listdir(base_dir) if d.startswith('snap-') and d != keep)
+    for old in snaps[:-KEEP_SNAPSHOTS]:
+        shutil.rmtree(os.path.join(base_dir, old), ignore_errors=True)
+
+
+def _read_feather(path):
+    """
+    DataFrame sin copia sobre el fichero mapeado: con split_blocks cada columna
+    numérica es una vista de solo lectura del buffer de Arrow (to_pandas() por
+    defecto las copiaría en un bloque consolidado). Las páginas se comparten
+    entre procesos a través de la caché del sistema.
+    """
+    from pyarrow import feather
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_snapshot(path):
+    """
+    Lee los metadatos del snapshot. Devuelve un dict con la marca de agua y la
+    lista ordenada de particiones mensuales, o None si el snapshot no se puede
+    leer.
+    """
+    try:
+        # Sin pyarrow no se pueden mapear las particiones
+        import pyarrow  # noqa: F401
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (ImportError, OSError, ValueError) as e:
+        logger.warning("No se pudo leer el snapshot %s: %s", path, e)
+        return None
+    return {'watermark': meta['watermark'], 'partitions': sorted(meta['partitions'])}
+
+
+def read_partition(path, part):
+    """
+    Mapea en memoria la partición mensual 'part' ('YYYY-MM' o 'sin-fecha').
+    Devuelve (tickets, contactos).
+    """
+    return (_read_feather(os.path.join(path, f"tickets-{part}.feather")),
+            _read_feather(os.path.join(path, f"contacts-{part}.feather")))
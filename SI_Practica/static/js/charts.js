@@ -0,0 +1,136 @@
+/*
+ * Dibuja en el navegador los gráficos del dashboard a partir de los agregados
+ * JSON de charts.chart_data() (incrustados en #chart-data o de /api/charts).
+ * Cada <canvas data-chart="chartN"> recibe su gráfico: barras o boxplot
+ * (resúmenes de cinco números con bigotes en los percentiles 5 y 90).
+ */
+(function () {
+    'use strict';
+
+    var MARGEN = {arriba: 40, derecha: 20, abajo: 90, izquierda: 60};
+
+    function escalaY(maximo) {
+        // Máximo "redondo" y 5 marcas en el eje Y
+        if (!(maximo > 0)) { maximo = 1; }
+        var paso = Math.pow(10, Math.floor(Math.log10(maximo)));
+        var tope = Math.ceil(maximo / paso) * paso;
+        var marcas = [];
+        for (var i = 0; i <= 5; i++) { marcas.push(tope * i / 5); }
+        return {tope: tope, marcas: marcas};
+    }
+
+    function ejes(ctx, datos, area, escala, etiquetas) {
+        ctx.strokeStyle = '#333';
+        ctx.fillStyle = '#333';
+        ctx.font = '12px sans-serif';
+
+        ctx.beginPath();
+        ctx.moveTo(area.x, area.y);
+        ctx.lineTo(area.x, area.y + area.alto);
+        ctx.lineTo(area.x + area.ancho, area.y + area.alto);
+        ctx.stroke();
+
+        ctx.textAlign = 'right';
+        ctx.textBaseline = 'middle';
+        escala.marcas.forEach(function (valor) {
+            var y = area.y + area.alto - area.alto * valor / escala.tope;
+            ctx.fillText(Number(valor.toFixed(2)), area.x - 6, y);
+            ctx.beginPath();
+            ctx.moveTo(area.x - 3, y);
+            ctx.lineTo(area.x, y);
+            ctx.stroke();
+        });
+
+        // Etiquetas del eje X giradas, como en los PNG de matplotlib
+        var ancho = area.ancho / etiquetas.length;
+        etiquetas.forEach(function (etiqueta, i) {
+            ctx.save();
+            ctx.translate(area.x + ancho * (i + 0.5), area.y + area.alto + 8);
+            ctx.rotate(etiquetas.length > 5 ? -Math.PI / 2 : 0);
+            ctx.textAlign = etiquetas.length > 5 ? 'right' : 'center';
+            ctx.textBaseline = etiquetas.length > 5 ? 'middle' : 'top';
+            ctx.fillText(etiqueta, 0, 0);
+            ctx.restore();
+        });
+
+        ctx.textAlign = 'center';
+        ctx.textBaseline = 'alphabetic';
+        ctx.font = 'bold 14px sans-serif';
+        ctx.fillText(datos.titulo, area.x + area.ancho / 2, MARGEN.arriba / 2);
+        ctx.font = '12px sans-serif';
+        ctx.fillText(datos.eje_x, area.x + area.ancho / 2, area.y + area.alto + MARGEN.abajo - 8);
+        ctx.save();
+        ctx.translate(14, area.y + area.alto / 2);
+        ctx.rotate(-Math.PI / 2);
+        ctx.fillText(datos.eje_y, 0, 0);
+        ctx.restore();
+    }
+
+    function barras(ctx, datos, area) {
+        var escala = escalaY(Math.max.apply(null, datos.valores.concat([0])));
+        var ancho = area.ancho / Math.max(datos.valores.length, 1);
+        datos.valores.forEach(function (valor, i) {
+            var alto = area.alto * valor / escala.tope;
+            ctx.fillStyle = Array.isArray(datos.color) ? datos.color[i % datos.color.length] : datos.color;
+            ctx.fillRect(area.x + ancho * i + ancho * 0.15, area.y + area.alto - alto, ancho * 0.7, alto);
+        });
+        ejes(ctx, datos, area, escala, datos.etiquetas);
+    }
+
+    function boxplot(ctx, datos, area) {
+        var maximo = Math.max.apply(null, datos.cajas.map(function (c) { return c.whishi; }).concat([0]));
+        var escala = escalaY(maximo);
+        var y = function (valor) { return area.y + area.alto - area.alto * valor / escala.tope; };
+        var ancho = area.ancho / Math.max(datos.cajas.length, 1);
+
+        ctx.strokeStyle = datos.color;
+        datos.cajas.forEach(function (c, i) {
+            var centro = area.x + ancho * (i + 0.5);
+            var mitad = ancho * 0.25;
+            ctx.lineWidth = 1;
+            ctx.strokeRect(centro - mitad, y(c.q3), 2 * mitad, y(c.q1) - y(c.q3));
+            ctx.beginPath();
+            // Bigotes y sus topes
+            ctx.moveTo(centro, y(c.q3)); ctx.lineTo(centro, y(c.whishi));
+            ctx.moveTo(centro, y(c.q1)); ctx.lineTo(centro, y(c.whislo));
+            ctx.moveTo(centro - mitad / 2, y(c.whishi)); ctx.lineTo(centro + mitad / 2, y(c.whishi));
+            ctx.moveTo(centro - mitad / 2, y(c.whislo)); ctx.lineTo(centro + mitad / 2, y(c.whislo));
+            ctx.stroke();
+            // Mediana
+            ctx.strokeStyle = '#ff7f0e';
+            ctx.lineWidth = 2;
+            ctx.beginPath();
+            ctx.moveTo(centro - mitad, y(c.med)); ctx.lineTo(centro + mitad, y(c.med));
+            ctx.stroke();
+            ctx.strokeStyle = datos.color;
+        });
+        ctx.lineWidth = 1;
+        ejes(ctx, datos, area, escala, datos.cajas.map(function (c) { return c.label; }));
+    }
+
+    function dibujar(canvas, datos) {
+        var ctx = canvas.getContext('2d');
+        ctx.clearRect(0, 0, canvas.width, canvas.height);
+        var area = {
+            x: MARGEN.izquierda,
+            y: MARGEN.arriba,
+            ancho: canvas.width - MARGEN.izquierda - MARGEN.derecha,
+            alto: canvas.height - MARGEN.arriba - MARGEN.abajo
+        };
+        if (datos.tipo === 'boxplot') {
+            boxplot(ctx, datos, area);
+        } else {
+            barras(ctx, datos, area);
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var fuente = document.getElementById('chart-data');
+        if (!fuente) { return; }
+        var graficos = JSON.parse(fuente.textContent);
+        document.querySelectorAll('canvas[data-chart]').forEach(function (canvas) {
+            var datos = graficos[canvas.getAttribute('data-chart')];
+            if (datos) { dibujar(canvas, datos); }
+        });
+    });
+})();
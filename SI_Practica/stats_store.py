@@ -0,0 +1,275 @@
+"""
+Almacén incremental de las métricas del dashboard.
+
+En lugar de recalcular calculate_metrics() sobre todo el histórico en cada
+petición, se mantienen agregados que se actualizan con cada lote de tickets
+nuevos (los posteriores a la marca de agua) y se leen en O(1):
+
+  - RunningStats: media/varianza de Welford (combinables con la fórmula de Chan)
+    más mínimo y máximo.
+  - KeyedCounter: un valor por clave (cliente, empleado) con la suma y la suma
+    de cuadrados de esos valores para obtener media/desviación entre claves,
+    y sus extremos.
+  - Histograma de contactos por ticket de Fraude para la mediana exacta.
+
+Los resultados coinciden con calculate_metrics() tras el redondeo a 2 decimales.
+"""
+import math
+import threading
+from collections import Counter
+from fractions import Fraction
+
+import numpy as np
+
+from analytics import load_ticket_frames, read_ticket_frames_sql, contacts_per_ticket, max_id_ticket
+from etl_process import DB_NAME
+
+
+class RunningStats:
+    """
+    Media y varianza de Welford con mínimo y máximo.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+
+    def add_batch(self, values):
+        """
+        Combina un lote de valores (array) con la fórmula paralela de Chan.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        n_b = len(values)
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.n = n
+        lo, hi = values.min().item(), values.max().item()
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+
+class KeyedCounter:
+    """
+    Valor acumulado por clave. Guarda la suma y la suma de cuadrados de los
+    valores de todas las claves para obtener su media y desviación en O(1).
+    Con valores enteros el cálculo es exacto.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.total = 0
+        self.total_sq = 0
+        self._min_key = None
+        self._max_key = None
+
+    def add(self, key, delta):
+        old = self.values.get(key, 0)
+        new = old + delta
+        self.values[key] = new
+        self.total += delta
+        self.total_sq += new * new - old * old
+        if self._max_key is None or new > self.values[self._max_key]:
+            self._max_key = key
+        if self._min_key is None or new < self.values[self._min_key]:
+            self._min_key = key
+        elif key == self._min_key and delta > 0:
+            # El mínimo ha crecido: se vuelve a buscar (solo en este caso)
+            self._min_key = min(self.values, key=self.values.get)
+
+    def __len__(self):
+        return len(self.values)
+
+    def mean(self):
+        return self.total / len(self.values)
+
+    def std(self):
+        n = len(self.values)
+        if isinstance(self.total, int):
+            var = Fraction(n * self.total_sq - self.total * self.total, n * (n - 1))
+        else:
+            var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(var, 0))
+
+    def min(self):
+        return self.values[self._min_key]
+
+    def max(self):
+        return self.values[self._max_key]
+
+
+class DashboardStats:
+    """
+    Métricas del dashboard mantenidas de forma incremental a partir de lotes
+    (tickets, contactos) con el formato de analytics.load_ticket_frames().
+    """
+
+    def __init__(self):
+        self.watermark = 0
+        self.total_tickets = 0
+        self.satisfied_by_client = KeyedCounter()
+        self.tickets_by_client = KeyedCounter()
+        self.ticket_total_time = RunningStats()
+        self.employee_time = KeyedCounter()
+        self.resolution_time = RunningStats()
+        self.employee_incidents = KeyedCounter()
+        self.fraude_contacts = Counter()
+
+    def add_frames(self, tickets, contacts):
+        """
+        Incorpora un lote de tickets nuevos con sus contactos.
+        """
+        if not len(tickets):
+            return
+        self.total_tickets += len(tickets)
+
+        satisfied = (tickets['satisfaccion_cliente'] >= 5).groupby(tickets['id_cliente']).sum()
+        for cliente, count in satisfied.items():
+            self.satisfied_by_client.add(int(cliente), int(count))
+        for cliente, count in tickets.groupby('id_cliente').size().items():
+            self.tickets_by_client.add(int(cliente), int(count))
+
+        self.ticket_total_time.add_batch(tickets['total_tiempo'].to_numpy())
+        self.resolution_time.add_batch(tickets['duracion'].to_numpy())
+
+        emp_time = contacts['tiempo'].astype(np.float64).groupby(contacts['id_emp']).sum()
+        for emp, tiempo in emp_time.items():
+            self.employee_time.add(int(emp), float(tiempo))
+        for emp, count in contacts.groupby('id_emp')['id_ticket'].nunique().items():
+            self.employee_incidents.add(int(emp), int(count))
+
+        fraude = contacts_per_ticket(tickets[tickets['id_inci'] == 5])
+        self.fraude_contacts.update(int(v) for v in fraude.to_numpy())
+
+        self.watermark = max(self.watermark, int(tickets['id_ticket'].max()))
+
+    def metrics(self):
+        """
+        Mismo diccionario que analytics.calculate_metrics(), en O(1).
+        """
+        metrics = {}
+        metrics['total_tickets'] = self.total_tickets
+
+        ok = self.satisfied_by_client
+        metrics['incidents_satisfied_mean'] = round2(ok.mean()) if len(ok) else 0
+        metrics['incidents_satisfied_std']  = round2(ok.std())  if len(ok) > 1 else 0
+
+        per_client = self.tickets_by_client
+        metrics['incidents_per_client_mean'] = round2(per_client.mean()) if len(per_client) else 0
+        metrics['incidents_per_client_std']  = round2(per_client.std())  if len(per_client) > 1 else 0
+
+        total_time = self.ticket_total_time
+        metrics['incident_total_time_mean'] = round2(total_time.mean) if total_time.n else 0
+        metrics['incident_total_time_std']  = round2(total_time.std()) if total_time.n > 1 else 0
+
+        emp_time = self.employee_time
+        metrics['employee_time_min'] = round2(emp_time.min()) if len(emp_time) else 0
+        metrics['employee_time_max'] = round2(emp_time.max()) if len(emp_time) else 0
+
+        resolution = self.resolution_time
+        metrics['resolution_time_min'] = int(resolution.min) if resolution.n else 0
+        metrics['resolution_time_max'] = int(resolution.max) if resolution.n else 0
+
+        emp_inci = self.employee_incidents
+        metrics['employee_incidents_min'] = int(emp_inci.min()) if len(emp_inci) else 0
+        metrics['employee_incidents_max'] = int(emp_inci.max()) if len(emp_inci) else 0
+
+        # Fraude
+        hist = self.fraude_contacts
+        n = sum(hist.values())
+        metrics['fraude_ticket_count'] = n
+        if n:
+            total = sum(v * c for v, c in hist.items())
+            total_sq = sum(v * v * c for v, c in hist.items())
+            metrics['fraude_contacts_mean']   = round2(total / n)
+            metrics['fraude_contacts_median'] = round2(histogram_median(hist, n))
+            metrics['fraude_contacts_var']    = round2(float(Fraction(n * total_sq - total * total, n * (n - 1)))) if n > 1 else 0
+            metrics['fraude_contacts_min']    = min(hist)
+            metrics['fraude_contacts_max']    = max(hist)
+        else:
+            metrics['fraude_contacts_mean']   = 0
+            metrics['fraude_contacts_median'] = 0
+            metrics['fraude_contacts_var']    = 0
+            metrics['fraude_contacts_min']    = 0
+            metrics['fraude_contacts_max']    = 0
+
+        return metrics
+
+
+def round2(x):
+    """
+    Redondeo a 2 decimales de numpy (x * 100 redondeado a par), el mismo que
+    aplica round() a los np.float64 de calculate_metrics(); el round() de Python
+    sobre un float puede diferir en los empates (8.205 -> 8.21 frente a 8.2).
+    """
+    return round(np.float64(x), 2)
+
+
+def histogram_median(hist, n):
+    """
+    Mediana a partir de un histograma {valor: frecuencia} (media de los dos
+    centrales si n es par, como pandas).
+    """
+    targets = [(n - 1) // 2, n // 2]
+    found = []
+    seen = 0
+    for value in sorted(hist):
+        seen += hist[value]
+        while len(found) < 2 and targets[len(found)] < seen:
+            found.append(value)
+        if len(found) == 2:
+            break
+    return (found[0] + found[1]) / 2
+
+
+# Almacenes incrementales por proceso, tipo y BD; se ponen al día leyendo
+# solo los tickets nuevos
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_incremental_store(kind, factory, db_name=DB_NAME):
+    """
+    Devuelve el almacén 'kind' (creado con factory()) al día con la BD. La
+    primera llamada lo construye a partir del modelo columnar; las siguientes
+    solo incorporan los tickets con id_ticket mayor que su marca de agua (p. ej.
+    los de add_incidente o de una ETL en otro proceso). Si la BD se ha
+    regenerado, se reconstruye. El almacén debe ofrecer add_frames() y watermark.
+    """
+    with _stores_lock:
+        key = (kind, db_name)
+        store = _stores.get(key)
+        max_id = max_id_ticket(db_name)
+        if store is None or max_id < store.watermark:
+            store = factory()
+            store.add_frames(*load_ticket_frames(db_name))
+            _stores[key] = store
+        elif max_id > store.watermark:
+            store.add_frames(*read_ticket_frames_sql(db_name, store.watermark))
+        return store
+
+
+def get_dashboard_stats(db_name=DB_NAME):
+    """
+    Almacén de métricas del dashboard al día con la BD.
+    """
+    return get_incremental_store('metrics', DashboardStats, db_name)
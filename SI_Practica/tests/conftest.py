@@ -0,0 +1,38 @@
+"""
+Fixtures comunes. Los módulos de la app están en SI_Practica/ (sin paquete) y
+trabajan con rutas relativas (incidentes.db, static/charts), así que las pruebas
+de la app se ejecutan en un directorio temporal con una BD sintética.
+"""
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'benchmarks'))
+
+# Tickets de la BD sintética de las pruebas de la app
+N_TICKETS = 2000
+
+
+@pytest.fixture(scope='session')
+def workdir(tmp_path_factory):
+    """Directorio de trabajo con incidentes.db sintética y static/charts."""
+    from synthetic import generate_db
+
+    path = tmp_path_factory.mktemp('app')
+    generate_db(str(path / 'incidentes.db'), N_TICKETS)
+    os.makedirs(path / 'static' / 'charts')
+    cwd = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope='session')
+def client(workdir):
+    import app
+
+    app.startup()
+    return app.app.test_client()
@@ -0,0 +1,78 @@
+import sqlite3
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib import cbook
+
+import analytics
+from analytics import boxplot_summary, load_ticket_frames, read_ticket_frames_sql
+from etl_process import dia_numero
+from snapshot import write_snapshot
+from synthetic import generate_db
+
+
+@pytest.mark.parametrize('values', [[4], [7, 6], [3, 9, 1], [5, 5, 5], [2, 8]])
+def test_boxplot_summary_matches_matplotlib(values):
+    expected = cbook.boxplot_stats(np.asarray(values, dtype=np.float64), whis=[5, 90])[0]
+    summary = boxplot_summary(values)
+    for key in ('whislo', 'q1', 'med', 'q3', 'whishi'):
+        assert summary[key] == pytest.approx(expected[key])
+
+
+def test_boxplot_summary_matches_matplotlib_random():
+    rng = np.random.default_rng(3)
+    for n in range(1, 40):
+        values = rng.integers(0, 30, size=n)
+        expected = cbook.boxplot_stats(values.astype(np.float64), whis=[5, 90])[0]
+        summary = boxplot_summary(values)
+        for key in ('whislo', 'q1', 'med', 'q3', 'whishi'):
+            assert summary[key] == pytest.approx(expected[key])
+
+
+def add_tickets(db_path, n, seed):
+    """Inserta n tickets con contactos posteriores al snapshot (delta)."""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for _ in range(n):
+            apertura = dia_numero(date(2015, 1, 1)) + int(rng.integers(0, 366 * 11))
+            cursor = conn.execute("""
+                INSERT INTO incidencia_ticket (fecha_apertura, fecha_cierre, es_mantenimiento,
+                                               satisfaccion_cliente, id_inci, id_cliente)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (apertura, apertura + int(rng.integers(1, 10)), int(rng.integers(0, 2)),
+                  int(rng.integers(1, 11)), int(rng.integers(1, 6)), int(rng.integers(1, 201))))
+            conn.execute("INSERT INTO contacto (id_ticket, id_emp, fecha, tiempo) VALUES (?, ?, ?, ?)",
+                         (cursor.lastrowid, int(rng.integers(101, 151)), apertura, 1.5))
+    conn.close()
+
+
+RANGOS = [(None, None), (date(2016, 3, 10), date(2017, 8, 20)), (None, date(2015, 6, 30)),
+          (date(2024, 1, 1), None), (date(2019, 5, 1), date(2019, 5, 31))]
+
+
+def assert_same_frames(actual, expected):
+    for got, want in zip(actual, expected):
+        got = got.sort_values('id_ticket', kind='stable').reset_index(drop=True)
+        want = want.sort_values('id_ticket', kind='stable').reset_index(drop=True)
+        pd.testing.assert_frame_equal(got, want, check_dtype=False, check_categorical=False)
+
+
+def test_ranged_snapshot_plus_delta_matches_sql(tmp_path):
+    pytest.importorskip('pyarrow')
+    db_path = str(tmp_path / 'incidentes.db')
+    generate_db(db_path, 3000)
+    snapshot_path = write_snapshot(db_path)
+    # Delta leído al abrir el snapshot y delta incorporado después
+    add_tickets(db_path, 50, seed=1)
+    for desde, hasta in RANGOS:
+        assert_same_frames(load_ticket_frames(db_path, desde, hasta),
+                           read_ticket_frames_sql(db_path, desde=desde, hasta=hasta))
+    add_tickets(db_path, 50, seed=2)
+    for desde, hasta in RANGOS:
+        assert_same_frames(load_ticket_frames(db_path, desde, hasta),
+                           read_ticket_frames_sql(db_path, desde=desde, hasta=hasta))
+    assert len(load_ticket_frames(db_path)[0]) == 3100
+    assert analytics._frames_cache[db_path]['path'] == snapshot_path
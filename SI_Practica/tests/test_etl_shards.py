@@ -0,0 +1,65 @@
+import json
+import random
+import sqlite3
+
+import pytest
+
+import etl_process
+
+TABLAS = {
+    'incidencia_ticket': 'id_ticket',
+    'contacto': 'id_contacto',
+    'cliente': 'id_cliente',
+    'empleado': 'id_emp',
+    'tipo_incidencia': 'id_inci',
+}
+
+
+@pytest.fixture(scope='module')
+def shards(tmp_path_factory):
+    """Directorio con 5 shards JSON con tickets, contactos y dimensiones."""
+    path = tmp_path_factory.mktemp('shards')
+    rng = random.Random(7)
+    for n in range(5):
+        data = {
+            'tipos_incidentes': [{'id_inci': i, 'nombre': f'Tipo {i}'} for i in range(1, 6)],
+            'clientes': [{'id_cli': c, 'nombre': f'Cliente {c}', 'telefono': '600000000', 'provincia': 'Madrid'}
+                         for c in range(1, 11)],
+            'empleados': [{'id_emp': e, 'nombre': f'Empleado {e}', 'nivel': 1 + e % 3,
+                           'fecha_contrato': '2015-03-01'} for e in range(101, 106)],
+            'tickets_emitidos': [{
+                'cliente': rng.randint(1, 10),
+                'fecha_apertura': f'2020-0{rng.randint(1, 9)}-{rng.randint(10, 28)}',
+                'fecha_cierre': '2020-12-31',
+                'es_mantenimiento': rng.random() < 0.3,
+                'satisfaccion_cliente': rng.randint(1, 10),
+                'tipo_incidencia': rng.randint(1, 5),
+                'es_critico': rng.random() < 0.5,
+                'contactos_con_empleados': [{'id_emp': rng.randint(101, 105), 'fecha': '2020-10-01',
+                                             'tiempo': round(rng.uniform(0.5, 8), 2)}
+                                            for _ in range(rng.randint(0, 3))],
+            } for _ in range(40)],
+        }
+        (path / f'shard_{n:02d}.json').write_text(json.dumps(data), encoding='utf-8')
+    return path
+
+
+def cargar(shards, destino, workers, monkeypatch):
+    destino.mkdir()
+    monkeypatch.chdir(destino)
+    etl_process.run_etl_shards(str(shards), workers)
+    conn = sqlite3.connect(str(destino / etl_process.DB_NAME))
+    try:
+        return {tabla: conn.execute(f"SELECT * FROM {tabla} ORDER BY {clave}").fetchall()
+                for tabla, clave in TABLAS.items()}
+    finally:
+        conn.close()
+
+
+def test_parallel_load_matches_single_worker(shards, tmp_path, monkeypatch):
+    un_worker = cargar(shards, tmp_path / 'uno', 1, monkeypatch)
+    varios = cargar(shards, tmp_path / 'varios', 3, monkeypatch)
+    assert len(un_worker['incidencia_ticket']) == 200
+    assert [t[0] for t in un_worker['incidencia_ticket']] == list(range(1, 201))
+    assert un_worker['contacto']
+    assert varios == un_worker
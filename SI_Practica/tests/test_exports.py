@@ -0,0 +1,99 @@
+import csv
+import inspect
+import io
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+
+from etl_process import dia_numero
+from exports import EXPORTS, _export_query, stream_export
+from synthetic import generate_db
+
+
+@pytest.fixture(scope='module')
+def db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('exports') / 'incidentes.db')
+    generate_db(path, 1000)
+    return path
+
+
+def contar(db_path, query, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(query, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_csv_streams_header_then_chunks(db_path):
+    chunks = stream_export('tickets', 'csv', db_name=db_path, chunk=100)
+    assert inspect.isgenerator(chunks)
+    # La cabecera sale sola, antes de leer filas
+    assert next(chunks) == ('id_ticket,fecha_apertura,fecha_cierre,duracion,es_mantenimiento,'
+                            'satisfaccion_cliente,id_inci,id_cliente\n')
+    resto = list(chunks)
+    assert len(resto) == 10
+    assert all(chunk.count('\n') == 100 for chunk in resto)
+
+    rows = list(csv.reader(io.StringIO(''.join(resto))))
+    assert len(rows) == contar(db_path, "SELECT COUNT(*) FROM incidencia_ticket")
+    assert [int(row[0]) for row in rows] == sorted(int(row[0]) for row in rows)
+    date.fromisoformat(rows[0][1])
+
+
+def test_ndjson_filters_by_range_and_type(db_path):
+    desde, hasta = date(2018, 1, 1), date(2020, 6, 30)
+    lines = ''.join(stream_export('contactos', 'ndjson', desde, hasta, tipo=5,
+                                  db_name=db_path, chunk=64)).splitlines()
+    esperado = contar(db_path, """
+        SELECT COUNT(*) FROM contacto co JOIN incidencia_ticket t ON t.id_ticket = co.id_ticket
+        WHERE t.id_inci = 5 AND t.fecha_apertura BETWEEN ? AND ?
+    """, (dia_numero(desde), dia_numero(hasta)))
+    assert esperado > 0
+    assert len(lines) == esperado
+    first = json.loads(lines[0])
+    assert list(first) == ['id_contacto', 'id_ticket', 'id_emp', 'fecha', 'tiempo']
+    date.fromisoformat(first['fecha'])
+
+
+@pytest.mark.parametrize('nombre', list(EXPORTS))
+@pytest.mark.parametrize('desde, hasta, tipo', [(None, None, None), (None, None, 5), (date(2018, 1, 1), None, None),
+                                                (date(2018, 1, 1), date(2020, 6, 30), 5)])
+def test_export_plan_needs_no_sort(db_path, nombre, desde, hasta, tipo):
+    query, params = _export_query(nombre, desde, hasta, tipo)
+    conn = sqlite3.connect(db_path)
+    try:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+    finally:
+        conn.close()
+    assert not any('TEMP B-TREE' in paso for paso in plan), plan
+    if desde is not None:
+        assert any('idx_ticket_apertura' in paso for paso in plan), plan
+
+
+def test_ranged_export_follows_opening_date(db_path):
+    rows = list(csv.reader(io.StringIO(''.join(
+        stream_export('tickets', 'csv', date(2018, 1, 1), date(2020, 6, 30), db_name=db_path)))))[1:]
+    assert len(rows) == contar(db_path, "SELECT COUNT(*) FROM incidencia_ticket WHERE fecha_apertura BETWEEN ? AND ?",
+                               (dia_numero(date(2018, 1, 1)), dia_numero(date(2020, 6, 30))))
+    claves = [(row[1], int(row[0])) for row in rows]
+    assert claves == sorted(claves)
+
+
+def test_joined_export_has_one_row_per_join_row(db_path):
+    rows = list(csv.reader(io.StringIO(''.join(stream_export('tickets_contactos', 'csv', db_name=db_path)))))
+    assert len(rows) - 1 == contar(db_path, """
+        SELECT COUNT(*) FROM incidencia_ticket t LEFT JOIN contacto co ON co.id_ticket = t.id_ticket
+    """)
+
+
+def test_export_route_streams(client):
+    response = client.get('/export/tickets.ndjson')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    assert len(response.get_data(as_text=True).splitlines()) == \
+        contar('incidentes.db', "SELECT COUNT(*) FROM incidencia_ticket")
+    assert client.get('/export/tickets.xml').status_code == 404
@@ -0,0 +1,81 @@
+import os
+import shutil
+import sqlite3
+from datetime import date
+
+import pytest
+
+from etl_process import SCHEMA_VERSION, dia_numero, ensure_schema
+
+SHIPPED_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'incidentes.db')
+
+
+def leer(db_path, query):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+
+def columnas(db_path, tabla):
+    return {row[1] for row in leer(db_path, f"PRAGMA table_xinfo({tabla})")}
+
+
+@pytest.fixture
+def shipped_copy(tmp_path):
+    """Copia de la BD del repositorio (esquema original, user_version 0)."""
+    db_path = str(tmp_path / 'incidentes.db')
+    shutil.copyfile(SHIPPED_DB, db_path)
+    assert leer(db_path, "PRAGMA user_version") == [(0,)]
+    return db_path
+
+
+def test_migrates_shipped_db_from_v0(shipped_copy):
+    tickets = leer(shipped_copy, "SELECT id_ticket, fecha_apertura, fecha_cierre FROM incidencia_ticket ORDER BY 1")
+    contactos = leer(shipped_copy, "SELECT id_contacto, fecha FROM contacto ORDER BY 1")
+    empleados = leer(shipped_copy, "SELECT id_emp, fecha_contrato FROM empleado ORDER BY 1")
+
+    ensure_schema(shipped_copy)
+
+    assert leer(shipped_copy, "PRAGMA user_version") == [(SCHEMA_VERSION,)]
+    assert {'es_critico', 'duracion', 'dia_semana'} <= columnas(shipped_copy, 'incidencia_ticket')
+    assert 'dia_semana' in columnas(shipped_copy, 'contacto')
+
+    migrados = leer(shipped_copy, """
+        SELECT id_ticket, fecha_apertura, fecha_cierre, duracion, dia_semana, es_critico
+        FROM incidencia_ticket ORDER BY 1
+    """)
+    assert len(migrados) == len(tickets)
+    for (id_ticket, apertura, cierre), row in zip(tickets, migrados):
+        assert row[:3] == (id_ticket, dia_numero(apertura), dia_numero(cierre))
+        assert row[3] == dia_numero(cierre) - dia_numero(apertura)
+        assert row[4] == date.fromisoformat(apertura).weekday()
+        assert row[5] is None
+    assert leer(shipped_copy, "SELECT id_contacto, fecha FROM contacto ORDER BY 1") == \
+        [(id_contacto, dia_numero(fecha)) for id_contacto, fecha in contactos]
+    assert leer(shipped_copy, "SELECT id_emp, fecha_contrato FROM empleado ORDER BY 1") == \
+        [(id_emp, dia_numero(fecha)) for id_emp, fecha in empleados]
+
+    # Una segunda ejecución no cambia nada
+    ensure_schema(shipped_copy)
+    assert leer(shipped_copy, "SELECT id_ticket, fecha_apertura, fecha_cierre, duracion, dia_semana, es_critico "
+                              "FROM incidencia_ticket ORDER BY 1") == migrados
+
+
+def test_migrates_v2_by_adding_es_critico(shipped_copy):
+    ensure_schema(shipped_copy)
+    conn = sqlite3.connect(shipped_copy)
+    conn.execute("ALTER TABLE incidencia_ticket DROP COLUMN es_critico")
+    conn.execute("PRAGMA user_version = 2")
+    conn.commit()
+    conn.close()
+    antes = leer(shipped_copy, "SELECT * FROM incidencia_ticket ORDER BY 1")
+
+    ensure_schema(shipped_copy)
+
+    assert leer(shipped_copy, "PRAGMA user_version") == [(SCHEMA_VERSION,)]
+    assert 'es_critico' in columnas(shipped_copy, 'incidencia_ticket')
+    assert leer(shipped_copy, "SELECT id_ticket, fecha_apertura, fecha_cierre, es_mantenimiento, "
+                              "satisfaccion_cliente, id_inci, id_cliente FROM incidencia_ticket ORDER BY 1") == \
+        [row[:7] for row in antes]
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import ml_models
+from ml_models import MODEL_FILES, OnlineLogit, current_version, load_versioned_models, predict_criticality
+from online_training import update_models
+from synthetic import generate_db
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TICKET = {'es_mantenimiento': 1, 'satisfaccion_cliente': 2, 'tipo_incidencia': 3,
+          'duracion': 9, 'num_contactos': 2, 'tiempo_total': 3.5}
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    generate_db(str(tmp_path / 'incidentes.db'), 600)
+    monkeypatch.chdir(tmp_path)
+    # Sin modelos cargados de otras pruebas
+    monkeypatch.setattr(ml_models, '_loaded', (None, None))
+    return tmp_path
+
+
+def test_models_published_by_the_script_load_in_the_app(app_dir):
+    # Como en el README: el reentrenamiento se lanza como script (__main__)
+    subprocess.run([sys.executable, os.path.join(BASE_DIR, 'online_training.py'), '--forzar'],
+                   cwd=app_dir, check=True, capture_output=True)
+    version = current_version()
+    assert version is not None
+
+    loaded_version, models = load_versioned_models()
+    assert loaded_version == version
+    assert set(models) == set(MODEL_FILES)
+    assert type(models['lr']) is OnlineLogit
+    for model in models.values():
+        prediccion, probabilidad = predict_criticality(model, TICKET)
+        assert prediccion in (0, 1) and 0 <= probabilidad <= 1
+
+
+def test_unreadable_version_is_retrained(app_dir):
+    primera = update_models('incidentes.db', forzar=True)
+    with open(os.path.join('models', primera, MODEL_FILES['lr']), 'wb') as f:
+        f.write(b'no es un pickle')
+
+    segunda = update_models('incidentes.db', forzar=True)
+    assert segunda not in (None, primera)
+    assert current_version() == segunda
+    assert type(load_versioned_models()[1]['lr']) is OnlineLogit
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import tracemalloc
+
+import pytest
+
+import profiling
+from synthetic import generate_db
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = profiling.MB
+
+
+@pytest.fixture
+def perfilado(monkeypatch):
+    monkeypatch.setattr(profiling, 'ENABLED', True)
+    monkeypatch.setattr(profiling, '_stats', {})
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+
+@pytest.mark.skipif(profiling.ENABLED, reason="SI_PROFILE_MEMORY activado en el entorno")
+def test_disabled_by_default(client, monkeypatch):
+    monkeypatch.setattr(profiling, '_stats', {})
+    with profiling.stage('lectura'):
+        pass
+    assert profiling.memory_stats() == {'rutas': {}, 'etapas': {}}
+    assert not tracemalloc.is_tracing()
+    assert client.get('/debug/memoria').status_code == 404
+
+
+def test_nested_stages_record_peak_and_retained(perfilado):
+    with profiling.stage('exterior'):
+        retenido = bytearray(2 * MB)
+        with profiling.stage('interior'):
+            temporal = bytearray(8 * MB)
+            del temporal
+    etapas = profiling.memory_stats()['etapas']
+    assert etapas['interior']['pico_max_mb'] >= 7.9
+    assert etapas['interior']['retenido_ultimo_mb'] < 0.5
+    # El pico de la etapa interior cuenta para la exterior
+    assert etapas['exterior']['pico_max_mb'] >= 9.9
+    assert 1.9 <= etapas['exterior']['retenido_ultimo_mb'] < 2.5
+    assert etapas['exterior']['llamadas'] == etapas['interior']['llamadas'] == 1
+    assert len(retenido) == 2 * MB
+
+
+@pytest.fixture(scope='module')
+def app_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('profiling')
+    generate_db(str(path / 'incidentes.db'), 600)
+    os.makedirs(path / 'static' / 'charts')
+    return path
+
+
+def run(args, cwd):
+    env = dict(os.environ, PYTHONPATH=BASE_DIR, MPLBACKEND='Agg', SI_PROFILE_MEMORY='1')
+    return subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True, timeout=300)
+
+
+def test_enabled_routes_and_debug_view(app_dir):
+    script = textwrap.dedent("""
+        import json
+        import app
+        app.startup()
+        client = app.app.test_client()
+        assert client.get('/').status_code == 200
+        print(json.dumps(client.get('/debug/memoria?top=5').get_json()))
+    """)
+    result = run(['-c', script], app_dir)
+    assert result.returncode == 0, result.stderr
+    datos = json.loads(result.stdout.strip().splitlines()[-1])
+    assert datos['rutas']['/']['llamadas'] == 1
+    assert datos['rutas']['/']['pico_max_mb'] > 0
+    assert {'frames', 'metricas', 'graficos'} <= set(datos['etapas'])
+    assert 0 < len(datos['top']) <= 5
+
+
+def test_bench_fails_over_budget(app_dir):
+    bench = os.path.join(BASE_DIR, 'benchmarks', 'bench_memory.py')
+    result = run([bench, '--tickets', '600', '--repeticiones', '1', '--presupuesto', '/=0.001'], app_dir)
+    assert result.returncode == 1, result.stderr
+    assert 'Presupuesto superado en: /' in result.stdout
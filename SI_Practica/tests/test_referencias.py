@@ -0,0 +1,39 @@
+import sqlite3
+
+import pytest
+
+from referencias import referencias, tabla
+from replica import publish_replica
+from synthetic import generate_db
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'incidentes.db')
+    generate_db(path, 300)
+    publish_replica(path)
+    return path
+
+
+def ejecutar(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_ticket_inserts_keep_the_cache(db_path):
+    refs = referencias(db_path)
+    ejecutar(db_path, "INSERT INTO incidencia_ticket (fecha_apertura, fecha_cierre, id_inci, id_cliente) "
+                      "VALUES (20000, 20002, 1, 1)")
+    # Como la publicación en segundo plano de add_incidente
+    publish_replica(db_path, dimensiones=False)
+    assert referencias(db_path) is refs
+
+
+def test_dimension_changes_invalidate_the_cache(db_path):
+    refs = referencias(db_path)
+    ejecutar(db_path, "UPDATE cliente SET nombre = ? WHERE id_cliente = 1", ("Cliente renombrado",))
+    publish_replica(db_path)
+    assert referencias(db_path) is not refs
+    assert tabla('clientes', db_path).nombres([1])[0] == "Cliente renombrado"
@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+
+import pytest
+
+import replica
+from replica import connect_read, publish_replica, schedule_publish
+from synthetic import generate_db
+
+
+def max_id_replica(db_path):
+    conn = connect_read(db_path)
+    try:
+        return conn.execute("SELECT MAX(id_ticket) FROM incidencia_ticket").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def insertar(db_path):
+    conn = sqlite3.connect(db_path)
+    cur = conn.execute("INSERT INTO incidencia_ticket (fecha_apertura, fecha_cierre, id_inci, id_cliente) "
+                       "VALUES (20000, 20003, 1, 1)")
+    conn.commit()
+    conn.close()
+    return cur.lastrowid
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'incidentes.db')
+    generate_db(path, 200)
+    publish_replica(path)
+
+    publicadas = []
+    original = replica.publish_replica
+
+    def contar(db_name, **kwargs):
+        publicadas.append(db_name)
+        return original(db_name, **kwargs)
+
+    monkeypatch.setattr(replica, 'publish_replica', contar)
+    return path, publicadas
+
+
+def test_inserts_are_published_together(db_path, monkeypatch):
+    path, publicadas = db_path
+    monkeypatch.setattr(replica, 'PUBLISH_INTERVAL', 0.3)
+    publicado = threading.Event()
+    llamadas = []
+
+    def after(db_name):
+        llamadas.append(db_name)
+        publicado.set()
+
+    for _ in range(20):
+        ultimo = insertar(path)
+        schedule_publish(path, after=after)
+    # Los lectores siguen con la réplica anterior hasta la publicación
+    assert max_id_replica(path) == 200
+
+    assert publicado.wait(10)
+    assert publicadas == [path]
+    assert llamadas == [path]
+    assert max_id_replica(path) == ultimo
+
+
+def test_batch_size_triggers_publication(db_path, monkeypatch):
+    path, publicadas = db_path
+    monkeypatch.setattr(replica, 'PUBLISH_INTERVAL', 60)
+    monkeypatch.setattr(replica, 'PUBLISH_BATCH', 5)
+    publicado = threading.Event()
+
+    def after(db_name):
+        publicado.set()
+
+    for _ in range(5):
+        ultimo = insertar(path)
+        schedule_publish(path, after=after)
+
+    assert publicado.wait(10)
+    assert publicadas == [path]
+    assert max_id_replica(path) == ultimo
@@ -0,0 +1,99 @@
+import io
+import sqlite3
+from datetime import date
+
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from etl_process import dia_numero
+from reports import _apendice_query, appendix_story, build_full_report, merge_pdfs, plan_sections
+from synthetic import generate_db
+
+pypdf = pytest.importorskip('pypdf')
+
+DESDE, HASTA = date(2019, 1, 1), date(2019, 12, 31)
+
+
+@pytest.fixture(scope='module')
+def db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('reports') / 'incidentes.db')
+    generate_db(path, 1500)
+    return path
+
+
+def contar(db_path, query, params=()):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(query, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def pdf_de_prueba(path, paginas):
+    c = canvas.Canvas(str(path), pagesize=A4)
+    for i in range(paginas):
+        c.drawString(100, 700, f"{path.name} página {i + 1}")
+        c.showPage()
+    c.save()
+    return str(path)
+
+
+def outline(reader):
+    return [(item.title, reader.get_destination_page_number(item)) for item in reader.outline]
+
+
+def test_merge_pdfs_pages_and_outline(tmp_path):
+    parts = [(pdf_de_prueba(tmp_path / f'{i}.pdf', paginas), f"Sección {i}")
+             for i, paginas in enumerate((1, 3, 2))]
+    output = io.BytesIO()
+    merge_pdfs(parts, output)
+
+    reader = pypdf.PdfReader(io.BytesIO(output.getvalue()))
+    assert len(reader.pages) == 6
+    assert outline(reader) == [("Sección 0", 0), ("Sección 1", 1), ("Sección 2", 4)]
+    assert 'página 3' in reader.pages[3].extract_text()
+
+
+def filas_con_datos(db_path, section):
+    """Filas del apéndice de la sección con ticket (clientes) o contacto (empleados)."""
+    nombre, primero, ultimo, _, desde, hasta = section
+    query, params = _apendice_query(nombre, 'filas', desde, hasta)
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(query, (*params, primero, ultimo)).fetchall()
+    finally:
+        conn.close()
+    columna = 2 if nombre == 'clientes' else 3
+    return sum(1 for row in rows if row[columna] is not None)
+
+
+def test_appendices_follow_date_range(db_path, monkeypatch):
+    monkeypatch.setattr('reports.SECTION_ROWS', 40)
+    params = (dia_numero(DESDE), dia_numero(HASTA))
+    tickets = contar(db_path, "SELECT COUNT(*) FROM incidencia_ticket WHERE fecha_apertura BETWEEN ? AND ?", params)
+    contactos = contar(db_path, """
+        SELECT COUNT(*) FROM contacto co JOIN incidencia_ticket t ON t.id_ticket = co.id_ticket
+        WHERE t.fecha_apertura BETWEEN ? AND ?
+    """, params)
+    assert 0 < tickets < contar(db_path, "SELECT COUNT(*) FROM incidencia_ticket")
+
+    sections = plan_sections(['clientes', 'empleados'], db_path, DESDE, HASTA)
+    # El rango viaja en la sección hasta el worker que la maqueta
+    assert all(section[4:] == (DESDE, HASTA) for section in sections)
+    assert sum(filas_con_datos(db_path, s) for s in sections if s[0] == 'clientes') == tickets
+    assert sum(filas_con_datos(db_path, s) for s in sections if s[0] == 'empleados') == contactos
+    assert appendix_story(*sections[0][:3], db_path, DESDE, HASTA)
+
+
+def test_full_report_with_range(db_path, tmp_path):
+    path = tmp_path / 'informe.pdf'
+    n = build_full_report(str(path), {'total_tickets': 1}, {}, db_name=db_path, workers=1,
+                          desde=DESDE, hasta=HASTA)
+    reader = pypdf.PdfReader(str(path))
+    titulos = [titulo for titulo, _ in outline(reader)]
+    assert len(titulos) == n
+    assert titulos[0] == "Resumen"
+    assert titulos[1].startswith("Apéndice por cliente")
+    assert any(t.startswith("Apéndice por empleado") for t in titulos)
+    assert len(reader.pages) >= n
@@ -0,0 +1,41 @@
+import pytest
+
+
+@pytest.mark.parametrize('url', ['/top_clientes/5', '/top_tiempos_incidencias/5', '/api/top_clientes/5',
+                                 '/api/top_tiempos_incidencias/5', '/api/top_reportes/5/no'])
+def test_top_links_with_default_values_do_not_redirect(client, url):
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.parametrize('url', ['/top_clientes', '/top_tiempos_incidencias', '/api/top_clientes'])
+def test_top_routes_default_to_five(client, url):
+    assert client.get(url).status_code == 200
+
+
+def test_api_top_clientes_default_size(client):
+    assert client.get('/api/top_clientes').get_json() == client.get('/api/top_clientes/5').get_json()
+
+
+@pytest.mark.parametrize('url', ['/?desde=2030-01-01', '/?desde=2030-01-01&modo=aprox',
+                                 '/generate_report?desde=2030-01-01',
+                                 '/generate_report?desde=2030-01-01&apendices=clientes,empleados'])
+def test_empty_date_range_renders(client, url):
+    assert client.get(url).status_code == 200
+
+
+def test_chart_files_are_per_range(client, workdir):
+    import re
+
+    def pngs(url):
+        html = client.get(url).get_data(as_text=True)
+        return {src: (workdir / 'static' / src).read_bytes()
+                for src in re.findall(r'src="/static/(charts/chart\d-[^"?]+\.png)', html)}
+
+    rango_a = pngs('/?desde=2016-01-01&hasta=2016-12-31')
+    rango_b = pngs('/?desde=2020-01-01&hasta=2020-12-31')
+    assert len(rango_a) == len(rango_b) == 5
+    assert not set(rango_a) & set(rango_b)
+    # Los PNG de la primera petición siguen intactos tras la segunda
+    assert all((workdir / 'static' / src).read_bytes() == data for src, data in rango_a.items())
+    assert rango_a['charts/chart4-exacto_2016-01-01_2016-12-31.png'] != \
+        rango_b['charts/chart4-exacto_2020-01-01_2020-12-31.png']
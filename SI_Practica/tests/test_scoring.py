@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import ml_models
+import scoring
+from ml_models import predict_criticality
+from online_training import publish_models, read_meta, update_models
+from scoring import SHAPE, get_scorer, table_path
+from synthetic import generate_db
+
+EN_TABLA = {'es_mantenimiento': 1, 'satisfaccion_cliente': 4, 'tipo_incidencia': 2,
+            'duracion': 12, 'num_contactos': 1, 'tiempo_total': 1.0}
+# num_contactos fuera de los valores fijos de la tabla: pasa por el LRU
+FUERA = dict(EN_TABLA, num_contactos=3, tiempo_total=2.5)
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    generate_db(str(tmp_path / 'incidentes.db'), 600)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ml_models, '_loaded', (None, None))
+    monkeypatch.setattr(scoring, '_scorer', None)
+    update_models('incidentes.db', forzar=True)
+    return tmp_path
+
+
+def test_published_tables_match_model_inference(app_dir):
+    scorer = get_scorer()
+    assert set(scorer.tables) == {'lr', 'dt', 'rf'}
+    for key, model in scorer.models.items():
+        assert scorer.tables[key].shape == SHAPE
+        assert isinstance(scorer.tables[key], np.memmap)
+        prediccion, probabilidad = scorer.score(key, EN_TABLA)
+        esperado = predict_criticality(model, EN_TABLA)
+        assert prediccion == esperado[0]
+        assert probabilidad == pytest.approx(esperado[1])
+    # Dentro del dominio no se llega a inferir
+    assert scorer._infer.cache_info().currsize == 0
+
+
+def test_out_of_domain_predictions_use_lru(app_dir):
+    scorer = get_scorer()
+    primera = scorer.score('rf', FUERA)
+    assert scorer._infer.cache_info().misses == 1
+    assert scorer.score('rf', FUERA) == primera
+    info = scorer._infer.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+    assert primera[1] == pytest.approx(predict_criticality(scorer.models['rf'], FUERA)[1])
+
+
+def test_missing_table_falls_back_to_lru(app_dir):
+    version = get_scorer().version
+    (app_dir / table_path(f'models/{version}', 'dt')).unlink()
+    scoring._scorer = None
+    scorer = get_scorer()
+    assert 'dt' not in scorer.tables
+    scorer.score('dt', EN_TABLA)
+    assert scorer._infer.cache_info().misses == 1
+
+
+def test_new_version_gets_new_scorer(app_dir):
+    anterior = get_scorer()
+    anterior.score('lr', FUERA)
+    assert get_scorer() is anterior
+
+    version = publish_models(anterior.models, read_meta(anterior.version))
+    scorer = get_scorer()
+    assert scorer is not anterior
+    assert scorer.version == version
+    assert scorer._infer.cache_info().currsize == 0
+    assert set(scorer.tables) == {'lr', 'dt', 'rf'}
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from analytics import calculate_fraude_groupings, read_ticket_frames_sql
+from charts import bar_aggregates
+from etl_process import dia_numero
+from sketches import DailySketches, KLLSketch
+from synthetic import generate_db
+
+QS = [0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95]
+
+
+def peso_total(sketch):
+    return sum(len(items) << h for h, items in enumerate(sketch.compactors))
+
+
+@pytest.mark.parametrize('n', [1, 2, 601, 200_001])
+def test_kll_weight_equals_n(n):
+    sk = KLLSketch()
+    values = np.random.default_rng(n).permutation(n)
+    for start in range(0, n, 997):
+        sk.update_many(values[start:start + 997].tolist())
+    assert sk.n == n
+    assert peso_total(sk) == n
+
+
+def test_kll_merge_weight_equals_n():
+    rng = np.random.default_rng(1)
+    result = KLLSketch()
+    n = 0
+    for size in rng.integers(1, 5000, size=60):
+        sk = KLLSketch()
+        sk.update_many(rng.random(size).tolist())
+        result.merge(sk)
+        n += int(size)
+    assert result.n == n
+    assert peso_total(result) == n
+
+
+def test_kll_rank_error_within_bound():
+    n = 200_000
+    sk = KLLSketch()
+    values = np.random.default_rng(7).permutation(n)
+    sk.update_many(values.tolist())
+    # Con una permutación de 0..n-1 el rango de un valor v es v / n
+    for q, v in zip(QS, sk.quantiles(QS)):
+        assert abs(v / n - q) <= 0.017
+
+
+def barras_como_listas(barras):
+    return {name: ([str(label) for label in s.index], [float(v) for v in s.to_numpy()])
+            for name, s in barras.items()}
+
+
+@pytest.fixture(scope='module')
+def sketches_db(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp('sketches') / 'sketches.db')
+    generate_db(db_path, 3000)
+    tickets, contacts = read_ticket_frames_sql(db_path)
+    sketches = DailySketches(db_path)
+    for lo, hi in ((0, 1), (1, 1700), (1700, 3000)):
+        ids = tickets['id_ticket'].iloc[lo:hi]
+        sketches.add_frames(tickets.iloc[lo:hi], contacts[contacts['id_ticket'].isin(ids)])
+    return db_path, tickets, contacts, sketches
+
+
+@pytest.mark.parametrize('desde,hasta', [
+    (None, None),
+    ('2019-03-01', '2019-03-31'),
+    ('2018-02-17', '2021-11-03'),
+    (None, '2016-06-15'),
+    ('2024-12-31', None),
+    ('2030-01-01', None),
+])
+def test_exact_counters_match_frames(sketches_db, desde, hasta):
+    db_path, tickets, contacts, sketches = sketches_db
+    desde, hasta = dia_numero(desde), dia_numero(hasta)
+    if desde is not None or hasta is not None:
+        apertura = tickets['fecha_apertura']
+        mask = (apertura >= (desde if desde is not None else apertura.min())) & \
+               (apertura <= (hasta if hasta is not None else apertura.max()))
+        tickets = tickets[mask]
+        contacts = contacts[contacts['id_ticket'].isin(tickets['id_ticket'])]
+
+    summary = sketches.summary(desde, hasta)
+    assert barras_como_listas(summary['barras']) == barras_como_listas(bar_aggregates(tickets, contacts))
+    assert summary['fraude_groupings'] == calculate_fraude_groupings(tickets, contacts, db_path)
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import snapshot
+from synthetic import generate_db
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture(scope='module')
+def snap_path(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp('snapshot') / 'incidentes.db')
+    generate_db(db_path, 3000)
+    return snapshot.write_snapshot(db_path)
+
+
+def mapped_ranges(path):
+    """Rangos de direcciones de este proceso donde está mapeado 'path'."""
+    ranges = []
+    with open('/proc/self/maps', encoding='utf-8') as f:
+        for line in f:
+            if line.rstrip().endswith(os.path.realpath(path)):
+                start, end = line.split()[0].split('-')
+                ranges.append((int(start, 16), int(end, 16)))
+    return ranges
+
+
+def test_snapshot_has_only_fact_partitions(snap_path):
+    ficheros = os.listdir(snap_path)
+    assert 'clientes.feather' not in ficheros and 'empleados.feather' not in ficheros
+    snap = snapshot.read_snapshot(snap_path)
+    assert set(snap) == {'watermark', 'partitions'}
+    assert {f"tickets-{part}.feather" for part in snap['partitions']} <= set(ficheros)
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/maps'), reason="necesita /proc/self/maps")
+def test_partition_columns_point_into_mapped_file(snap_path):
+    part = snapshot.read_snapshot(snap_path)['partitions'][0]
+    tickets, contacts = snapshot.read_partition(snap_path, part)
+    for df, fichero in ((tickets, 'tickets'), (contacts, 'contacts')):
+        ranges = mapped_ranges(os.path.join(snap_path, f"{fichero}-{part}.feather"))
+        assert ranges
+        for col in df.select_dtypes('number'):
+            address = df[col].to_numpy().__array_interface__['data'][0]
+            assert any(start <= address < end for start, end in ranges), col
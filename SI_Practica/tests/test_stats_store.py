@@ -0,0 +1,50 @@
+import random
+import sqlite3
+
+from analytics import calculate_metrics, read_ticket_frames_sql
+from etl_process import dia_numero
+from stats_store import DashboardStats, get_dashboard_stats
+from synthetic import generate_db
+
+
+def insert_ticket(db_path, rng, con_contacto=True):
+    """Misma inserción que /add_incidente."""
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO incidencia_ticket
+        (fecha_apertura, fecha_cierre, es_mantenimiento, satisfaccion_cliente, id_inci, id_cliente)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (dia_numero("2025-03-03"), dia_numero(f"2025-03-{rng.randint(3, 13):02d}"), rng.randint(0, 1),
+          rng.randint(0, 10), rng.randint(1, 5), rng.randint(1, 220)))
+    if con_contacto:
+        cur.execute("INSERT INTO contacto (id_ticket, id_emp, fecha, tiempo) VALUES (?, ?, ?, ?)",
+                    (cur.lastrowid, rng.randint(101, 155), dia_numero("2025-03-03"), rng.randint(1, 8) / 2))
+    conn.commit()
+    conn.close()
+
+
+def test_batches_match_full_recompute(tmp_path):
+    db_path = str(tmp_path / 'stats.db')
+    generate_db(db_path, 3000)
+    tickets, contacts = read_ticket_frames_sql(db_path)
+
+    stats = DashboardStats()
+    for lo, hi in ((0, 1), (1, 1200), (1200, 3000)):
+        ids = tickets['id_ticket'].iloc[lo:hi]
+        stats.add_frames(tickets.iloc[lo:hi], contacts[contacts['id_ticket'].isin(ids)])
+
+    assert stats.metrics() == calculate_metrics(tickets, contacts)
+
+
+def test_store_matches_full_recompute_after_inserts(tmp_path):
+    db_path = str(tmp_path / 'stats.db')
+    generate_db(db_path, 1500)
+    rng = random.Random(1)
+    assert get_dashboard_stats(db_path).metrics() == calculate_metrics(*read_ticket_frames_sql(db_path))
+
+    for i in range(30):
+        insert_ticket(db_path, rng, con_contacto=i % 5 != 0)
+        if i % 10 == 9:
+            incremental = get_dashboard_stats(db_path).metrics()
+            assert incremental == calculate_metrics(*read_ticket_frames_sql(db_path))
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('seaborn')
+
+import train_models  # noqa: E402
+from ml_models import OnlineLogit  # noqa: E402
+from synthetic import generate_db  # noqa: E402
+from train_models import RF_TREES, StratifiedSample, in_holdout, train_out_of_core  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'incidentes.db')
+    generate_db(path, 3000)
+    (tmp_path / 'static' / 'charts').mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    return path
+
+
+def test_in_holdout_is_deterministic_and_near_test_size():
+    ids = np.arange(1, 100_001)
+    test = in_holdout(ids)
+    assert np.array_equal(test, in_holdout(ids))
+    assert test.mean() == pytest.approx(train_models.TEST_SIZE, abs=0.01)
+
+
+def test_stratified_sample_keeps_size_per_class():
+    rng = np.random.default_rng(0)
+    sample = StratifiedSample({0: 30, 1: 10})
+    chunks = [pd.DataFrame({'id_ticket': np.arange(i * 100, (i + 1) * 100),
+                            'es_critico': rng.integers(0, 2, 100)}) for i in range(5)]
+    for chunk in chunks:
+        sample.add(chunk)
+    frame = sample.frame()
+    assert frame['es_critico'].value_counts().to_dict() == {0: 30, 1: 10}
+    assert frame['id_ticket'].is_unique
+    assert set(frame['id_ticket']) <= set(pd.concat(chunks)['id_ticket'])
+    assert '_clave' not in frame
+
+
+def test_out_of_core_reads_bounded_chunks(db_path, monkeypatch):
+    monkeypatch.setattr(train_models, 'TREE_SAMPLE', 400)
+    monkeypatch.setattr(train_models, 'EVAL_SAMPLE', 200)
+    leidos = []
+    stream = train_models.stream_labelled
+
+    def spy(db_name, chunk):
+        for df in stream(db_name, chunk):
+            leidos.append(len(df))
+            yield df
+
+    monkeypatch.setattr(train_models, 'stream_labelled', spy)
+    models, watermark = train_out_of_core(db_path, chunk=500)
+
+    conn = sqlite3.connect(db_path)
+    n, max_id = conn.execute("SELECT COUNT(*), MAX(id_ticket) FROM incidencia_ticket "
+                             "WHERE es_critico IS NOT NULL").fetchone()
+    conn.close()
+    assert sum(leidos) == n and max(leidos) <= 500 and len(leidos) > 1
+    assert watermark == max_id
+    assert isinstance(models['lr'], OnlineLogit)
+    # Los árboles del bosque se reparten entre los bloques
+    assert len(models['rf'].estimators_) == models['rf'].n_estimators >= RF_TREES
+    # El árbol se entrena con la muestra estratificada, no con todo el histórico
+    assert models['dt'].tree_.n_node_samples[0] <= 401
+    assert os.path.exists(os.path.join('static', 'charts', 'decision_tree.png'))
@@ -0,0 +1,61 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from synthetic import generate_db
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imita al maestro de gunicorn: lee gunicorn.conf.py, precarga wsgi.py, ejecuta
+# when_ready (gc.freeze) y sirve peticiones desde un worker creado con fork
+MAESTRO = textwrap.dedent("""
+    import gc, logging, os, runpy, sys
+
+    conf = runpy.run_path(os.path.join(sys.argv[1], 'gunicorn.conf.py'))
+    assert conf['preload_app']
+    import wsgi
+
+    class Server:
+        log = logging.getLogger('gunicorn')
+
+    conf['when_ready'](Server())
+    assert gc.get_freeze_count() > 0
+    pid = os.fork()
+    if pid == 0:
+        gc.collect()
+        client = wsgi.app.test_client()
+        codes = [client.get(url).status_code for url in ('/', '/api/top_clientes/5', '/export/tickets.csv')]
+        os._exit(0 if codes == [200, 200, 200] else 1)
+    _, status = os.waitpid(pid, 0)
+    sys.exit(os.waitstatus_to_exitcode(status))
+""")
+
+
+@pytest.fixture(scope='module')
+def app_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('wsgi')
+    generate_db(str(path / 'incidentes.db'), 600)
+    os.makedirs(path / 'static' / 'charts')
+    return path
+
+
+def run(cmd, cwd):
+    env = dict(os.environ, PYTHONPATH=BASE_DIR, MPLBACKEND='Agg')
+    return subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True, timeout=300)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="necesita fork")
+def test_preloaded_app_serves_from_forked_worker_after_freeze(app_dir):
+    result = run([sys.executable, '-c', MAESTRO, BASE_DIR], app_dir)
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.skipif(importlib.util.find_spec('gunicorn') is None, reason="gunicorn no está instalado")
+def test_gunicorn_config_loads_wsgi_app(app_dir):
+    result = run([sys.executable, '-m', 'gunicorn', '--check-config',
+                  '-c', os.path.join(BASE_DIR, 'gunicorn.conf.py'), 'wsgi:app'], app_dir)
+    assert result.returncode == 0, result.stderr
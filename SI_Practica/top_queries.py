@@ -0,0 +1,110 @@
+import sqlite3
+
+from etl_process import DB_NAME, dia_numero
+from replica import connect_read
+
+# Tamaño máximo de página para los rankings (evita páginas enormes con x grandes)
+MAX_TOP_N = 100
+
+
+def clamp_page(x, pagina):
+    """
+    Normaliza el tamaño de página y el número de página recibidos por la URL.
+    Devuelve (limit, offset, pagina).
+    """
+    limit = max(1, min(int(x), MAX_TOP_N))
+    pagina = max(1, int(pagina))
+    return limit, (pagina - 1) * limit, pagina
+
+
+def filtro_apertura(desde=None, hasta=None, column='t.fecha_apertura'):
+    """
+    Condiciones SQL (' AND ...') y parámetros para filtrar por un rango de
+    fechas de apertura (datetime.date o None); usa el índice idx_ticket_apertura.
+    """
+    conditions, params = [], []
+    if desde is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(dia_numero(desde))
+    if hasta is not None:
+        conditions.append(f"{column} <= ?")
+        params.append(dia_numero(hasta))
+    return ''.join(' AND ' + c for c in conditions), params
+
+
+def _fetch_page(query, params, limit, offset):
+    """
+    Ejecuta la consulta de ranking pidiendo una fila más de la necesaria para
+    saber si existe página siguiente sin hacer un COUNT(*) adicional.
+    """
+    conn = connect_read(DB_NAME)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(query + " LIMIT ? OFFSET ?", (*params, limit + 1, offset)).fetchall()
+    conn.close()
+    return [dict(r) for r in rows[:limit]], len(rows) > limit
+
+
+def top_clientes_page(x, pagina=1, desde=None, hasta=None):
+    """
+    Top de clientes por número de incidencias, calculado en SQLite. Con
+    desde/hasta solo cuentan los tickets abiertos en ese rango.
+    """
+    limit, offset, pagina = clamp_page(x, pagina)
+    rango, params = filtro_apertura(desde, hasta)
+    query = f"""
+        SELECT
+            t.id_cliente,
+            COALESCE(c.nombre, 'Cliente ' || t.id_cliente) AS nombre,
+            COUNT(*) AS incidencias
+        FROM incidencia_ticket t
+        LEFT JOIN cliente c ON c.id_cliente = t.id_cliente
+        WHERE 1 = 1{rango}
+        GROUP BY t.id_cliente
+        ORDER BY incidencias DESC, t.id_cliente
+    """
+    items, has_next = _fetch_page(query, params, limit, offset)
+    return {'items': items, 'x': limit, 'pagina': pagina, 'hay_siguiente': has_next}
+
+
+def top_tiempos_incidencias_page(x, pagina=1, desde=None, hasta=None):
+    """
+    Top de tipos de incidencia por tiempo medio de resolución (días).
+    """
+    limit, offset, pagina = clamp_page(x, pagina)
+    rango, params = filtro_apertura(desde, hasta)
+    query = f"""
+        SELECT
+            t.id_inci,
+            COALESCE(ti.nombre, 'Tipo ' || t.id_inci) AS tipo,
+            ROUND(AVG(t.duracion), 2) AS dias_promedio
+        FROM incidencia_ticket t
+        LEFT JOIN tipo_incidencia ti ON ti.id_inci = t.id_inci
+        WHERE 1 = 1{rango}
+        GROUP BY t.id_inci
+        ORDER BY dias_promedio DESC, t.id_inci
+    """
+    items, has_next = _fetch_page(query, params, limit, offset)
+    return {'items': items, 'x': limit, 'pagina': pagina, 'hay_siguiente': has_next}
+
+
+def top_empleados_page(x, pagina=1, desde=None, hasta=None):
+    """
+    Top de empleados por horas totales dedicadas a contactos (de tickets
+    abiertos en el rango desde/hasta, si se indica).
+    """
+    limit, offset, pagina = clamp_page(x, pagina)
+    rango, params = filtro_apertura(desde, hasta)
+    query = f"""
+        SELECT
+            co.id_emp,
+            COALESCE(e.nombre, 'Empleado ' || co.id_emp) AS nombre,
+            ROUND(SUM(co.tiempo), 2) AS horas
+        FROM contacto co
+        LEFT JOIN empleado e ON e.id_emp = co.id_emp
+        {'JOIN incidencia_ticket t ON t.id_ticket = co.id_ticket' if rango else ''}
+        WHERE co.id_emp IS NOT NULL{rango}
+        GROUP BY co.id_emp
+        ORDER BY SUM(co.tiempo) DESC, co.id_emp
+    """
+    items, has_next = _fetch_page(query, params, limit, offset)
+    return {'items': items, 'x': limit, 'pagina': pagina, 'hay_siguiente': has_next}
@@ -1,5 +1,20 @@
+"""
+Entrenamiento de los modelos de criticidad (regresión logística, árbol de
+decisión y Random Forest) y de sus gráficos de evaluación.
+
+- Por defecto, en memoria a partir de 'data_clasified.json':
+      python train_models.py [--json data_clasified.json]
+- Fuera de memoria, leyendo los tickets etiquetados de la BD por bloques:
+      python train_models.py --out-of-core [--db incidentes.db] [--chunk 100000]
+  La memoria queda acotada por el tamaño de bloque y de las muestras, no por el
+  nº de tickets (ver train_out_of_core).
+
+Los modelos se publican como una versión nueva en models/ (online_training).
+"""
+import argparse
 import json
-import joblib
+import math
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -9,141 +24,265 @@ from sklearn.metrics import confusion_matrix, classification_report, accuracy_sc
 from datetime import datetime
 from sklearn.model_selection import train_test_split
 from sklearn.tree import DecisionTreeClassifier, plot_tree
+from sklearn.ensemble import RandomForestClassifier
+
+from etl_process import DB_NAME
+from ml_models import FEATURES, OnlineLogit
+from online_training import LABELLED_QUERY, publish_models
+from replica import connect_read
+
+# Fracción de tickets reservada para la evaluación
+TEST_SIZE = 0.25
+# Filas por bloque leído de SQLite en el modo fuera de memoria
+TRAIN_CHUNK = 100_000
+# Tamaño de las muestras estratificadas (evaluación y árbol de decisión)
+EVAL_SAMPLE = 50_000
+TREE_SAMPLE = 200_000
+# Árboles del Random Forest (repartidos entre los bloques) y profundidad del
+# árbol de decisión que se dibuja
+RF_TREES = 100
+PLOT_DEPTH = 3
+
+
+def load_json_dataset(json_path='data_clasified.json'):
+    """
+    Características y etiqueta de los tickets clasificados del JSON.
+    """
+    # Cargar datos clasificados
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    # Crear DataFrame con las características relevantes
+    tickets = data['tickets_emitidos']
+    df_tickets = []
+
+    for ticket in tickets:
+        # Datos básicos del ticket
+        ticket_data = {
+            'cliente': int(ticket['cliente']),
+            'es_mantenimiento': 1 if ticket['es_mantenimiento'] else 0,
+            'satisfaccion_cliente': ticket['satisfaccion_cliente'],
+            'tipo_incidencia': ticket['tipo_incidencia'],
+            'es_critico': 1 if ticket['es_critico'] else 0
+        }
+
+        # Calcular duración en días
+        fecha_apertura = datetime.strptime(ticket['fecha_apertura'], '%Y-%m-%d')
+        fecha_cierre = datetime.strptime(ticket['fecha_cierre'], '%Y-%m-%d')
+        ticket_data['duracion'] = (fecha_cierre - fecha_apertura).days
+
+        # Características de los contactos
+        ticket_data['num_contactos'] = len(ticket['contactos_con_empleados'])
+        ticket_data['tiempo_total'] = sum(contacto['tiempo'] for contacto in ticket['contactos_con_empleados'])
 
+        df_tickets.append(ticket_data)
 
-# Cargar datos clasificados
-with open('data_clasified.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+    # Crear DataFrame
+    return pd.DataFrame(df_tickets)
 
-# Crear DataFrame con las características relevantes
-tickets = data['tickets_emitidos']
-df_tickets = []
 
-for ticket in tickets:
-    # Datos básicos del ticket
-    ticket_data = {
-        'cliente': int(ticket['cliente']),
-        'es_mantenimiento': 1 if ticket['es_mantenimiento'] else 0,
-        'satisfaccion_cliente': ticket['satisfaccion_cliente'],
-        'tipo_incidencia': ticket['tipo_incidencia'],
-        'es_critico': 1 if ticket['es_critico'] else 0
+def plot_confusion(y_true, y_pred, title, cmap, filename):
+    plt.figure(figsize=(8, 6))
+    cm = confusion_matrix(y_true, y_pred)
+    sns.heatmap(cm, annot=True, fmt='d', cmap=cmap)
+    plt.title(title)
+    plt.ylabel('Valor Real')
+    plt.xlabel('Valor Predicho')
+    plt.savefig(f'static/charts/{filename}')
+    plt.close()
+
+
+def plot_importance(values, title, filename):
+    plt.figure(figsize=(10, 6))
+    pd.Series(values, index=FEATURES).sort_values().plot(kind='barh')
+    plt.title(title)
+    plt.savefig(f'static/charts/{filename}')
+    plt.close()
+
+
+def plot_decision_tree(dt_model, max_depth=None):
+    plt.figure(figsize=(15, 10))
+    plot_tree(dt_model, feature_names=FEATURES, class_names=['No Crítico', 'Crítico'],
+              filled=True, rounded=True, fontsize=10, max_depth=max_depth)
+    plt.title('Visualización del Árbol de Decisión')
+    plt.savefig('static/charts/decision_tree.png')
+    plt.close()
+
+
+def evaluate(models, X_test, y_test):
+    """
+    Precisión e informe de cada modelo y sus gráficos de evaluación.
+    """
+    estilos = {
+        'lr': ('Regresión Logística', 'Blues'),
+        'dt': ('Árbol de Decisión', 'Greens'),
+        'rf': ('Random Forest', 'Oranges'),
     }
+    for key, (nombre, cmap) in estilos.items():
+        pred = models[key].predict(X_test)
+        print(f"{nombre} - Precisión: {accuracy_score(y_test, pred):.4f}")
+        print(classification_report(y_test, pred))
+        plot_confusion(y_test, pred, f'Matriz de Confusión - {nombre}', cmap, f'{key}_confusion_matrix.png')
 
-    # Calcular duración en días
-    fecha_apertura = datetime.strptime(ticket['fecha_apertura'], '%Y-%m-%d')
-    fecha_cierre = datetime.strptime(ticket['fecha_cierre'], '%Y-%m-%d')
-    ticket_data['duracion'] = (fecha_cierre - fecha_apertura).days
-
-    # Características de los contactos
-    ticket_data['num_contactos'] = len(ticket['contactos_con_empleados'])
-    ticket_data['tiempo_total'] = sum(contacto['tiempo'] for contacto in ticket['contactos_con_empleados'])
-
-    df_tickets.append(ticket_data)
-
-# Crear DataFrame
-df = pd.DataFrame(df_tickets)
-
-# Variables independientes y dependiente
-X = df[['es_mantenimiento', 'satisfaccion_cliente', 'tipo_incidencia', 'duracion', 'num_contactos', 'tiempo_total']]
-y = df['es_critico']
-
-# División en conjuntos de entrenamiento y prueba
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
-
-
-# Entrenamiento del modelo
-lr_model = LogisticRegression(random_state=42, max_iter=1000)
-lr_model.fit(X_train, y_train)
-
-# Evaluación
-lr_pred = lr_model.predict(X_test)
-lr_accuracy = accuracy_score(y_test, lr_pred)
-print(f"Precisión: {lr_accuracy:.4f}")
-print(classification_report(y_test, lr_pred))
-
-# Visualización de la matriz de confusión
-plt.figure(figsize=(8, 6))
-cm = confusion_matrix(y_test, lr_pred)
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
-plt.title('Matriz de Confusión - Regresión Logística')
-plt.ylabel('Valor Real')
-plt.xlabel('Valor Predicho')
-plt.savefig('static/charts/lr_confusion_matrix.png')
-
-# Visualización de coeficientes
-plt.figure(figsize=(10, 6))
-coef = pd.Series(lr_model.coef_[0], index=X.columns)
-coef.sort_values().plot(kind='barh')
-plt.title('Importancia de Características - Regresión Logística')
-plt.savefig('static/charts/lr_feature_importance.png')
-
-# Guardar el modelo
-joblib.dump(lr_model, 'models/logistic_regression_model.pkl')
-
-
-# Entrenamiento del modelo
-dt_model = DecisionTreeClassifier(random_state=42)
-dt_model.fit(X_train, y_train)
-
-# Evaluación
-dt_pred = dt_model.predict(X_test)
-dt_accuracy = accuracy_score(y_test, dt_pred)
-print(f"Precisión: {dt_accuracy:.4f}")
-print(classification_report(y_test, dt_pred))
-
-# Matriz de confusión
-plt.figure(figsize=(8, 6))
-cm = confusion_matrix(y_test, dt_pred)
-sns.heatmap(cm, annot=True, fmt='d', cmap='Greens')
-plt.title('Matriz de Confusión - Árbol de Decisión')
-plt.ylabel('Valor Real')
-plt.xlabel('Valor Predicho')
-plt.savefig('static/charts/dt_confusion_matrix.png')
-
-# Visualización del árbol
-plt.figure(figsize=(15, 10))
-plot_tree(dt_model, feature_names=X.columns, class_names=['No Crítico', 'Crítico'],
-          filled=True, rounded=True, fontsize=10)
-plt.title('Visualización del Árbol de Decisión')
-plt.savefig('static/charts/decision_tree.png')
-
-# Importancia de características
-plt.figure(figsize=(10, 6))
-feat_importance = pd.Series(dt_model.feature_importances_, index=X.columns)
-feat_importance.sort_values().plot(kind='barh')
-plt.title('Importancia de Características - Árbol de Decisión')
-plt.savefig('static/charts/dt_feature_importance.png')
-
-# Guardar el modelo
-joblib.dump(dt_model, 'models/decision_tree_model.pkl')
+    lr = models['lr']
+    coef = lr.sgd.coef_[0] if isinstance(lr, OnlineLogit) else lr.coef_[0]
+    plot_importance(coef, 'Importancia de Características - Regresión Logística', 'lr_feature_importance.png')
+    plot_importance(models['dt'].feature_importances_, 'Importancia de Características - Árbol de Decisión',
+                    'dt_feature_importance.png')
+    plot_importance(models['rf'].feature_importances_, 'Importancia de Características - Random Forest',
+                    'rf_feature_importance.png')
 
-from sklearn.ensemble import RandomForestClassifier
 
-# Entrenamiento del modelo
-rf_model = RandomForestClassifier(random_state=42)
-rf_model.fit(X_train, y_train)
-
-# Evaluación
-rf_pred = rf_model.predict(X_test)
-rf_accuracy = accuracy_score(y_test, rf_pred)
-print(f"Precisión: {rf_accuracy:.4f}")
-print(classification_report(y_test, rf_pred))
-
-# Matriz de confusión
-plt.figure(figsize=(8, 6))
-cm = confusion_matrix(y_test, rf_pred)
-sns.heatmap(cm, annot=True, fmt='d', cmap='Oranges')
-plt.title('Matriz de Confusión - Random Forest')
-plt.ylabel('Valor Real')
-plt.xlabel('Valor Predicho')
-plt.savefig('static/charts/rf_confusion_matrix.png')
-
-# Importancia de características
-plt.figure(figsize=(10, 6))
-feat_importance = pd.Series(rf_model.feature_importances_, index=X.columns)
-feat_importance.sort_values().plot(kind='barh')
-plt.title('Importancia de Características - Random Forest')
-plt.savefig('static/charts/rf_feature_importance.png')
-
-# Guardar el modelo
-joblib.dump(rf_model, 'models/random_forest_model.pkl')
+def train_in_memory(df):
+    """
+    Entrenamiento completo en memoria con una partición aleatoria 75/25.
+    """
+    # Variables independientes y dependiente
+    X = df[FEATURES]
+    y = df['es_critico']
+
+    # División en conjuntos de entrenamiento y prueba
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=42)
+
+    models = {
+        'lr': LogisticRegression(random_state=42, max_iter=1000).fit(X_train, y_train),
+        'dt': DecisionTreeClassifier(random_state=42).fit(X_train, y_train),
+        'rf': RandomForestClassifier(random_state=42).fit(X_train, y_train),
+    }
+    evaluate(models, X_test, y_test)
+    plot_decision_tree(models['dt'])
+    return models
+
+
+class StratifiedSample:
+    """
+    Muestra aleatoria uniforme de tamaño fijo por clase que se acumula bloque a
+    bloque: cada fila recibe una clave aleatoria y se conservan las de menor
+    clave de cada clase.
+    """
+
+    def __init__(self, sizes, seed=42):
+        self.sizes = sizes
+        self.rng = np.random.default_rng(seed)
+        self.parts = {}
+
+    def add(self, df):
+        df = df.assign(_clave=self.rng.random(len(df)))
+        for clase, size in self.sizes.items():
+            candidatos = df[df['es_critico'] == clase]
+            if clase in self.parts:
+                candidatos = pd.concat([self.parts[clase], candidatos])
+            self.parts[clase] = candidatos.nsmallest(size, '_clave')
+
+    def frame(self):
+        return pd.concat(self.parts.values()).drop(columns='_clave')
+
+
+def _class_counts(db_name):
+    conn = connect_read(db_name)
+    try:
+        rows = conn.execute("""
+            SELECT es_critico, COUNT(*) FROM incidencia_ticket
+            WHERE es_critico IS NOT NULL GROUP BY es_critico
+        """).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+def _proportional(counts, total):
+    n = sum(counts.values())
+    return {clase: max(1, round(total * c / n)) for clase, c in counts.items()}
+
+
+def in_holdout(ids, test_size=TEST_SIZE):
+    """
+    Partición determinista por hash del id_ticket: no hace falta guardar qué
+    tickets son de prueba y es estable entre ejecuciones.
+    """
+    h = (np.asarray(ids, dtype=np.uint64) * np.uint64(2654435761)) % np.uint64(2 ** 32)
+    return h < np.uint64(int(test_size * 2 ** 32))
+
+
+def stream_labelled(db_name=DB_NAME, chunk=TRAIN_CHUNK):
+    """
+    Bloques de características y etiqueta de los tickets etiquetados, leídos de
+    la réplica con un cursor de SQLite.
+    """
+    conn = connect_read(db_name)
+    try:
+        yield from pd.read_sql_query(LABELLED_QUERY, conn, params=(0,), chunksize=chunk)
+    finally:
+        conn.close()
+
+
+def train_out_of_core(db_name=DB_NAME, chunk=TRAIN_CHUNK, epochs=1):
+    """
+    Entrenamiento fuera de memoria sobre los tickets etiquetados de la BD:
+
+    - Regresión logística: OnlineLogit con partial_fit por bloque (epochs pasadas).
+    - Random Forest: warm_start, RF_TREES árboles repartidos entre los bloques;
+      cada uno se entrena solo con su bloque.
+    - Árbol de decisión: sobre una muestra estratificada de TREE_SAMPLE tickets.
+
+    El ~25% de los tickets (hash del id) se reserva para evaluar sobre una
+    muestra estratificada de EVAL_SAMPLE, y el árbol se dibuja hasta PLOT_DEPTH.
+    """
+    counts = _class_counts(db_name)
+    if len(counts) < 2:
+        raise ValueError("Hacen falta tickets etiquetados de las dos clases")
+    n_chunks = math.ceil(sum(counts.values()) * (1 - TEST_SIZE) / chunk)
+    trees_per_chunk = max(1, math.ceil(RF_TREES / n_chunks))
+
+    lr = OnlineLogit()
+    # Sin árboles hasta el primer bloque; cada bloque añade trees_per_chunk
+    rf = RandomForestClassifier(random_state=42, n_estimators=0, warm_start=True)
+    tree_sample = StratifiedSample(_proportional(counts, TREE_SAMPLE))
+    eval_sample = StratifiedSample(_proportional(counts, EVAL_SAMPLE), seed=43)
+    watermark = 0
+
+    for epoch in range(epochs):
+        for df in stream_labelled(db_name, chunk):
+            test = in_holdout(df['id_ticket'].to_numpy())
+            train = df[~test]
+            lr.partial_fit(train[FEATURES], train['es_critico'])
+            if epoch == 0:
+                watermark = int(df['id_ticket'].iloc[-1])
+                eval_sample.add(df[test])
+                tree_sample.add(train)
+                if train['es_critico'].nunique() == 2 and rf.n_estimators < RF_TREES:
+                    rf.set_params(n_estimators=rf.n_estimators + trees_per_chunk)
+                    rf.fit(train[FEATURES], train['es_critico'])
+        print(f"Época {epoch + 1}/{epochs} completada")
+
+    muestra = tree_sample.frame()
+    dt = DecisionTreeClassifier(random_state=42).fit(muestra[FEATURES], muestra['es_critico'])
+    if rf.n_estimators == 0:
+        # Ningún bloque tenía las dos clases: el bosque se entrena con la muestra
+        rf.set_params(n_estimators=RF_TREES).fit(muestra[FEATURES], muestra['es_critico'])
+    models = {'lr': lr, 'dt': dt, 'rf': rf}
+
+    evaluacion = eval_sample.frame()
+    evaluate(models, evaluacion[FEATURES], evaluacion['es_critico'])
+    plot_decision_tree(dt, max_depth=PLOT_DEPTH)
+    return models, watermark
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Entrena los modelos de criticidad.")
+    parser.add_argument('--json', default='data_clasified.json', help="tickets clasificados (modo en memoria)")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="entrena por bloques desde la BD en lugar del JSON")
+    parser.add_argument('--db', default=DB_NAME)
+    parser.add_argument('--chunk', type=int, default=TRAIN_CHUNK)
+    parser.add_argument('--epocas', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.out_of_core:
+        models, watermark = train_out_of_core(args.db, args.chunk, args.epocas)
+        # El reentrenamiento incremental continúa desde el último ticket usado
+        meta = {'watermark': watermark, 'tree_watermark': watermark}
+    else:
+        models = train_in_memory(load_json_dataset(args.json))
+        meta = {'watermark': 0, 'tree_watermark': 0}
+    print(f"Modelos publicados en la versión {publish_models(models, meta)}")
@@ -0,0 +1,14 @@
+"""
+Punto de entrada WSGI de producción:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Con preload_app (gunicorn.conf.py) este módulo se importa una sola vez en el
+proceso maestro: la ETL/migración, la réplica de lectura, el snapshot columnar,
+las métricas, los sketches y los modelos quedan cargados antes del fork y los
+workers los comparten copy-on-write.
+"""
+from app import app, startup, warm_up  # noqa: F401
+
+startup()
+warm_up()